@@ -1,5 +1,5 @@
 import logging
-from typing import List
+from typing import List, Iterator
 
 from apps.building_controller.config_controller import BuildingConfigController
 from apps.building_controller.graph_models import GraphStairCase, GraphBuilding, GraphBuildingEntryPoint
@@ -29,14 +29,25 @@ class GraphBuildingController:
             building.add_staircase_edges()
 
     def get_graph_buildings(self, buildings: List[Building]) -> List[GraphBuilding]:
-        return [GraphBuilding(self.osmm, building, self._get_graph_stair_cases(building)) for building in buildings]
+        # Snap all building entries in one batch
+        nearest_edges = iter(self.osmm.get_nearest_edges([entry.open_space_coord for building in buildings
+                                                          for staircase in building.staircases
+                                                          for entry in staircase.entries]))
+        graph_buildings = []
+        for building in buildings:
+            with self.osmm.node_id_namespace(f'building:{building.key}'):
+                graph_buildings.append(GraphBuilding(self.osmm, building,
+                                                     self._get_graph_stair_cases(building, nearest_edges)))
+        return graph_buildings
 
-    def _get_graph_stair_cases(self, building: Building) -> List[GraphStairCase]:
-        return [GraphStairCase(staircase, self.osmm.add_osm_node(staircase.coord), self._get_graph_entries(staircase))
+    def _get_graph_stair_cases(self, building: Building, nearest_edges: Iterator = None) -> List[GraphStairCase]:
+        return [GraphStairCase(staircase, self.osmm.add_osm_node(staircase.coord),
+                               self._get_graph_entries(staircase, nearest_edges))
                 for staircase in building.staircases]
 
-    def _get_graph_entries(self, staircase: StairCase) -> List[GraphBuildingEntryPoint]:
-        return [GraphBuildingEntryPoint(entry, self.osmm) for entry in staircase.entries]
+    def _get_graph_entries(self, staircase: StairCase, nearest_edges: Iterator = None) -> List[GraphBuildingEntryPoint]:
+        return [GraphBuildingEntryPoint(entry, self.osmm, next(nearest_edges) if nearest_edges is not None else None)
+                for entry in staircase.entries]
 
 
 class BuildingController:
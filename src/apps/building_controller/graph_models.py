@@ -2,13 +2,14 @@ from typing import List
 
 from apps.building_controller.models import StairCase, Building, BuildingEntryPoint
 from apps.lector.graph_models import GraphEntryPoint
+from apps.lector.models import EDGE_TYPES
 
 
 class GraphBuildingEntryPoint(BuildingEntryPoint, GraphEntryPoint):
-    def __init__(self, entry_point: BuildingEntryPoint, osmm):
+    def __init__(self, entry_point: BuildingEntryPoint, osmm, nearest_edge=None):
         self.wheelchair = entry_point.wheelchair
         self.blocked = entry_point.blocked
-        GraphEntryPoint.__init__(self, entry_point=entry_point, osmm=osmm)
+        GraphEntryPoint.__init__(self, entry_point=entry_point, osmm=osmm, nearest_edge=nearest_edge)
 
 
 class GraphStairCase(StairCase):
@@ -48,10 +49,12 @@ class GraphBuilding(Building):
             if not graph_staircase.is_blocked():
                 for entry in graph_staircase.graph_entries:
                     if not entry.is_blocked():
-                        self.osmm.add_osm_edge(graph_staircase.position_id, entry.nearest_graph_node_id, self.key)
+                        self.osmm.add_osm_edge(graph_staircase.position_id, entry.nearest_graph_node_id, self.key,
+                                               type=EDGE_TYPES.BUILDING_STAIRCASE)
                         entry.add_edges()
             for alternate_staircase in self.get_staircaise_neighbours(graph_staircase):
                 self.osmm.add_osm_edge(graph_staircase.position_id,
                                        alternate_staircase.position_id,
                                        maxspeed=0.01,
-                                       name=self.key)
+                                       name=self.key,
+                                       type=EDGE_TYPES.BUILDING_STAIRCASE)
@@ -1,22 +1,43 @@
 import logging
+import os
 import re
 import shutil
+from typing import Optional
 
 import docker
 
 logger = logging.getLogger(__name__)
 
+BLUE_SLOT = 'blue'
+GREEN_SLOT = 'green'
+GRAPHHOPPER_SLOTS = [BLUE_SLOT, GREEN_SLOT]
+GRAPHHOPPER_SLOTS_DIR = 'slots'
+GRAPHHOPPER_LIVE_LINK = 'live'
+# Mount point of the osm output dir in the graphhopper container
+GRAPHHOPPER_DATA_DIR = '/data'
+GRAPHHOPPER_IMPORT_ENTRYPOINT = ['./graphhopper.sh', 'import']
+GRAPHHOPPER_IMPORT_TIMEOUT = 60 * 60
+
 
 class DockerController:
     """
     Control basic docker functions
     """
 
-    @staticmethod
-    def get_container_by_service_name(service_name):
-        client = docker.from_env()
-        for container in client.containers.list(all=True):
-            pattern = re.compile(f'.*{service_name}.*')
+    def __init__(self, client=None):
+        """
+        :param client: docker client, e.g. a LocalDockerClient in tests. Defaults to the client of the environment
+        """
+        self._client = client
+
+    def get_client(self):
+        if self._client is None:
+            self._client = docker.from_env()
+        return self._client
+
+    def get_container_by_service_name(self, service_name):
+        pattern = re.compile(f'.*{service_name}.*')
+        for container in self.get_client().containers.list(all=True):
             if pattern.match(container.name):
                 return container
 
@@ -32,18 +53,102 @@ class DockerGraphhopperController(DockerController):
     Control initialization and restart of the graphhopper service
     """
 
-    def __init__(self, graphhopper_service_name, osm_output_dir, osm_output_filename):
+    def __init__(self, graphhopper_service_name, osm_output_dir, osm_output_filename, client=None,
+                 graphhopper_data_dir=GRAPHHOPPER_DATA_DIR, import_timeout=GRAPHHOPPER_IMPORT_TIMEOUT):
+        super().__init__(client=client)
         self.graphhopper_service_name = graphhopper_service_name
         self.osm_output_dir = osm_output_dir
         self.osm_output_filename = osm_output_filename
+        self.graphhopper_data_dir = graphhopper_data_dir
+        self.import_timeout = import_timeout
 
     def clean_graphhopper_restart(self):
         """
-        Remove old graphhopper files first and restart or start the service
+        Replace the osm file of the live slot, remove its old graphhopper files and restart or start the service,
+        which imports the new osm file on start. Graphhopper serves <graphhopper_data_dir>/live/<osm_output_filename>.osm
         """
-        logger.info("Restart Graphhopper Container")
-        self._remove_current_graphhopper_data()
+        slot = self.get_live_slot() or BLUE_SLOT
+        logger.info(f'Restart Graphhopper Container on slot {slot}')
+        self._move_osm_file_to_slot(slot)
+        self._set_live_slot(slot)
         self.restart_container_by_service_name(self.graphhopper_service_name)
 
-    def _remove_current_graphhopper_data(self):
-        shutil.rmtree(f'{self.osm_output_dir}/{self.osm_output_filename}-gh', ignore_errors=True)
+    def blue_green_graphhopper_restart(self):
+        """
+        Import the new osm file into the staging slot while the live slot keeps serving, then switch the live link
+        to the staging slot and restart the service. The restart only loads the prepared graph.
+        Graphhopper serves <graphhopper_data_dir>/live/<osm_output_filename>.osm
+
+        :raise RuntimeError: if the import fails, the live slot is left untouched
+        """
+        slot = self.get_staging_slot()
+        logger.info(f'Prepare Graphhopper slot {slot}')
+        self._move_osm_file_to_slot(slot)
+        self._import_graphhopper_data(slot)
+        self._set_live_slot(slot)
+        logger.info(f'Restart Graphhopper Container on slot {slot}')
+        self.restart_container_by_service_name(self.graphhopper_service_name)
+
+    def get_live_slot(self) -> Optional[str]:
+        link = f'{self.osm_output_dir}/{GRAPHHOPPER_LIVE_LINK}'
+        if not os.path.islink(link):
+            return None
+        return os.path.basename(os.readlink(link))
+
+    def get_staging_slot(self) -> str:
+        live_slot = self.get_live_slot()
+        return next(slot for slot in GRAPHHOPPER_SLOTS if slot != live_slot)
+
+    def get_slot_dir(self, slot: str) -> str:
+        return f'{self.osm_output_dir}/{GRAPHHOPPER_SLOTS_DIR}/{slot}'
+
+    def _import_graphhopper_data(self, slot: str):
+        """
+        Run the graphhopper import of a slot in a one-off container with the image and volumes of the service
+        """
+        service_container = self.get_container_by_service_name(self.graphhopper_service_name)
+        if not service_container:
+            raise RuntimeError(f'No container of service {self.graphhopper_service_name} found')
+        osm_file = f'{self.graphhopper_data_dir}/{GRAPHHOPPER_SLOTS_DIR}/{slot}/{self.osm_output_filename}.osm'
+        container = self.get_client().containers.run(service_container.image.id, command=[osm_file],
+                                                     entrypoint=GRAPHHOPPER_IMPORT_ENTRYPOINT,
+                                                     volumes_from=[service_container.id], detach=True)
+        try:
+            status_code = container.wait(timeout=self.import_timeout).get('StatusCode')
+            if status_code != 0:
+                logger.error(container.logs(tail=50).decode(errors='replace'))
+                raise RuntimeError(f'Graphhopper import of slot {slot} failed with status {status_code}')
+        finally:
+            container.remove(force=True)
+        if not os.path.isdir(f'{self.get_slot_dir(slot)}/{self.osm_output_filename}-gh'):
+            raise RuntimeError(f'Graphhopper import of slot {slot} created no graph')
+
+    def _set_live_slot(self, slot: str):
+        """
+        Atomically point the live link to the slot. The link is relative to work in every container mount
+        """
+        link = f'{self.osm_output_dir}/{GRAPHHOPPER_LIVE_LINK}'
+        tmp_link = f'{link}.{os.getpid()}.tmp'
+        os.symlink(f'{GRAPHHOPPER_SLOTS_DIR}/{slot}', tmp_link)
+        os.replace(tmp_link, link)
+
+    def _move_osm_file_to_slot(self, slot: str):
+        """
+        Replace the content of the slot with the new osm file, the graphhopper files of the slot are removed.
+        The new slot is prepared in a sibling dir and swapped in by renames, the old slot is only removed afterwards
+
+        :raise FileNotFoundError: if there is no exported osm file, the slot is left untouched
+        """
+        osm_file = f'{self.osm_output_dir}/{self.osm_output_filename}.osm'
+        if not os.path.isfile(osm_file):
+            raise FileNotFoundError(f'No exported osm file {osm_file}, slot {slot} is left untouched')
+        slot_dir = self.get_slot_dir(slot)
+        tmp_dir = f'{slot_dir}.{os.getpid()}.tmp'
+        old_dir = f'{slot_dir}.{os.getpid()}.old'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        os.replace(osm_file, f'{tmp_dir}/{self.osm_output_filename}.osm')
+        if os.path.isdir(slot_dir):
+            os.replace(slot_dir, old_dir)
+        os.replace(tmp_dir, slot_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
@@ -1,3 +1,73 @@
+import os
+import tempfile
+
 from django.test import TestCase
 
-# Create your tests here.
+from apps.docker_controller.controllers import DockerGraphhopperController, BLUE_SLOT, GREEN_SLOT
+from apps.docker_controller.local_client import LocalDockerClient
+
+
+class DockerGraphhopperControllerTests(TestCase):
+    def setUp(self):
+        self.osm_output_dir = tempfile.mkdtemp()
+        self.client = LocalDockerClient(self.osm_output_dir)
+        self.controller = DockerGraphhopperController(graphhopper_service_name='graphhopper',
+                                                      osm_output_dir=self.osm_output_dir,
+                                                      osm_output_filename='data', client=self.client)
+
+    def _write_osm_file(self, content):
+        with open(f'{self.osm_output_dir}/data.osm', 'w') as f:
+            f.write(content)
+
+    def _read_live_osm_file(self):
+        with open(f'{self.osm_output_dir}/live/data.osm') as f:
+            return f.read()
+
+    def test_blue_green_restart_switches_slots(self):
+        self._write_osm_file('first')
+        self.controller.blue_green_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), BLUE_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'first')
+        self.assertTrue(os.path.isdir(f'{self.osm_output_dir}/live/data-gh'))
+
+        self._write_osm_file('second')
+        self.controller.blue_green_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), GREEN_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'second')
+        self.assertEqual(self.client.services['graphhopper'].restarts, 2)
+        self.assertEqual(self.client.runs[-1]['command'], ['/data/slots/green/data.osm'])
+
+    def test_clean_restart_replaces_live_slot(self):
+        self._write_osm_file('first')
+        self.controller.clean_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), BLUE_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'first')
+
+        os.makedirs(f'{self.osm_output_dir}/live/data-gh')
+        self._write_osm_file('second')
+        self.controller.clean_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), BLUE_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'second')
+        self.assertFalse(os.path.exists(f'{self.osm_output_dir}/live/data-gh'))
+        self.assertEqual(self.client.services['graphhopper'].restarts, 2)
+        self.assertEqual(self.client.runs, [])
+
+    def test_clean_restart_without_export_keeps_live_slot(self):
+        self._write_osm_file('first')
+        self.controller.clean_graphhopper_restart()
+        with self.assertRaises(FileNotFoundError):
+            self.controller.clean_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), BLUE_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'first')
+        self.assertEqual(self.client.services['graphhopper'].restarts, 1)
+
+    def test_failed_import_keeps_live_slot(self):
+        self._write_osm_file('first')
+        self.controller.blue_green_graphhopper_restart()
+        self.client.fail_imports = True
+        self._write_osm_file('second')
+        with self.assertRaises(RuntimeError):
+            self.controller.blue_green_graphhopper_restart()
+        self.assertEqual(self.controller.get_live_slot(), BLUE_SLOT)
+        self.assertEqual(self._read_live_osm_file(), 'first')
+        self.assertEqual(self.client.services['graphhopper'].restarts, 1)
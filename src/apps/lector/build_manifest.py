@@ -0,0 +1,65 @@
+import json
+import os
+from typing import Dict, List
+
+from apps.open_space_controller.models import BBox
+from apps.open_space_controller.visibility import STRTREE_VISIBILITY
+
+# Increase whenever the manifest layout changes
+BUILD_MANIFEST_VERSION = 4
+
+
+class BuildManifest:
+    """
+    Records the inputs of a stored enriched graph: the bbox, the build options, a hash of the street graph and
+    the build key and the node id namespaces of every open space. Together with the stored open space
+    deltas it allows to replace single open spaces in the stored graph
+    """
+
+    def __init__(self, bbox: BBox, reduced_visibility: bool, street_graph_hash: str,
+                 open_spaces: Dict[str, dict] = None, visibility_mode=STRTREE_VISIBILITY):
+        self.bbox = bbox
+        self.reduced_visibility = reduced_visibility
+        self.visibility_mode = visibility_mode
+        self.street_graph_hash = street_graph_hash
+        self.open_spaces = open_spaces if open_spaces else {}
+
+    def set_open_space(self, file_name: str, key: str, namespaces: List[str] = ()):
+        self.open_spaces[file_name] = {'key': key, 'namespaces': list(namespaces)}
+
+    def get_namespaces(self) -> List[str]:
+        """
+        :return: node id namespaces of all open spaces
+        """
+        return sorted({namespace for entry in self.open_spaces.values() for namespace in entry['namespaces']})
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': BUILD_MANIFEST_VERSION,
+                       'bbox': self.bbox.get_bbox(),
+                       'reduced_visibility': self.reduced_visibility,
+                       'visibility_mode': self.visibility_mode,
+                       'street_graph_hash': self.street_graph_hash,
+                       'open_spaces': self.open_spaces}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> 'BuildManifest':
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != BUILD_MANIFEST_VERSION:
+            raise ValueError(f'Build manifest {path} has version {data.get("version")}, '
+                             f'expected {BUILD_MANIFEST_VERSION}')
+        return BuildManifest(BBox(*data['bbox']), data['reduced_visibility'], data['street_graph_hash'],
+                             data['open_spaces'], data['visibility_mode'])
+
+
+def get_delta_dir(manifest_path: str) -> str:
+    """
+    :return: directory of the open space deltas which belong to the manifest
+    """
+    return f'{os.path.splitext(manifest_path)[0]}_deltas'
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+from typing import List, Optional
+
+import networkx as nx
+import numpy as np
+from django.conf import settings
+
+from apps.building_controller.models import Building
+from apps.lector.graph_delta import GraphDelta
+from apps.lector.models import EDGE_TYPES
+from apps.lector.node_ids import NODE_ID_OFFSET, NODE_ID_BLOCK_SIZE, NODE_ID_BLOCKS
+from apps.open_space_controller.models import OpenSpace
+from apps.open_space_controller.visibility import STRTREE_VISIBILITY
+
+logger = logging.getLogger(__name__)
+
+# Increase whenever a change of the open space build changes its resulting graph
+OPEN_SPACE_GRAPH_VERSION = 6
+CACHE_FILE_EXTENSION = '.npz'
+
+
+class OpenSpaceGraphCache:
+    """
+    Content addressed on disk cache of open space builds.
+    An entry stores the GraphDelta of one open space build and is keyed by a hash of the open space, its buildings,
+    the street graph crop, the build options and OPEN_SPACE_GRAPH_VERSION.
+    The least recently used entries are evicted as soon as the cache grows beyond max_size bytes
+    """
+
+    def __init__(self, cache_dir=settings.OPEN_SPACE_GRAPH_CACHE_DIR, max_size=settings.OPEN_SPACE_GRAPH_CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    @staticmethod
+    def get_key(open_space: OpenSpace, buildings: List[Building], crop: nx.MultiDiGraph,
+                reduced_visibility=False, visibility_mode=STRTREE_VISIBILITY) -> str:
+        """
+        :param open_space: the open space which is built
+        :param buildings: all buildings, only the buildings of the open space are part of the key
+        :param crop: the part of the street graph the open space is built on
+        :param reduced_visibility: build option of the open space
+        :param visibility_mode: visibility engine of the build
+        :return: hex sha256 of all inputs of the open space build
+        """
+        fingerprint = {'version': OPEN_SPACE_GRAPH_VERSION,
+                       'node_ids': [NODE_ID_OFFSET, NODE_ID_BLOCK_SIZE, NODE_ID_BLOCKS],
+                       'reduced_visibility': reduced_visibility,
+                       'visibility_mode': visibility_mode,
+                       'open_space': _get_open_space_fingerprint(open_space),
+                       'buildings': [_get_building_fingerprint(building)
+                                     for building in sorted(buildings, key=lambda building: str(building.key))
+                                     if open_space.is_contained_building(building)]}
+        key = hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode())
+        _update_graph_hash(key, crop)
+        return key.hexdigest()
+
+    def get(self, key: str) -> Optional[GraphDelta]:
+        """
+        :param key: key of the entry
+        :return: the cached delta or None on a cache miss
+        """
+        path = self._get_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            delta = self._load(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f'Could not load open space graph cache entry {key}: {e}')
+            return None
+        os.utime(path)
+        return delta
+
+    def put(self, key: str, delta: GraphDelta):
+        """
+        Store the delta of an open space build and evict the least recently used entries.
+        The node ids of the delta are derived from the node id namespaces of the open space, which are part of the key
+
+        :param key: key of the entry
+        :param delta: the delta of the build
+        """
+        if any('color_label' not in data for _, _, _, data in delta.added_edges):
+            logger.warning(f'{delta.name}: not cached, the delta includes edges which were not added as osm edges')
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._get_path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **self._get_arrays(delta))
+        os.replace(tmp_path, path)
+        self.prune()
+
+    def remove(self, key: str):
+        path = self._get_path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._get_path(key))
+
+    def get_entries(self) -> List[dict]:
+        """
+        :return: key, size in bytes and last access time of all entries, most recently used first
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for file in os.listdir(self.cache_dir):
+            if file.endswith(CACHE_FILE_EXTENSION):
+                stat = os.stat(f'{self.cache_dir}/{file}')
+                entries.append({'key': file[:-len(CACHE_FILE_EXTENSION)], 'size': stat.st_size,
+                                'mtime': stat.st_mtime})
+        return sorted(entries, key=lambda entry: entry['mtime'], reverse=True)
+
+    def get_size(self) -> int:
+        return sum(entry['size'] for entry in self.get_entries())
+
+    def prune(self, max_size: int = None) -> List[str]:
+        """
+        Evict the least recently used entries until the cache is not larger than max_size
+
+        :param max_size: size limit in bytes, defaults to the size limit of the cache
+        :return: keys of the evicted entries
+        """
+        max_size = self.max_size if max_size is None else max_size
+        entries = self.get_entries()
+        size = sum(entry['size'] for entry in entries)
+        evicted = []
+        while entries and size > max_size:
+            entry = entries.pop()
+            os.remove(self._get_path(entry['key']))
+            size -= entry['size']
+            evicted.append(entry['key'])
+        if evicted:
+            logger.info(f'Evicted {len(evicted)} open space graph cache entries')
+        return evicted
+
+    def _get_path(self, key: str) -> str:
+        return f'{self.cache_dir}/{key}{CACHE_FILE_EXTENSION}'
+
+    @staticmethod
+    def _get_arrays(delta: GraphDelta) -> dict:
+        strings = []
+        string_ids = {}
+
+        def get_string_id(value: str) -> int:
+            if value not in string_ids:
+                string_ids[value] = len(strings)
+                strings.append(value)
+            return string_ids[value]
+
+        edges = delta.added_edges
+        return {'meta': np.array([OPEN_SPACE_GRAPH_VERSION], dtype=np.int64),
+                'name': np.array([delta.name]),
+                'removed_nodes': np.array(delta.removed_nodes, dtype=np.int64),
+                'removed_edges': np.array(delta.removed_edges, dtype=np.int64).reshape(-1, 3),
+                'node_ids': np.array([node for node, _ in delta.added_nodes], dtype=np.int64),
+                'node_coords': np.array([[data['x'], data['y']] for _, data in delta.added_nodes],
+                                        dtype=np.float64).reshape(-1, 2),
+                'edge_nodes': np.array([[u, v] for u, v, _, _ in edges], dtype=np.int64).reshape(-1, 2),
+                'edge_keys': np.array([key for _, _, key, _ in edges], dtype=np.int64),
+                'edge_types': np.array([data['color_label'].value for _, _, _, data in edges], dtype=np.int8),
+                'edge_names': np.array([get_string_id(str(data['name'])) for _, _, _, data in edges], dtype=np.int32),
+                'edge_maxspeeds': np.array([float(data['maxspeed']) if data.get('maxspeed') else np.nan
+                                            for _, _, _, data in edges], dtype=np.float64),
+                'strings': np.array(strings, dtype=str),
+                'namespaces': np.array(delta.namespaces, dtype=str)}
+
+    @staticmethod
+    def _load(path: str) -> GraphDelta:
+        with np.load(path) as arrays:
+            version = int(arrays['meta'][0])
+            if version != OPEN_SPACE_GRAPH_VERSION:
+                raise ValueError(f'version {version} is outdated')
+            strings = arrays['strings'].tolist()
+            added_nodes = [(node, {'osmid': node, 'x': x, 'y': y})
+                           for node, (x, y) in zip(arrays['node_ids'].tolist(), arrays['node_coords'].tolist())]
+            added_edges = []
+            for (u, v), key, edge_type, name_id, maxspeed in zip(arrays['edge_nodes'].tolist(),
+                                                                 arrays['edge_keys'].tolist(),
+                                                                 arrays['edge_types'].tolist(),
+                                                                 arrays['edge_names'].tolist(),
+                                                                 arrays['edge_maxspeeds'].tolist()):
+                data = {'highway': 'pedestrian', 'lanes': '1', 'name': strings[name_id], 'oneway': True}
+                if not np.isnan(maxspeed):
+                    data['maxspeed'] = maxspeed
+                data['color_label'] = EDGE_TYPES(edge_type)
+                added_edges.append((u, v, key, data))
+            delta = GraphDelta(str(arrays['name'][0]),
+                               arrays['removed_nodes'].tolist(),
+                               [tuple(edge) for edge in arrays['removed_edges'].tolist()],
+                               added_nodes,
+                               added_edges,
+                               arrays['namespaces'].tolist())
+        return delta
+
+
+def get_graph_hash(graph: nx.MultiDiGraph) -> str:
+    """
+    :return: hex sha256 of the node coordinates and the edges of the graph
+    """
+    graph_hash = hashlib.sha256()
+    _update_graph_hash(graph_hash, graph)
+    return graph_hash.hexdigest()
+
+
+def _update_graph_hash(graph_hash, graph: nx.MultiDiGraph):
+    for node, data in sorted(graph.nodes(data=True), key=lambda item: item[0]):
+        graph_hash.update(f'{node} {data["x"]!r} {data["y"]!r}\n'.encode())
+    for u, v, edge_key in sorted(graph.edges(keys=True)):
+        graph_hash.update(f'{u} {v} {edge_key}\n'.encode())
+
+
+def _get_open_space_fingerprint(open_space: OpenSpace) -> dict:
+    return {'file_name': open_space.file_name,
+            'walkable_area': open_space.walkable_area_coords,
+            'restricted_areas': open_space.restricted_areas_coords,
+            'blocked_areas': open_space.blocked_areas_coords,
+            'entry_points': [entry_point.open_space_coord for entry_point in open_space.entry_points]}
+
+
+def _get_building_fingerprint(building: Building) -> dict:
+    # Blocked states are evaluated for the current date, as the build does
+    return {'key': building.key,
+            'staircases': [{'id': staircase.id,
+                            'name': staircase.name,
+                            'coord': staircase.coord,
+                            'neighbours': staircase.neighbours,
+                            'blocked': staircase.is_blocked(),
+                            'entries': [{'coord': entry.open_space_coord,
+                                         'wheelchair': entry.wheelchair,
+                                         'blocked': entry.is_blocked()} for entry in staircase.entries]}
+                           for staircase in building.staircases]}
@@ -0,0 +1,37 @@
+import logging
+from typing import Iterable, Callable
+
+import networkx as nx
+
+logger = logging.getLogger(__name__)
+
+
+def prune_components(graph: nx.MultiDiGraph, keep_nodes: Iterable[int] = (),
+                     label_node: Callable[[int], str or None] = None) -> dict:
+    """
+    Remove all weakly connected components except the largest one and the components which contain a node
+    of keep_nodes, in place
+
+    :param graph: the graph to prune
+    :param keep_nodes: nodes whose components are kept as islands
+    :param label_node: names the owner of a node, e.g. an open space, to report what was dropped
+    :return: node and edge counts before and after, the number of components, the sizes of the dropped
+             components and the labels of their nodes
+    """
+    stats = {'nodes_before': len(graph), 'edges_before': graph.number_of_edges()}
+    components = sorted(nx.weakly_connected_components(graph), key=len, reverse=True)
+    keep_nodes = set(keep_nodes)
+    dropped = [component for component in components[1:] if keep_nodes.isdisjoint(component)]
+    dropped_labels = set()
+    for component in dropped:
+        if label_node:
+            dropped_labels.update(label_node(node) for node in component)
+        graph.remove_nodes_from(component)
+    dropped_labels.discard(None)
+    stats.update({'nodes_after': len(graph), 'edges_after': graph.number_of_edges(), 'components': len(components),
+                  'kept_islands': len(components) - len(dropped) - 1 if components else 0,
+                  'dropped_sizes': [len(component) for component in dropped],
+                  'dropped_labels': sorted(dropped_labels)})
+    logger.info(f'Pruned {len(dropped)} of {len(components)} components with '
+                f'{stats["nodes_before"] - stats["nodes_after"]} nodes')
+    return stats
@@ -1,15 +1,35 @@
 import logging
-from enum import Enum
+import math
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from typing import List
 
 import osmnx as ox
+from shapely.geometry import LineString
 
 from apps.building_controller.config_controller import BuildingConfigController
 from apps.building_controller.controller import GraphBuildingController
 from apps.building_controller.models import Building
+from apps.docker_controller.controllers import GRAPHHOPPER_LIVE_LINK
+from apps.lector.build_manifest import BuildManifest, get_delta_dir
+from apps.lector.cache import OpenSpaceGraphCache, get_graph_hash
+from apps.lector.components import prune_components
+from apps.lector.dedup import deduplicate_edges
+from apps.lector.edge_index import EdgeIndex
+from apps.lector.graph_delta import GraphDelta
+from apps.lector.load_profile import LoadProfile
+from apps.lector.map_provider import CityMapProvider
+from apps.lector.models import EDGE_TYPES
+from apps.lector.node_ids import NodeIdAllocator, DEFAULT_NODE_ID_NAMESPACE, NODE_ID_NAMESPACE_SEPARATOR, \
+    check_osm_node_ids, is_nested_namespace
+from apps.lector.osm_writer import write_osm_xml, write_osm_pbf, OSM_XML, OSM_PBF
+from apps.lector.renderer import render_svg
+from apps.lector.simplify import simplify_graph
+from apps.lector.snapshot import GraphSnapshot
 from apps.open_space_controller.config_controller import OpenSpaceConfigController
 from apps.open_space_controller.graph_models import GraphOpenSpace
 from apps.open_space_controller.models import BBox, OpenSpace
+from apps.open_space_controller.visibility import STRTREE_VISIBILITY
 
 logger = logging.getLogger(__name__)
 
@@ -19,50 +39,143 @@ BAMBERG_BBOX = BBox(*[49.925145775384436, 49.865874134216426, 10.951995849609375
 
 OSM_OUTPUT_FILENAME = "data"
 OSM_OUTPUT_DIR = "/osm_data"
+GRAPH_SNAPSHOT_FILE = f'{OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}.npz'
+BUILD_MANIFEST_FILE = f'{OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}_manifest.json'
 SERVICE_NAME = 'graphhopper'
 
 OPEN_SPACE_CONFIG_DIR = "/configs/open_spaces"
 BUILDING_CONFIG_DIR = "/configs/indoor_maps"
 
-
-class EDGE_TYPES(Enum):
-    NORMAL = 0
-    OPEN_SPACE_ENTRY = 1
-    OPEN_SPACE_VISIBLITY = 2
-    OPEN_SPACE_WALKABLE = 3
-    OPEN_SPACE_RESTRICTED = 4
-    BUILDING_ENTRY = 5
-    BUILDING_STAIRCASE = 6
-
-
-COLOR_MAP = {EDGE_TYPES.NORMAL: "#000000",
-             EDGE_TYPES.OPEN_SPACE_ENTRY: "#0f0f0f",
-             EDGE_TYPES.OPEN_SPACE_VISIBLITY: "#9ccc3c",
-             EDGE_TYPES.OPEN_SPACE_RESTRICTED: "#e70066",
-             EDGE_TYPES.OPEN_SPACE_WALKABLE: "#14278d",
-             EDGE_TYPES.BUILDING_ENTRY: "#5d2612",
-             EDGE_TYPES.BUILDING_STAIRCASE: "#9ccc3c"
-             }
+OPEN_SPACE_CROP_EXTENSION = 0.0005
 
 
 class OSMController:
-    def __init__(self, open_space_config_dir=OPEN_SPACE_CONFIG_DIR, building_config_dir=BUILDING_CONFIG_DIR):
+    def __init__(self, open_space_config_dir=OPEN_SPACE_CONFIG_DIR, building_config_dir=BUILDING_CONFIG_DIR,
+                 visibility_mode=STRTREE_VISIBILITY, reduced_visibility=False, graph_cache: OpenSpaceGraphCache = None,
+                 map_provider: CityMapProvider = None, debug_plots=False,
+                 load_profile: LoadProfile = None):
+        """
+        :param load_profile: filter of every loaded street graph, e.g. PEDESTRIAN_LOAD_PROFILE. None keeps all edges
+        """
         self.graph = None
-        self.current_osm_id = 0
+        self.debug_plots = debug_plots
+        self._edge_index = None
+        self._edge_index_graph = None
+        self.load_profile = load_profile
+        self.map_provider = map_provider if map_provider else CityMapProvider(load_profile=load_profile)
+        self.visibility_mode = visibility_mode
+        self.reduced_visibility = reduced_visibility
+        self.graph_cache = graph_cache
+        self.build_manifest = None
+        self._open_space_builds = {}
+        self.node_ids = NodeIdAllocator()
+        self._node_id_namespaces = []
         self.osp_config_c = OpenSpaceConfigController(open_space_config_dir)
         building_cc = BuildingConfigController(config_dir=building_config_dir)
         self.indoor_map_c = GraphBuildingController(self, building_cc=building_cc)
 
-    def create_bbox_open_spaces_plot(self, bbox=None):
+    def create_bbox_open_spaces_plot(self, bbox=None, workers=None, track_builds=False):
+        """
+        :param bbox: area to download, defaults to BAMBERG_BBOX
+        :param workers: number of worker processes which build the open spaces in parallel
+        :param track_builds: record the open space builds, so the result can be stored with save_build
+        """
+        self.build_bbox_open_spaces(bbox, workers=workers, track_builds=track_builds)
+        self.plot_graph()
+
+    def build_bbox_open_spaces(self, bbox=None, workers=None, track_builds=False):
+        """
+        Load the graph of the bbox and insert all contained open spaces. Every open space is built on its own crop
+        of the street graph and merged back in file name order, so the graph does not depend on workers, the graph
+        cache or track_builds. Overlapping or adjacent open spaces do not see each other: their entries only snap to
+        street edges and no edge connects the nodes of two open spaces
+        """
+        bbox = bbox if bbox else BAMBERG_BBOX
         open_spaces = self.osp_config_c.get_open_spaces()
         buildings = self.indoor_map_c.building_cc.get_buildings()
-        self.graph = self.download_map(bbox) if bbox else self.download_map()
-
-        for open_space in open_spaces:
-            if self._is_contained_open_space(open_space, bbox):
-                graph_open_space = GraphOpenSpace(open_space, osmm=self)
-                self._insert_open_space(buildings, graph_open_space)
-        self.plot_graph()
+        self.graph = self.get_map(bbox)
+
+        open_spaces = [open_space for open_space in open_spaces if self._is_contained_open_space(open_space, bbox)]
+        if track_builds:
+            self.build_manifest = BuildManifest(bbox, self.reduced_visibility, get_graph_hash(self.graph),
+                                                visibility_mode=self.visibility_mode)
+            self._open_space_builds = {}
+        self._insert_open_spaces_from_deltas(open_spaces, buildings, workers)
+
+    def _insert_open_spaces_from_deltas(self, open_spaces: List[OpenSpace], buildings: List[Building], workers=None,
+                                        street_graph=None):
+        """
+        Build every open space on its own crop of the graph and replay the resulting deltas into the graph.
+        Cached builds are taken from the graph cache, the others are built in worker processes if workers is set.
+        Node ids are derived from the open space namespaces, so the result does not depend on the scheduling and
+        cached deltas are replayed unchanged
+
+        :param street_graph: graph the crops are taken from, defaults to the graph itself
+        """
+        street_graph = street_graph if street_graph is not None else self.graph
+        open_spaces = sorted(open_spaces, key=lambda open_space: open_space.file_name)
+        deltas = []
+        builds = []
+        tasks = []
+        for index, open_space in enumerate(open_spaces):
+            crop = self.get_open_space_crop(open_space, street_graph)
+            key = OpenSpaceGraphCache.get_key(open_space, buildings, crop, self.reduced_visibility,
+                                              self.visibility_mode) if self.graph_cache or self.build_manifest else None
+            delta = self.graph_cache.get(key) if self.graph_cache else None
+            if delta:
+                logger.info(f'{open_space.file_name}: loaded from graph cache')
+            else:
+                tasks.append((index, key, (open_space, buildings, crop,
+                                           self.osp_config_c.config_dir, self.indoor_map_c.building_cc.config_dir,
+                                           self.visibility_mode, self.reduced_visibility)))
+            deltas.append(delta)
+            builds.append((open_space.file_name, key))
+
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                built_deltas = list(executor.map(build_open_space_delta, [task for _, _, task in tasks]))
+        else:
+            built_deltas = [build_open_space_delta(task) for _, _, task in tasks]
+        for (index, key, _), delta in zip(tasks, built_deltas):
+            deltas[index] = delta
+            if self.graph_cache:
+                self.graph_cache.put(key, delta)
+
+        if self.build_manifest:
+            for (file_name, key), delta in zip(builds, deltas):
+                self.build_manifest.set_open_space(file_name, key, delta.namespaces)
+                self._open_space_builds[key] = delta
+
+        for delta in deltas:
+            logger.info(delta)
+            colliding = [node for node, _ in delta.added_nodes if node in self.graph]
+            if colliding:
+                raise ValueError(f'{delta.name}: {len(colliding)} node ids collide with the graph, e.g. {colliding[0]}')
+            delta.apply(self.graph)
+            self.node_ids.add_namespaces(delta.namespaces)
+            self.node_ids.reserve_ids(node for node, _ in delta.added_nodes)
+        self._edge_index = None
+
+    def get_open_space_crop(self, open_space: OpenSpace, graph=None):
+        """
+        :param graph: graph to crop, defaults to the graph of the controller
+        :return: copy of the part of the graph around the given open space, i.e. the nodes inside the extended
+                 open space bbox and every edge whose bounding box meets it, including its outer end node.
+                 So the entries of the open space can snap to the same street edges as in the complete graph
+        """
+        graph = graph if graph is not None else self.graph
+        bbox = open_space.get_boundaries(boundary_degree_extension=OPEN_SPACE_CROP_EXTENSION)
+        nodes = [node for node, data in graph.nodes(data=True)
+                 if bbox.min_lat <= data['y'] <= bbox.max_lat and bbox.min_lon <= data['x'] <= bbox.max_lon]
+        edges = []
+        for u, v, key in graph.edges(keys=True):
+            data_u, data_v = graph.nodes[u], graph.nodes[v]
+            if min(data_u['y'], data_v['y']) <= bbox.max_lat and max(data_u['y'], data_v['y']) >= bbox.min_lat \
+                    and min(data_u['x'], data_v['x']) <= bbox.max_lon and max(data_u['x'], data_v['x']) >= bbox.min_lon:
+                edges.append((u, v, key))
+        crop = graph.edge_subgraph(edges).copy()
+        crop.add_nodes_from((node, graph.nodes[node]) for node in nodes if node not in crop)
+        return crop
 
     def create_complete_open_space_plot(self, open_space, output_dir="/osm_data", file_name=None):
         buildings = self.indoor_map_c.building_cc.get_buildings()
@@ -72,53 +185,248 @@ class OSMController:
                         file_name=file_name if file_name else graph_open_space.file_name,
                         minimized=False)
 
+    def get_map(self, bbox: BBox = BAMBERG_BBOX):
+        """
+        :return: the street graph of the bbox, cropped from the local city extract if available or downloaded
+        """
+        if self.map_provider.is_available():
+            graph = self.map_provider.get_crop(bbox)
+        else:
+            logger.warning(f'City map {self.map_provider.osm_file} missing, download the bbox from overpass. '
+                           f'Run the refresh_city_map command to work offline')
+            graph = self.download_map(bbox)
+        check_osm_node_ids(graph)
+        return graph
+
     def download_map(self, bbox: BBox = BAMBERG_BBOX):
-        return ox.graph_from_bbox(*bbox.get_bbox(), simplify=False)
+        graph = ox.graph_from_bbox(*bbox.get_bbox(), simplify=False)
+        return self.load_profile.apply(graph) if self.load_profile else graph
 
     @staticmethod
-    def load_map():
-        return ox.graph_from_file(f'{OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}.osm')
+    def load_map(load_profile: LoadProfile = None):
+        """
+        :return: the street graph of the osm file graphhopper serves
+        """
+        graph = ox.graph_from_file(f'{OSM_OUTPUT_DIR}/{GRAPHHOPPER_LIVE_LINK}/{OSM_OUTPUT_FILENAME}.osm')
+        return load_profile.apply(graph) if load_profile else graph
 
     def plot_graph(self, output_dir=None, file_name=None, minimized=True):
         if output_dir and file_name and not minimized:
-            ox.plot_graph(self.graph,
-                          save=True,
-                          file_format='svg',
-                          filename=f'{output_dir}/{file_name}',
-                          edge_linewidth=0.5,
-                          node_size=1)
+            render_svg(self.graph, f'{output_dir}/{file_name}.svg', edge_linewidth=0.5, node_size=1)
         else:
-            ox.plot_graph(self.graph,
-                          save=True,
-                          file_format='svg',
-                          filename=f'{OSM_OUTPUT_DIR}/network_plot',
-                          edge_linewidth=0.025,
-                          node_size=0.1)
-
-    def save_graph(self):
-        ox.save_graph_osm(self.graph,
-                          filename=f'{OSM_OUTPUT_FILENAME}.osm',
-                          folder=OSM_OUTPUT_DIR,
-                          # oneway=False,
-                          )
-        logger.info(f'Saved osm xml to {OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}.osm')
+            render_svg(self.graph, f'{OSM_OUTPUT_DIR}/network_plot.svg', edge_linewidth=0.025, node_size=0.1)
+
+    def prepare_graph_for_export(self, prune=True, keep_islands: List[str] = None, simplify=True,
+                                 deduplicate=True) -> dict:
+        """
+        Reduce the enriched graph before save_graph. Call it after the last enrichment and after save_build,
+        the open space deltas only apply to the complete graph
+
+        :param prune: remove components which are not connected to the main component, see prune_graph_components
+        :param keep_islands: node id namespaces whose components are kept, see prune_graph_components
+        :param simplify: merge degree-2 street chains, see simplify_graph
+        :param deduplicate: keep one edge per node pair, see deduplicate_graph_edges
+        :return: statistics of every stage
+        """
+        stats = {}
+        if prune:
+            stats['prune'] = self.prune_graph_components(keep_islands)
+        if simplify:
+            stats['simplify'] = self.simplify_graph()
+        if deduplicate:
+            stats['deduplicate'] = self.deduplicate_graph_edges()
+        return stats
+
+    def prune_graph_components(self, keep_islands: List[str] = None) -> dict:
+        """
+        Keep only the largest connected component and the components with nodes of the keep_islands namespaces
+        or of namespaces nested into them
+
+        :param keep_islands: node id namespaces, e.g. open_space:<file name>, building:<key> or
+                             open_space:<file name>/building:<key>. building:<key> matches the building in every
+                             open space
+        :return: node and edge counts before and after and the namespaces of the dropped nodes
+        """
+        keep_islands = keep_islands if keep_islands else []
+        namespaces = [namespace for namespace in self.node_ids.get_namespaces()
+                      if any(is_nested_namespace(namespace, island) for island in keep_islands)]
+        for island in keep_islands:
+            if not any(is_nested_namespace(namespace, island) for namespace in namespaces):
+                logger.warning(f'Island {island} matches no node id namespace of the graph')
+        blocks = {self.node_ids.get_block(namespace) for namespace in namespaces}
+        keep_nodes = [node for node in self.graph.nodes if self.node_ids.get_node_block(node) in blocks]
+        stats = prune_components(self.graph, keep_nodes, label_node=self.node_ids.get_node_namespace)
+        self._edge_index = None
+        return stats
+
+    def deduplicate_graph_edges(self) -> dict:
+        """
+        Remove parallel and reverse duplicates of edges, e.g. visibility edges along the walkable area ring
+        or the reverse edges of twoway streets, which graphhopper would import as separate ways
+
+        :return: node and edge counts before and after and the removed edges per edge type
+        """
+        stats = deduplicate_edges(self.graph)
+        self._edge_index = None
+        return stats
+
+    def simplify_graph(self) -> dict:
+        """
+        Merge degree-2 street chains, nodes of open spaces, buildings and entries are kept
+
+        :return: node and edge counts before and after
+        """
+        stats = simplify_graph(self.graph, [node for node in self.graph.nodes if self.node_ids.is_generated_id(node)])
+        self._edge_index = None
+        return stats
+
+    def save_graph(self, file_format=OSM_XML):
+        """
+        Stream the graph to the graphhopper input file
+
+        :param file_format: OSM_XML writes data.osm, OSM_PBF writes data.osm.pbf and requires pyosmium
+        """
+        if file_format == OSM_PBF:
+            path = f'{OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}.osm.pbf'
+            write_osm_pbf(self.graph, path)
+        else:
+            path = f'{OSM_OUTPUT_DIR}/{OSM_OUTPUT_FILENAME}.osm'
+            write_osm_xml(self.graph, path)
+        logger.info(f'Saved graph to {path}')
+
+    def save_graph_snapshot(self, path=GRAPH_SNAPSHOT_FILE):
+        """
+        Store the enriched graph as array snapshot, which loads much faster than osm xml
+        """
+        snapshot = GraphSnapshot.from_graph(self.graph)
+        snapshot.save(path)
+        logger.info(f'Saved {snapshot} to {path}')
+
+    def load_graph_snapshot(self, path=GRAPH_SNAPSHOT_FILE):
+        """
+        Replace the graph with a snapshot stored by save_graph_snapshot, the snapshot is rebuilt into a networkx graph
+        """
+        snapshot = GraphSnapshot.load(path)
+        self.graph = snapshot.to_graph()
+        self.node_ids.reserve_ids(self.graph.nodes)
+        self._edge_index = None
+        logger.info(f'Loaded {snapshot} from {path}')
+
+    def save_build(self, snapshot_path=GRAPH_SNAPSHOT_FILE, manifest_path=BUILD_MANIFEST_FILE):
+        """
+        Store the graph as snapshot together with the build manifest and the delta of every open space,
+        which rebuild_changed_open_spaces needs to replace single open spaces later on
+        """
+        if self.build_manifest is None:
+            raise ValueError('Only builds with track_builds can be stored')
+        delta_store = OpenSpaceGraphCache(cache_dir=get_delta_dir(manifest_path), max_size=math.inf)
+        keys = {entry['key'] for entry in self.build_manifest.open_spaces.values()}
+        for key in keys:
+            if key not in delta_store:
+                delta_store.put(key, self._open_space_builds[key])
+        for entry in delta_store.get_entries():
+            if entry['key'] not in keys:
+                delta_store.remove(entry['key'])
+        self.save_graph_snapshot(snapshot_path)
+        self.build_manifest.save(manifest_path)
+        logger.info(f'Saved build manifest of {len(keys)} open spaces to {manifest_path}')
+
+    def rebuild_changed_open_spaces(self, snapshot_path=GRAPH_SNAPSHOT_FILE, manifest_path=BUILD_MANIFEST_FILE,
+                                    workers=None) -> dict:
+        """
+        Load a build stored by save_build and replace only the open spaces whose build inputs changed,
+        i.e. their geojson, their buildings or the street graph around them. The result is stored again
+
+        :param workers: number of worker processes for the changed open spaces
+        :return: file names of the added, changed, removed and unchanged open spaces
+        """
+        manifest = BuildManifest.load(manifest_path)
+        delta_store = OpenSpaceGraphCache(cache_dir=get_delta_dir(manifest_path), max_size=math.inf)
+        self.reduced_visibility = manifest.reduced_visibility
+        self.visibility_mode = manifest.visibility_mode
+        street_graph = self.get_map(manifest.bbox)
+        if get_graph_hash(street_graph) != manifest.street_graph_hash:
+            raise ValueError('The street graph changed since the stored build, run a full build')
+        self.load_graph_snapshot(snapshot_path)
+        self.node_ids.add_namespaces(manifest.get_namespaces())
+
+        buildings = self.indoor_map_c.building_cc.get_buildings()
+        open_spaces = [open_space for open_space in self.osp_config_c.get_open_spaces()
+                       if self._is_contained_open_space(open_space, manifest.bbox)]
+        keys = {open_space.file_name: OpenSpaceGraphCache.get_key(open_space, buildings,
+                                                                  self.get_open_space_crop(open_space, street_graph),
+                                                                  manifest.reduced_visibility,
+                                                                  manifest.visibility_mode)
+                for open_space in open_spaces}
+        report = {'added': sorted(name for name in keys if name not in manifest.open_spaces),
+                  'changed': sorted(name for name in keys
+                                    if name in manifest.open_spaces and manifest.open_spaces[name]['key'] != keys[name]),
+                  'removed': sorted(name for name in manifest.open_spaces if name not in keys),
+                  'unchanged': sorted(name for name in keys
+                                      if name in manifest.open_spaces and manifest.open_spaces[name]['key'] == keys[name])}
+
+        for name in report['changed'] + report['removed']:
+            entry = manifest.open_spaces.pop(name)
+            delta = delta_store.get(entry['key'])
+            if delta is None:
+                raise ValueError(f'{name}: stored delta {entry["key"]} is missing, run a full build')
+            logger.info(f'{name}: revert {delta}')
+            delta.revert(self.graph, street_graph)
+        if report['changed'] or report['removed']:
+            # Reverting restores streets which overlapping open spaces may have removed as well
+            for name in report['unchanged']:
+                entry = manifest.open_spaces[name]
+                delta_store.get(entry['key']).apply_removals(self.graph)
+
+        rebuilt = set(report['added'] + report['changed'])
+        self.build_manifest = manifest
+        self._open_space_builds = {}
+        self._insert_open_spaces_from_deltas([open_space for open_space in open_spaces
+                                              if open_space.file_name in rebuilt],
+                                             buildings, workers, street_graph=street_graph)
+        self.save_build(snapshot_path, manifest_path)
+        return report
 
     def add_osm_edge(self, from_id, to_id, name, maxspeed=None, type=EDGE_TYPES.NORMAL):
         if maxspeed:
-            self.graph.add_edge(from_id, to_id,
-                                highway='pedestrian',
-                                lanes='1',
-                                name=name,
-                                oneway=True,
-                                maxspeed=maxspeed,
-                                color_label=type)
+            key = self.graph.add_edge(from_id, to_id,
+                                      highway='pedestrian',
+                                      lanes='1',
+                                      name=name,
+                                      oneway=True,
+                                      maxspeed=maxspeed,
+                                      color_label=type)
         else:
-            self.graph.add_edge(from_id, to_id,
-                                highway='pedestrian',
-                                lanes='1',
-                                name=name,
-                                oneway=True,
-                                color_label=type)
+            key = self.graph.add_edge(from_id, to_id,
+                                      highway='pedestrian',
+                                      lanes='1',
+                                      name=name,
+                                      oneway=True,
+                                      color_label=type)
+        if self._has_edge_index():
+            self._edge_index.add_edge(from_id, to_id, key, self.get_coord_from_id(from_id),
+                                      self.get_coord_from_id(to_id))
+
+    def remove_osm_edge(self, from_id, to_id, key=None):
+        """
+        Remove an edge from the graph, without a key the last added edge between the nodes is removed
+        """
+        if key is None:
+            key = list(self.graph[from_id][to_id])[-1]
+        self.graph.remove_edge(from_id, to_id, key)
+        if self._has_edge_index():
+            self._edge_index.remove_edge(from_id, to_id, key)
+
+    def remove_osm_nodes(self, node_ids: List[int]):
+        """
+        Remove the nodes and their edges from the graph
+        """
+        if self._has_edge_index():
+            for node_id in node_ids:
+                for u, v, key in list(self.graph.in_edges(node_id, keys=True)) \
+                                 + list(self.graph.out_edges(node_id, keys=True)):
+                    self._edge_index.remove_edge(u, v, key)
+        self.graph.remove_nodes_from(node_ids)
 
     def add_osm_node(self, coords: List[List[float]]):
         node_id = self._get_new_node_id()
@@ -126,17 +434,69 @@ class OSMController:
         return node_id
 
     def _get_new_node_id(self) -> int:
-        self.current_osm_id += 1
-        return self.current_osm_id
+        return self.node_ids.get_new_id(NODE_ID_NAMESPACE_SEPARATOR.join(self._node_id_namespaces)
+                                        or DEFAULT_NODE_ID_NAMESPACE)
+
+    @contextmanager
+    def node_id_namespace(self, namespace: str):
+        """
+        Allocate the ids of the nodes added inside the with block from a namespace nested into the current one.
+        Outside of all namespaces the ids are allocated from DEFAULT_NODE_ID_NAMESPACE
+        """
+        self._node_id_namespaces.append(namespace)
+        try:
+            yield
+        finally:
+            self._node_id_namespaces.pop()
 
     def get_nearest_edge(self, coord):
-        return ox.get_nearest_edge(self.graph, coord[::-1])
+        """
+        :param coord: [x, y] coordinate
+        :return: (geometry, u, v) of the nearest edge
+        """
+        return self.get_nearest_edges([coord])[0]
+
+    def get_nearest_edges(self, coords: List[List[float]]) -> list:
+        """
+        Snap many coordinates at once with the edge index of the graph
+
+        :param coords: [x, y] coordinates
+        :return: (geometry, u, v) of the nearest edge for every coordinate
+        """
+        nearest_edges = []
+        for nearest_edge in self.get_edge_index().get_nearest_edges(coords):
+            if nearest_edge is None:
+                raise ValueError('Graph has no edges')
+            u, v, _ = nearest_edge
+            nearest_edges.append((LineString([self.get_coord_from_id(u), self.get_coord_from_id(v)]), u, v))
+        return nearest_edges
+
+    def get_edge_index(self) -> EdgeIndex:
+        """
+        :return: the edge index of the current graph, built on first use
+        """
+        if not self._has_edge_index():
+            self._edge_index = EdgeIndex.from_graph(self.graph)
+            self._edge_index_graph = self.graph
+        return self._edge_index
+
+    def _has_edge_index(self) -> bool:
+        return self._edge_index is not None and self._edge_index_graph is self.graph
 
     def get_coord_from_id(self, node_id):
         node = self.graph.node[node_id]
         return [node['x'], node['y']]
 
     def _insert_building_to_graph(self, graph_open_space):
+        graph_buildings = self._add_buildings_to_graph(graph_open_space)
+        self._add_building_entries_to_open_space(graph_open_space, graph_buildings)
+
+    def _add_buildings_to_graph(self, graph_open_space) -> list:
+        """
+        Add the building graphs, their entries snap to the open space rings and the streets
+
+        :return: the inserted graph buildings
+        """
         graph_open_space.add_walkable_edges()
         graph_open_space.add_restricted_area_edges()
         graph_buildings = self.indoor_map_c.get_graph_buildings(graph_open_space.buildings)
@@ -144,22 +504,35 @@ class OSMController:
         self.indoor_map_c.add_buildings_to_graph(graph_buildings)
         graph_open_space.remove_walkable_edges()
         graph_open_space.remove_restricted_area_edges()
-        self.plot_graph(output_dir="/osm_data", file_name=f'{graph_open_space.file_name}_building_without_entry',
-                        minimized=False)
+        if self.debug_plots:
+            self.plot_graph(output_dir=OSM_OUTPUT_DIR,
+                            file_name=f'{graph_open_space.file_name}_building_without_entry', minimized=False)
+        return graph_buildings
+
+    def _add_building_entries_to_open_space(self, graph_open_space, graph_buildings: list):
         for building in graph_buildings:
             for staircase in building.graph_staircases:
                 for entry in staircase.get_not_blocked_entries():
                     graph_open_space.add_building_entry_to_open_space(entry)
-        self.plot_graph(output_dir="/osm_data", file_name=f'{graph_open_space.file_name}_building', minimized=False)
+        if self.debug_plots:
+            self.plot_graph(output_dir=OSM_OUTPUT_DIR, file_name=f'{graph_open_space.file_name}_building',
+                            minimized=False)
 
     def _insert_open_space(self, buildings: List[Building], graph_open_space: GraphOpenSpace):
-        self._instert_open_space_buildings(buildings, graph_open_space)
-        self._insert_open_space_visibility_graph(graph_open_space)
-        self._insert_open_space_entries(graph_open_space)
+        with self.node_id_namespace(get_open_space_node_id_namespace(graph_open_space)):
+            graph_open_space.set_buildings(buildings)
+            graph_buildings = self._add_buildings_to_graph(graph_open_space)
+            # The entries are spliced into the rings after the visibility graph is built, so each entry only
+            # updates the visibility edges around it instead of the complete visibility graph being built with all
+            # entries
+            self._insert_open_space_visibility_graph(graph_open_space)
+            self._add_building_entries_to_open_space(graph_open_space, graph_buildings)
+            self._insert_open_space_entries(graph_open_space)
 
     def _instert_open_space_buildings(self, buildings: List[Building], graph_open_space: GraphOpenSpace):
-        graph_open_space.set_buildings(buildings)
-        self._insert_building_to_graph(graph_open_space)
+        with self.node_id_namespace(get_open_space_node_id_namespace(graph_open_space)):
+            graph_open_space.set_buildings(buildings)
+            self._insert_building_to_graph(graph_open_space)
 
     def _insert_open_space_walkable(self, graph_open_space: GraphOpenSpace):
         graph_open_space.add_walkable_edges()
@@ -230,13 +603,36 @@ class OSMController:
                         minimized=False)
 
     def _init_open_space_graph(self, open_space):
-        self.graph = self.download_map(open_space.get_boundaries(boundary_degree_extension=0.0005))
-        graph_open_space = GraphOpenSpace(open_space, osmm=self)
+        self.graph = self.get_map(open_space.get_boundaries(boundary_degree_extension=OPEN_SPACE_CROP_EXTENSION))
+        graph_open_space = self._get_graph_open_space(open_space)
         return graph_open_space
 
+    def _get_graph_open_space(self, open_space: OpenSpace) -> GraphOpenSpace:
+        with self.node_id_namespace(get_open_space_node_id_namespace(open_space)):
+            return GraphOpenSpace(open_space, osmm=self, visibility_mode=self.visibility_mode,
+                                  reduced_visibility=self.reduced_visibility)
+
     def _is_contained_open_space(self, open_space: OpenSpace, bbox: BBox):
         open_space_bbox = open_space.get_boundaries()
         return bbox.min_lat < open_space_bbox.min_lat \
                and bbox.min_lon < open_space_bbox.min_lon \
                and bbox.max_lat > open_space_bbox.max_lat \
                and bbox.max_lon > open_space_bbox.max_lon
+
+
+def build_open_space_delta(task) -> GraphDelta:
+    """
+    Worker entry point of the parallel build. Builds a single open space on a crop of the graph.
+    :param task: tuple of open space, buildings, graph crop, the config dirs and the visibility options
+    :return: the changes the build made to the crop
+    """
+    open_space, buildings, crop, open_space_config_dir, building_config_dir, visibility_mode, reduced_visibility = task
+    osmm = OSMController(open_space_config_dir=open_space_config_dir, building_config_dir=building_config_dir,
+                         visibility_mode=visibility_mode, reduced_visibility=reduced_visibility)
+    osmm.graph = crop.copy()
+    osmm._insert_open_space(buildings, osmm._get_graph_open_space(open_space))
+    return GraphDelta.from_graphs(open_space.file_name, crop, osmm.graph, osmm.node_ids.get_namespaces())
+
+
+def get_open_space_node_id_namespace(open_space: OpenSpace) -> str:
+    return f'open_space:{open_space.file_name}'
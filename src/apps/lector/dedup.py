@@ -0,0 +1,61 @@
+import logging
+from collections import Counter
+
+import networkx as nx
+
+from apps.lector.models import EDGE_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Of duplicate edges the edge with the first type is kept, specific building and open space edges win over the
+# visibility edges which are inserted between every visible node pair
+EDGE_TYPE_PRECEDENCE = [EDGE_TYPES.BUILDING_STAIRCASE, EDGE_TYPES.BUILDING_ENTRY, EDGE_TYPES.OPEN_SPACE_ENTRY,
+                        EDGE_TYPES.OPEN_SPACE_WALKABLE, EDGE_TYPES.OPEN_SPACE_RESTRICTED,
+                        EDGE_TYPES.OPEN_SPACE_VISIBLITY, EDGE_TYPES.NORMAL]
+
+
+def deduplicate_edges(graph: nx.MultiDiGraph) -> dict:
+    """
+    Keep one edge of every unordered node pair, in place. Edges with different inner nodes, e.g. two simplified
+    streets between the same junctions, are no duplicates.
+    The kept edge is the one with the first type in EDGE_TYPE_PRECEDENCE, then the one with a maxspeed, then
+    the first in node and key order. If the duplicates run in both directions, the kept edge is no oneway
+
+    :return: node and edge counts before and after and the number of removed edges per edge type
+    """
+    stats = {'nodes_before': len(graph), 'edges_before': graph.number_of_edges()}
+    groups = {}
+    for u, v, key, data in graph.edges(keys=True, data=True):
+        groups.setdefault(_get_pair_key(u, v, data), []).append((u, v, key, data))
+
+    removed_types = Counter()
+    bidirectional = 0
+    for edges in groups.values():
+        if len(edges) < 2:
+            continue
+        kept_u, kept_v, kept_key, kept_data = min(edges, key=_get_precedence)
+        for u, v, key, data in edges:
+            if (u, v, key) != (kept_u, kept_v, kept_key):
+                graph.remove_edge(u, v, key)
+                removed_types[data.get('color_label', EDGE_TYPES.NORMAL).name] += 1
+        if kept_data.get('oneway') and any(u != kept_u for u, _, _, _ in edges):
+            kept_data['oneway'] = False
+            bidirectional += 1
+
+    stats.update({'nodes_after': len(graph), 'edges_after': graph.number_of_edges(),
+                  'removed': dict(removed_types), 'bidirectional': bidirectional})
+    logger.info(f'Deduplicated edges: {stats}')
+    return stats
+
+
+def _get_pair_key(u: int, v: int, data: dict) -> tuple:
+    inner_nodes = tuple(data.get('inner_nodes', ()))
+    if u <= v:
+        return u, v, inner_nodes
+    return v, u, inner_nodes[::-1]
+
+
+def _get_precedence(edge) -> tuple:
+    u, v, key, data = edge
+    return (EDGE_TYPE_PRECEDENCE.index(data.get('color_label', EDGE_TYPES.NORMAL)),
+            data.get('maxspeed') is None, u, v, key)
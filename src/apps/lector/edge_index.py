@@ -0,0 +1,127 @@
+import math
+from typing import List, Tuple
+
+import networkx as nx
+
+# Grid cell size in degrees, about 70m x 110m in Bamberg
+EDGE_INDEX_CELL_SIZE = 0.001
+
+
+class EdgeIndex:
+    """
+    Uniform grid over the straight edge segments of a graph for nearest edge queries.
+    Every edge is registered in all cells its bounding box covers
+    """
+
+    def __init__(self, cell_size=EDGE_INDEX_CELL_SIZE):
+        self.cell_size = cell_size
+        self._segments = {}
+        self._cells = {}
+        self._sequence = 0
+        self._cell_bounds = None
+
+    @staticmethod
+    def from_graph(graph: nx.MultiDiGraph, cell_size=EDGE_INDEX_CELL_SIZE) -> 'EdgeIndex':
+        edge_index = EdgeIndex(cell_size)
+        nodes = graph.nodes
+        for u, v, key in graph.edges(keys=True):
+            edge_index.add_edge(u, v, key, (nodes[u]['x'], nodes[u]['y']), (nodes[v]['x'], nodes[v]['y']))
+        return edge_index
+
+    def add_edge(self, u: int, v: int, key: int, coord_u: Tuple[float, float], coord_v: Tuple[float, float]):
+        edge = (u, v, key)
+        if edge in self._segments:
+            self.remove_edge(u, v, key)
+        self._segments[edge] = (coord_u[0], coord_u[1], coord_v[0], coord_v[1], self._sequence)
+        self._sequence += 1
+        for cell in self._get_edge_cells(edge):
+            self._cells.setdefault(cell, {})[edge] = None
+        min_x, min_y, max_x, max_y = self._get_edge_cell_bounds(edge)
+        if self._cell_bounds is None:
+            self._cell_bounds = (min_x, min_y, max_x, max_y)
+        else:
+            bounds = self._cell_bounds
+            self._cell_bounds = (min(bounds[0], min_x), min(bounds[1], min_y),
+                                 max(bounds[2], max_x), max(bounds[3], max_y))
+
+    def remove_edge(self, u: int, v: int, key: int):
+        edge = (u, v, key)
+        if edge not in self._segments:
+            return
+        for cell in self._get_edge_cells(edge):
+            cell_edges = self._cells[cell]
+            del cell_edges[edge]
+            if not cell_edges:
+                del self._cells[cell]
+        del self._segments[edge]
+
+    def get_nearest_edge(self, coord: List[float]) -> Tuple[int, int, int] or None:
+        """
+        :param coord: [x, y] coordinate
+        :return: (u, v, key) of the edge with the minimal euclidean distance, the earliest added edge on ties,
+                 or None if the index is empty
+        """
+        if not self._segments:
+            return None
+        x, y = coord
+        cell_x, cell_y = self._get_cell(x, y)
+        min_x, min_y, max_x, max_y = self._cell_bounds
+        max_radius = max(cell_x - min_x, max_x - cell_x, cell_y - min_y, max_y - cell_y, 0)
+        seen = set()
+        best_edge, best_distance, best_sequence = None, math.inf, math.inf
+        radius = 0
+        while radius <= max_radius:
+            for cell in self._get_ring_cells(cell_x, cell_y, radius):
+                for edge in self._cells.get(cell, ()):
+                    if edge in seen:
+                        continue
+                    seen.add(edge)
+                    ax, ay, bx, by, sequence = self._segments[edge]
+                    distance = _point_segment_distance(x, y, ax, ay, bx, by)
+                    if (distance, sequence) < (best_distance, best_sequence):
+                        best_edge, best_distance, best_sequence = edge, distance, sequence
+            # Edges outside the searched cells are at least radius cells away
+            if best_edge is not None and best_distance < radius * self.cell_size:
+                break
+            radius += 1
+        return best_edge
+
+    def get_nearest_edges(self, coords: List[List[float]]) -> List[Tuple[int, int, int] or None]:
+        return [self.get_nearest_edge(coord) for coord in coords]
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def _get_cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _get_edge_cell_bounds(self, edge: Tuple[int, int, int]) -> Tuple[int, int, int, int]:
+        ax, ay, bx, by, _ = self._segments[edge]
+        min_x, min_y = self._get_cell(min(ax, bx), min(ay, by))
+        max_x, max_y = self._get_cell(max(ax, bx), max(ay, by))
+        return min_x, min_y, max_x, max_y
+
+    def _get_edge_cells(self, edge: Tuple[int, int, int]):
+        min_x, min_y, max_x, max_y = self._get_edge_cell_bounds(edge)
+        for cell_x in range(min_x, max_x + 1):
+            for cell_y in range(min_y, max_y + 1):
+                yield cell_x, cell_y
+
+    @staticmethod
+    def _get_ring_cells(cell_x: int, cell_y: int, radius: int):
+        if radius == 0:
+            yield cell_x, cell_y
+            return
+        for offset in range(-radius, radius + 1):
+            yield cell_x + offset, cell_y - radius
+            yield cell_x + offset, cell_y + radius
+        for offset in range(-radius + 1, radius):
+            yield cell_x - radius, cell_y + offset
+            yield cell_x + radius, cell_y + offset
+
+
+def _point_segment_distance(px: float, py: float, ax: float, ay: float, bx: float, by: float) -> float:
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = 0.0 if length == 0 else max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - ax - t * dx, py - ay - t * dy)
@@ -0,0 +1,102 @@
+import logging
+from typing import List, Tuple
+
+import networkx as nx
+
+logger = logging.getLogger(__name__)
+
+
+class GraphDelta:
+    """
+    Compact description of the changes a build made to a crop of the main graph.
+    Used to transfer subgraph builds between processes and to replay them into the main graph
+    """
+
+    def __init__(self, name: str, removed_nodes: List[int], removed_edges: List[Tuple[int, int, int]],
+                 added_nodes: List[Tuple[int, dict]], added_edges: List[Tuple[int, int, int, dict]],
+                 namespaces: List[str] = None):
+        """
+        :param namespaces: node id namespaces of the build, so the main graph can name the owners of the added nodes
+        """
+        self.name = name
+        self.removed_nodes = removed_nodes
+        self.removed_edges = removed_edges
+        self.added_nodes = added_nodes
+        self.added_edges = added_edges
+        self.namespaces = namespaces if namespaces else []
+
+    @staticmethod
+    def from_graphs(name: str, before: nx.MultiDiGraph, after: nx.MultiDiGraph,
+                    namespaces: List[str] = None) -> 'GraphDelta':
+        """
+        :param name: name of the delta, e.g. the open space file name
+        :param before: the graph before the build
+        :param after: the graph after the build
+        :param namespaces: node id namespaces of the build
+        :return: the delta which transforms before into after
+        """
+        removed_nodes = [node for node in before.nodes if node not in after]
+        # An edge whose key was reused for other data counts as removed and added
+        removed_edges = [(u, v, key) for u, v, key, data in before.edges(keys=True, data=True)
+                         if u in after and v in after and after.get_edge_data(u, v, key) != data]
+        added_nodes = [(node, data) for node, data in after.nodes(data=True) if node not in before]
+        added_edges = [(u, v, key, data) for u, v, key, data in after.edges(keys=True, data=True)
+                       if before.get_edge_data(u, v, key) != data]
+        return GraphDelta(name, removed_nodes, removed_edges, added_nodes, added_edges, namespaces)
+
+    def apply(self, graph: nx.MultiDiGraph):
+        """
+        Replay the delta into the given graph. Added edges keep their keys, so removed_edges and revert address
+        the same edges as in the crop of the build
+
+        :raises ValueError: if an added edge ends in a node which is not part of the graph, e.g. a street node
+                            another open space removed, or if its key is taken by another edge of the graph.
+                            The graph is not changed in this case
+        """
+        added_node_ids = {node for node, _ in self.added_nodes}
+        removed_node_ids = set(self.removed_nodes)
+        missing_nodes = {node for u, v, _, _ in self.added_edges for node in (u, v)
+                         if node not in added_node_ids and (node not in graph or node in removed_node_ids)}
+        if missing_nodes:
+            raise ValueError(f'{self.name}: {len(missing_nodes)} edge end nodes are missing in the graph, '
+                             f'e.g. {min(missing_nodes)}')
+        removed_edges = set(self.removed_edges)
+        taken_keys = [(u, v, key) for u, v, key, _ in self.added_edges
+                      if graph.has_edge(u, v, key) and (u, v, key) not in removed_edges]
+        if taken_keys:
+            raise ValueError(f'{self.name}: {len(taken_keys)} edge keys are taken in the graph, e.g. {taken_keys[0]}')
+        self.apply_removals(graph)
+        graph.add_nodes_from(self.added_nodes)
+        graph.add_edges_from(self.added_edges)
+
+    def apply_removals(self, graph: nx.MultiDiGraph):
+        """
+        Remove the nodes and edges the delta removes, if they are still part of the graph
+        """
+        graph.remove_edges_from([edge for edge in self.removed_edges if graph.has_edge(*edge)])
+        graph.remove_nodes_from(self.removed_nodes)
+
+    def revert(self, graph: nx.MultiDiGraph, base: nx.MultiDiGraph):
+        """
+        Undo the delta in the given graph
+
+        :param graph: graph the delta was applied to
+        :param base: graph with the original nodes and edges the delta removed, e.g. the street graph of the build
+        """
+        added_node_ids = {node for node, _ in self.added_nodes}
+        graph.remove_nodes_from([node for node in added_node_ids if node in graph])
+        graph.remove_edges_from([(u, v, key) for u, v, key, data in self.added_edges
+                                 if graph.get_edge_data(u, v, key) == data])
+
+        restored_nodes = [node for node in self.removed_nodes if node in base and node not in graph]
+        graph.add_nodes_from((node, base.nodes[node]) for node in restored_nodes)
+        restored_edges = [(u, v, key) for u, v, key in self.removed_edges if base.has_edge(u, v, key)]
+        for node in restored_nodes:
+            restored_edges.extend(base.out_edges(node, keys=True))
+            restored_edges.extend(base.in_edges(node, keys=True))
+        graph.add_edges_from((u, v, key, base.edges[u, v, key]) for u, v, key in set(restored_edges)
+                             if u in graph and v in graph and not graph.has_edge(u, v, key))
+
+    def __str__(self):
+        return f'GraphDelta {self.name}: -{len(self.removed_nodes)} nodes, -{len(self.removed_edges)} edges, ' \
+               f'+{len(self.added_nodes)} nodes, +{len(self.added_edges)} edges'
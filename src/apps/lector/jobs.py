@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+# Finished jobs which are kept for status requests
+JOB_HISTORY_SIZE = 1000
+
+_plot_job_queue = None
+_plot_job_queue_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, key: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = JOB_PENDING
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._done = threading.Event()
+
+    def is_finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def __str__(self):
+        return f'Job {self.id}: {self.key} {self.status}'
+
+
+class JobQueue:
+    """
+    Runs jobs in a bounded thread pool. A job submitted while a job with the same key is pending or running
+    is not started again, the submitter gets the running job instead
+    """
+
+    def __init__(self, max_workers: int, history_size=JOB_HISTORY_SIZE):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lector-job')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self.history_size = history_size
+
+    def submit(self, key: str, function: Callable[[], None]) -> Job:
+        """
+        :param key: identifies the result of the job, e.g. the open space file name
+        :param function: builds the result
+        :return: the new job or the pending or running job of the key
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job:
+                return job
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._active[key] = job
+        self._executor.submit(self._run, job, function)
+        logger.info(f'Submitted {job}')
+        return job
+
+    def get_job(self, job_id: str) -> Job or None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str, timeout: float = None) -> Job or None:
+        """
+        :return: the job after it finished or None if the job is unknown
+        """
+        job = self.get_job(job_id)
+        if job:
+            job._done.wait(timeout)
+        return job
+
+    def _run(self, job: Job, function: Callable[[], None]):
+        job.status = JOB_RUNNING
+        try:
+            function()
+            job.status = JOB_DONE
+        except Exception as e:
+            logger.exception(f'{job} failed')
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._active.pop(job.key, None)
+                self._prune_history()
+            job._done.set()
+            logger.info(f'Finished {job}')
+
+    def _prune_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished()]
+        for job_id in finished[:max(len(finished) - self.history_size, 0)]:
+            del self._jobs[job_id]
+
+
+def get_plot_job_queue() -> JobQueue:
+    """
+    :return: the job queue of the open space plots of this process
+    """
+    global _plot_job_queue
+    with _plot_job_queue_lock:
+        if _plot_job_queue is None:
+            _plot_job_queue = JobQueue(max_workers=settings.OPEN_SPACE_PLOT_WORKERS)
+        return _plot_job_queue
@@ -0,0 +1,77 @@
+import logging
+import sys
+from typing import Iterable
+
+import networkx as nx
+
+logger = logging.getLogger(__name__)
+
+# Highway types which pedestrians can walk on
+PEDESTRIAN_HIGHWAYS = ['footway', 'pedestrian', 'path', 'steps', 'living_street', 'residential', 'service',
+                       'unclassified', 'track', 'corridor', 'road', 'tertiary', 'tertiary_link', 'secondary',
+                       'secondary_link', 'primary', 'primary_link']
+# Attributes used by the graph building, the exports and the snapshots
+PROFILE_NODE_ATTRIBUTES = ['osmid', 'x', 'y', 'highway']
+PROFILE_EDGE_ATTRIBUTES = ['osmid', 'name', 'highway', 'lanes', 'maxspeed', 'length', 'oneway']
+PROFILE_INTERNED_ATTRIBUTES = ['highway', 'name', 'lanes', 'maxspeed']
+
+
+class LoadProfile:
+    """
+    Filter applied to every street graph when it is loaded: keeps the edges of the given highway types and
+    the whitelisted attributes. Repeated string values are interned, so equal names share one object
+    """
+
+    def __init__(self, name: str, highways: Iterable[str] = None, node_attributes=PROFILE_NODE_ATTRIBUTES,
+                 edge_attributes=PROFILE_EDGE_ATTRIBUTES, interned_attributes=PROFILE_INTERNED_ATTRIBUTES):
+        """
+        :param name: identifies the profile, e.g. in the city map cache
+        :param highways: highway types to keep, None keeps all edges
+        """
+        self.name = name
+        self.highways = set(highways) if highways is not None else None
+        self.node_attributes = set(node_attributes)
+        self.edge_attributes = set(edge_attributes)
+        self.interned_attributes = set(interned_attributes)
+
+    def apply(self, graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+        """
+        Filter the graph in place. Nodes which lose all their edges are removed
+
+        :return: the filtered graph
+        """
+        nodes_before, edges_before = len(graph), graph.number_of_edges()
+        if self.highways is not None:
+            graph.remove_edges_from([(u, v, key) for u, v, key, highway in graph.edges(keys=True, data='highway')
+                                     if not self.is_walkable(highway)])
+            graph.remove_nodes_from([node for node, degree in graph.degree() if degree == 0])
+        for _, data in graph.nodes(data=True):
+            self._filter_attributes(data, self.node_attributes)
+        for _, _, data in graph.edges(data=True):
+            self._filter_attributes(data, self.edge_attributes)
+        logger.info(f'Load profile {self.name}: {nodes_before} -> {len(graph)} nodes, '
+                    f'{edges_before} -> {graph.number_of_edges()} edges')
+        return graph
+
+    def is_walkable(self, highway) -> bool:
+        if isinstance(highway, list):
+            return any(value in self.highways for value in highway)
+        return highway in self.highways
+
+    def _filter_attributes(self, data: dict, attributes: set):
+        for attribute in [attribute for attribute in data if attribute not in attributes]:
+            del data[attribute]
+        for attribute in self.interned_attributes:
+            value = data.get(attribute)
+            if isinstance(value, str):
+                data[attribute] = sys.intern(value)
+            elif isinstance(value, list):
+                data[attribute] = [sys.intern(item) if isinstance(item, str) else item for item in value]
+
+    def __str__(self):
+        return f'LoadProfile: {self.name}'
+
+
+PEDESTRIAN_LOAD_PROFILE = LoadProfile('pedestrian', PEDESTRIAN_HIGHWAYS)
+# Profiles which can be selected by name, e.g. in the management commands
+LOAD_PROFILES = {PEDESTRIAN_LOAD_PROFILE.name: PEDESTRIAN_LOAD_PROFILE}
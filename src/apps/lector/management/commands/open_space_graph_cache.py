@@ -0,0 +1,48 @@
+import logging
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.lector.cache import OpenSpaceGraphCache
+from apps.lector.controllers import OSMController
+from apps.open_space_controller.models import BBox
+
+INSPECT = 'inspect'
+PRUNE = 'prune'
+POPULATE = 'populate'
+
+
+class Command(BaseCommand):
+    help = 'Inspect, prune or populate the open space graph cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=[INSPECT, PRUNE, POPULATE])
+        parser.add_argument('--bbox', nargs=4, type=float, default=None,
+                            help="populate: bbox max_lat min_lat max_lon min_lon, defaults to BAMBERG_BBOX")
+        parser.add_argument('-w', '--workers', type=int, default=None,
+                            help="populate: build the open spaces with the given number of processes")
+        parser.add_argument('--reduced-visibility', action='store_true',
+                            help="populate: build the reduced visibility graphs")
+        parser.add_argument('--max-size', type=int, default=None,
+                            help="prune: size limit in bytes, defaults to OPEN_SPACE_GRAPH_CACHE_MAX_SIZE")
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger('')
+        logger.setLevel(logging.INFO)
+
+        cache = OpenSpaceGraphCache()
+        if options['action'] == INSPECT:
+            entries = cache.get_entries()
+            for entry in entries:
+                self.stdout.write(f'{entry["key"]}\t{entry["size"]}\t{datetime.fromtimestamp(entry["mtime"])}')
+            self.stdout.write(f'{len(entries)} entries, {sum(entry["size"] for entry in entries)} bytes '
+                              f'in {cache.cache_dir}')
+        elif options['action'] == PRUNE:
+            evicted = cache.prune(options['max_size'])
+            self.stdout.write(self.style.SUCCESS(f'Evicted {len(evicted)} entries'))
+        else:
+            osmm = OSMController(reduced_visibility=options['reduced_visibility'], graph_cache=cache)
+            osmm.build_bbox_open_spaces(BBox(*options['bbox']) if options['bbox'] else None,
+                                        workers=options['workers'])
+            self.stdout.write(self.style.SUCCESS(f'Cache holds {len(cache.get_entries())} entries'))
+        logger.setLevel(logging.WARNING)
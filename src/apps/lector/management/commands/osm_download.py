@@ -2,16 +2,14 @@ import logging
 
 from django.core.management.base import BaseCommand
 
-from apps.docker_controller.controllers import DockerGraphhopperController
+from apps.lector.cache import OpenSpaceGraphCache
 from apps.lector.controllers import OSMController
+from apps.lector.load_profile import LOAD_PROFILES
+from apps.lector.management.graphhopper_export import GraphhopperExportMixin
 from apps.open_space_controller.models import BBox
 
-SERVICE_NAME = 'graphhopper'
-OSM_OUTPUT_DIR = '/osm_data'
-OSM_OUTPUT_FILENAME = 'data'
 
-
-class Command(BaseCommand):
+class Command(GraphhopperExportMixin, BaseCommand):
     help = 'Collect osm data from the given bounding box'
 
     def add_arguments(self, parser):
@@ -19,25 +17,40 @@ class Command(BaseCommand):
                             help="Format bbox max_lat: float, min_lat: float, max_lon: float, min_lon: float,\n e.g. BAMBERG_BBOX: [49.925145775384436, 49.865874134216426, 10.951995849609375, 10.836982727050781]")
         parser.add_argument('-r','--gh-restart', action='store_true',
                             help="Saves the Graph in graphhopper and restart the gh container")
+        parser.add_argument('-w', '--workers', type=int, default=None,
+                            help="Build the open spaces in parallel with the given number of processes")
+        parser.add_argument('--reduced-visibility', action='store_true',
+                            help="Only export visibility edges which can be part of a shortest path")
+        parser.add_argument('-c', '--graph-cache', action='store_true',
+                            help="Reuse cached open space builds whose inputs did not change")
+        parser.add_argument('-s', '--snapshot', action='store_true',
+                            help="Store the enriched graph as array snapshot with a build manifest, "
+                                 "which rebuild_open_spaces updates incrementally")
+        parser.add_argument('--load-profile', choices=sorted(LOAD_PROFILES),
+                            help="Only keep the street edges of this profile, e.g. the walkable highway types "
+                                 "of pedestrian. By default all edges are kept")
+        parser.add_argument('--debug-plots', action='store_true',
+                            help="Render the intermediate building plots of every open space")
+        self.add_export_arguments(parser)
 
     def handle(self, *args, **options):
         logger = logging.getLogger('')
         logger.setLevel(logging.INFO)
 
         bbox = options['bbox']
-        gh_restart = options.get('--gh-restart', False)
+        gh_restart = options['gh_restart']
         if bbox and len(bbox) != 4:
             self.stdout.write(self.style.ERROR(f'ERROR a bbox should have 4 entries got {len(bbox)}'))
         else:
-            osmm = OSMController()
-            osmm.create_bbox_open_spaces_plot(BBox(*bbox)) if bbox else osmm.create_bbox_open_spaces_plot()
-            osmm.plot_graph()
+            osmm = OSMController(reduced_visibility=options['reduced_visibility'],
+                                 graph_cache=OpenSpaceGraphCache() if options['graph_cache'] else None,
+                                 debug_plots=options['debug_plots'],
+                                 load_profile=LOAD_PROFILES.get(options['load_profile']))
+            osmm.create_bbox_open_spaces_plot(BBox(*bbox) if bbox else None, workers=options['workers'],
+                                              track_builds=options['snapshot'])
+            if options['snapshot']:
+                osmm.save_build()
 
             if gh_restart:
-                osmm.save_graph()
-
-                gh_docker_controller = DockerGraphhopperController(graphhopper_service_name=SERVICE_NAME,
-                                                                   osm_output_dir=OSM_OUTPUT_DIR,
-                                                                   osm_output_filename=OSM_OUTPUT_FILENAME)
-                gh_docker_controller.clean_graphhopper_restart()
+                self.export_to_graphhopper(osmm, options)
             logger.setLevel(logging.WARNING)
@@ -0,0 +1,37 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.lector.controllers import OSMController
+from apps.lector.load_profile import LOAD_PROFILES
+from apps.lector.management.graphhopper_export import GraphhopperExportMixin
+
+
+class Command(GraphhopperExportMixin, BaseCommand):
+    help = 'Rebuild only the open spaces whose configs, buildings or streets changed since osm_download --snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-r', '--gh-restart', action='store_true',
+                            help="Saves the Graph in graphhopper and restart the gh container if anything changed")
+        parser.add_argument('-w', '--workers', type=int, default=None,
+                            help="Build the changed open spaces in parallel with the given number of processes")
+        parser.add_argument('--load-profile', choices=sorted(LOAD_PROFILES),
+                            help="Load profile of the stored build, see osm_download")
+        self.add_export_arguments(parser)
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger('')
+        logger.setLevel(logging.INFO)
+
+        osmm = OSMController(load_profile=LOAD_PROFILES.get(options['load_profile']))
+        report = osmm.rebuild_changed_open_spaces(workers=options['workers'])
+        for state in ['added', 'changed', 'removed']:
+            for file_name in report[state]:
+                self.stdout.write(f'{state}\t{file_name}')
+        self.stdout.write(self.style.SUCCESS(f'{len(report["added"])} added, {len(report["changed"])} changed, '
+                                             f'{len(report["removed"])} removed, '
+                                             f'{len(report["unchanged"])} unchanged open spaces'))
+
+        if options['gh_restart'] and (report['added'] or report['changed'] or report['removed']):
+            self.export_to_graphhopper(osmm, options)
+        logger.setLevel(logging.WARNING)
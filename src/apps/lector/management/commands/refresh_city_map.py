@@ -0,0 +1,29 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from apps.lector.controllers import BAMBERG_BBOX
+from apps.lector.map_provider import CityMapProvider
+from apps.open_space_controller.models import BBox
+
+
+class Command(BaseCommand):
+    help = 'Download the street graph of the city from overpass and replace the local city extract'
+
+    def add_arguments(self, parser):
+        parser.add_argument('bbox', nargs='*', type=float,
+                            help="Format bbox max_lat: float, min_lat: float, max_lon: float, min_lon: float, "
+                                 "defaults to BAMBERG_BBOX")
+
+    def handle(self, *args, **options):
+        logger = logging.getLogger('')
+        logger.setLevel(logging.INFO)
+
+        bbox = options['bbox']
+        if bbox and len(bbox) != 4:
+            self.stdout.write(self.style.ERROR(f'ERROR a bbox should have 4 entries got {len(bbox)}'))
+        else:
+            map_provider = CityMapProvider()
+            map_provider.refresh(BBox(*bbox) if bbox else BAMBERG_BBOX)
+            self.stdout.write(self.style.SUCCESS(f'Saved city map to {map_provider.osm_file}'))
+        logger.setLevel(logging.WARNING)
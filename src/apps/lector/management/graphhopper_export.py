@@ -0,0 +1,63 @@
+from apps.docker_controller.controllers import DockerGraphhopperController
+from apps.lector.controllers import OSMController, SERVICE_NAME, OSM_OUTPUT_DIR, OSM_OUTPUT_FILENAME
+from apps.lector.warmup import warm_up_graphhopper
+
+
+class GraphhopperExportMixin:
+    """
+    Options and steps of the management commands which export the graph and restart graphhopper
+    """
+
+    def add_export_arguments(self, parser):
+        parser.add_argument('--blue-green', action='store_true',
+                            help="Import the new graph in a staging slot while graphhopper keeps serving the old one")
+        parser.add_argument('--no-prune', action='store_true',
+                            help="Export the street fragments which are not connected to the main component")
+        parser.add_argument('--keep-island', action='append', default=[],
+                            help="Export the components of this node id namespace and of the namespaces nested "
+                                 "into it even if they are not connected, e.g. open_space:<file name>, "
+                                 "building:<key> or open_space:<file name>/building:<key>")
+        parser.add_argument('--no-simplify', action='store_true',
+                            help="Export every street node instead of merging degree-2 street chains")
+        parser.add_argument('--no-dedup', action='store_true',
+                            help="Export duplicate edges between the same nodes")
+        parser.add_argument('-u', '--warm-up', type=int, default=0,
+                            help="Replay the given number of routes between entrances after the gh restart")
+
+    def export_to_graphhopper(self, osmm: OSMController, options: dict):
+        """
+        Reduce and save the graph, restart graphhopper and warm it up as set in the export arguments
+        """
+        self._prepare_export(osmm, options)
+        osmm.save_graph()
+        gh_docker_controller = DockerGraphhopperController(graphhopper_service_name=SERVICE_NAME,
+                                                           osm_output_dir=OSM_OUTPUT_DIR,
+                                                           osm_output_filename=OSM_OUTPUT_FILENAME)
+        if options['blue_green']:
+            gh_docker_controller.blue_green_graphhopper_restart()
+        else:
+            gh_docker_controller.clean_graphhopper_restart()
+        if options['warm_up']:
+            self._warm_up(osmm, options['warm_up'])
+
+    def _prepare_export(self, osmm: OSMController, options: dict):
+        stats = osmm.prepare_graph_for_export(prune=not options['no_prune'], keep_islands=options['keep_island'],
+                                              simplify=not options['no_simplify'],
+                                              deduplicate=not options['no_dedup'])
+        for stage, stage_stats in stats.items():
+            self.stdout.write(f'{stage}: {stage_stats["nodes_before"]} -> {stage_stats["nodes_after"]} nodes, '
+                              f'{stage_stats["edges_before"]} -> {stage_stats["edges_after"]} edges')
+        for label in stats.get('prune', {}).get('dropped_labels', []):
+            self.stdout.write(self.style.WARNING(f'prune: dropped unconnected nodes of {label}'))
+
+    def _warm_up(self, osmm: OSMController, routes: int):
+        report = warm_up_graphhopper(osmm.indoor_map_c.building_cc.get_buildings(), osmm.osp_config_c.get_open_spaces(),
+                                     routes=routes)
+        if report is None:
+            self.stdout.write(self.style.ERROR('Graphhopper did not get ready, no warm-up'))
+        elif report['p50'] is None:
+            self.stdout.write(self.style.ERROR(f'Warm-up: all {report["routes"]} routes failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Warm-up: {report["routes"]} routes, {report["errors"]} errors in {report["seconds"]:.1f}s, '
+                f'p50 {report["p50"]:.0f}ms, p90 {report["p90"]:.0f}ms, p99 {report["p99"]:.0f}ms'))
@@ -0,0 +1,105 @@
+import logging
+import os
+import threading
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+from django.conf import settings
+
+from apps.lector.load_profile import LoadProfile
+from apps.open_space_controller.models import BBox
+
+logger = logging.getLogger(__name__)
+
+# Loaded city maps of this process, (osm file path, load profile name) -> (modification time, CityMap)
+_city_maps = {}
+_city_maps_lock = threading.Lock()
+
+
+class CityMap:
+    """
+    Street graph of a whole city with a node coordinate index for fast bbox crops
+    """
+
+    def __init__(self, graph: nx.MultiDiGraph):
+        self.graph = graph
+        nodes, xs, ys = [], [], []
+        for node, data in graph.nodes(data=True):
+            nodes.append(node)
+            xs.append(data['x'])
+            ys.append(data['y'])
+        order = np.argsort(np.array(xs, dtype=np.float64), kind='stable')
+        self._nodes = np.array(nodes, dtype=np.int64)[order]
+        self._xs = np.array(xs, dtype=np.float64)[order]
+        self._ys = np.array(ys, dtype=np.float64)[order]
+
+    def get_bbox_nodes(self, bbox: BBox) -> list:
+        """
+        :return: ids of the nodes inside the bbox
+        """
+        start = np.searchsorted(self._xs, bbox.min_lon, side='left')
+        end = np.searchsorted(self._xs, bbox.max_lon, side='right')
+        ys = self._ys[start:end]
+        return self._nodes[start:end][(ys >= bbox.min_lat) & (ys <= bbox.max_lat)].tolist()
+
+    def crop(self, bbox: BBox) -> nx.MultiDiGraph:
+        """
+        :return: copy of the subgraph induced by the nodes inside the bbox
+        """
+        return self.graph.subgraph(self.get_bbox_nodes(bbox)).copy()
+
+
+class CityMapProvider:
+    """
+    Provides street graphs from a local city extract instead of overpass downloads.
+    The extract is loaded once per process and reloaded when the file changes
+    """
+
+    def __init__(self, osm_file=settings.CITY_OSM_FILE, load_profile: LoadProfile = None):
+        """
+        :param load_profile: filter of the loaded extract, None keeps the whole extract
+        """
+        self.osm_file = osm_file
+        self.load_profile = load_profile
+
+    def is_available(self) -> bool:
+        return os.path.isfile(self.osm_file)
+
+    def get_city_map(self) -> CityMap:
+        modification_time = os.path.getmtime(self.osm_file)
+        with _city_maps_lock:
+            cached = _city_maps.get(self._get_cache_key())
+            if cached is None or cached[0] != modification_time:
+                logger.info(f'Load city map {self.osm_file}')
+                graph = self._apply_load_profile(ox.graph_from_file(self.osm_file, simplify=False))
+                cached = (modification_time, CityMap(graph))
+                _city_maps[self._get_cache_key()] = cached
+            return cached[1]
+
+    def get_crop(self, bbox: BBox) -> nx.MultiDiGraph:
+        """
+        :param bbox: area of the crop
+        :return: the street graph inside the bbox. Unlike ox.graph_from_bbox, all connected components are kept
+        """
+        return self.get_city_map().crop(bbox)
+
+    def refresh(self, bbox: BBox):
+        """
+        Download the street graph of the bbox from overpass and replace the local city extract
+
+        :param bbox: area of the city
+        """
+        graph = ox.graph_from_bbox(*bbox.get_bbox(), simplify=False)
+        folder, filename = os.path.split(self.osm_file)
+        ox.save_graph_osm(graph, filename=filename, folder=folder)
+        logger.info(f'Saved city map with {len(graph)} nodes to {self.osm_file}')
+        with _city_maps_lock:
+            _city_maps[self._get_cache_key()] = (os.path.getmtime(self.osm_file),
+                                                 CityMap(self._apply_load_profile(graph)))
+
+    def _get_cache_key(self) -> tuple:
+        return self.osm_file, self.load_profile.name if self.load_profile else None
+
+    def _apply_load_profile(self, graph: nx.MultiDiGraph) -> nx.MultiDiGraph:
+        return self.load_profile.apply(graph) if self.load_profile else graph
@@ -1,6 +1,27 @@
+from enum import Enum
 from typing import List
 
 
+class EDGE_TYPES(Enum):
+    NORMAL = 0
+    OPEN_SPACE_ENTRY = 1
+    OPEN_SPACE_VISIBLITY = 2
+    OPEN_SPACE_WALKABLE = 3
+    OPEN_SPACE_RESTRICTED = 4
+    BUILDING_ENTRY = 5
+    BUILDING_STAIRCASE = 6
+
+
+COLOR_MAP = {EDGE_TYPES.NORMAL: "#000000",
+             EDGE_TYPES.OPEN_SPACE_ENTRY: "#0f0f0f",
+             EDGE_TYPES.OPEN_SPACE_VISIBLITY: "#9ccc3c",
+             EDGE_TYPES.OPEN_SPACE_RESTRICTED: "#e70066",
+             EDGE_TYPES.OPEN_SPACE_WALKABLE: "#14278d",
+             EDGE_TYPES.BUILDING_ENTRY: "#5d2612",
+             EDGE_TYPES.BUILDING_STAIRCASE: "#9ccc3c"
+             }
+
+
 class EntryPoint:
     def __init__(self, coord: List[float]):
         self.open_space_coord = coord
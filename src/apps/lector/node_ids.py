@@ -0,0 +1,114 @@
+import hashlib
+from typing import Iterable, Dict, List
+
+import networkx as nx
+
+# OSM node ids are below 2**34 today, generated nodes start far above
+NODE_ID_OFFSET = 2 ** 40
+NODE_ID_BLOCK_SIZE = 2 ** 20
+NODE_ID_BLOCKS = 2 ** 22
+DEFAULT_NODE_ID_NAMESPACE = 'lector'
+# Separates nested namespaces, e.g. open_space:<file name>/building:<key>
+NODE_ID_NAMESPACE_SEPARATOR = '/'
+
+
+class NodeIdAllocator:
+    """
+    Allocates ids of generated nodes from deterministic blocks.
+    The block of a namespace, e.g. an open space file name, is derived from a hash of the namespace,
+    so separate controllers and processes generate the same, disjoint ids for the same namespaces
+    """
+
+    def __init__(self, first_id=NODE_ID_OFFSET, block_size=NODE_ID_BLOCK_SIZE, blocks=NODE_ID_BLOCKS):
+        self.first_id = first_id
+        self.block_size = block_size
+        self.blocks = blocks
+        self._namespaces = {}
+        self._used = {}
+
+    def get_block(self, namespace: str) -> int:
+        """
+        :raise ValueError: if another namespace of this allocator has the same block
+        """
+        block = int.from_bytes(hashlib.sha256(namespace.encode()).digest()[:8], 'big') % self.blocks
+        owner = self._namespaces.setdefault(block, namespace)
+        if owner != namespace:
+            raise ValueError(f'Node id block {block} of {namespace} collides with {owner}, rename one of them')
+        return block
+
+    def add_namespaces(self, namespaces: Iterable[str]):
+        """
+        Register namespaces another allocator used, e.g. of a delta built in a worker process,
+        so get_node_namespace knows their nodes
+
+        :raise ValueError: if two namespaces have the same block
+        """
+        for namespace in namespaces:
+            self.get_block(namespace)
+
+    def get_namespaces(self) -> List[str]:
+        return sorted(self._namespaces.values())
+
+    def get_new_id(self, namespace: str) -> int:
+        """
+        :raise ValueError: if all ids of the namespace are used
+        """
+        block = self.get_block(namespace)
+        used = self._used.get(block, 0)
+        if used >= self.block_size:
+            raise ValueError(f'Node id block of {namespace} is exhausted after {self.block_size} ids')
+        self._used[block] = used + 1
+        return self.first_id + block * self.block_size + used
+
+    def reserve_ids(self, node_ids: Iterable[int]):
+        """
+        Mark generated ids as used, e.g. the ids of a loaded graph or of a merged subgraph
+        """
+        for node_id in node_ids:
+            if self.is_generated_id(node_id):
+                block, offset = divmod(node_id - self.first_id, self.block_size)
+                self._used[block] = max(self._used.get(block, 0), offset + 1)
+
+    def get_node_block(self, node_id: int) -> int or None:
+        """
+        :return: block of a generated id or None for other ids
+        """
+        if not self.is_generated_id(node_id):
+            return None
+        return (node_id - self.first_id) // self.block_size
+
+    def get_node_namespace(self, node_id: int) -> str or None:
+        """
+        :return: namespace of a generated id, if the namespace was used by this allocator
+        """
+        return self._namespaces.get(self.get_node_block(node_id))
+
+    def is_generated_id(self, node_id: int) -> bool:
+        return self.first_id <= node_id < self.first_id + self.blocks * self.block_size
+
+    def get_used_ids(self) -> Dict[int, int]:
+        """
+        :return: number of used ids per block
+        """
+        return dict(self._used)
+
+
+def is_nested_namespace(namespace: str, pattern: str) -> bool:
+    """
+    :return: whether the nested namespaces of pattern are a part of the nested namespaces of namespace,
+             e.g. open_space:a/building:1 matches building:1, open_space:a and itself, but not building:10
+    """
+    parts = namespace.split(NODE_ID_NAMESPACE_SEPARATOR)
+    pattern_parts = pattern.split(NODE_ID_NAMESPACE_SEPARATOR)
+    return any(parts[start:start + len(pattern_parts)] == pattern_parts
+               for start in range(len(parts) - len(pattern_parts) + 1))
+
+
+def check_osm_node_ids(graph: nx.MultiDiGraph, first_id=NODE_ID_OFFSET):
+    """
+    :raise ValueError: if node ids of the downloaded street graph reach into the generated id space
+    """
+    colliding = [node for node in graph.nodes if node >= first_id]
+    if colliding:
+        raise ValueError(f'{len(colliding)} osm node ids collide with the generated node ids starting at {first_id}, '
+                         f'e.g. {colliding[0]}')
@@ -0,0 +1,116 @@
+import logging
+import os
+from xml.sax.saxutils import quoteattr
+
+import networkx as nx
+
+logger = logging.getLogger(__name__)
+
+OSM_NODE_TAGS = ['highway']
+OSM_WAY_TAGS = ['highway', 'lanes', 'maxspeed', 'name', 'oneway']
+OSM_XML = 'osm'
+OSM_PBF = 'pbf'
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def get_node_tags(data: dict) -> dict:
+    return {tag: _get_tag_value(data[tag]) for tag in OSM_NODE_TAGS if data.get(tag) is not None}
+
+
+def get_way_tags(data: dict) -> dict:
+    tags = {tag: _get_tag_value(data[tag]) for tag in OSM_WAY_TAGS if data.get(tag) is not None}
+    tags['oneway'] = 'yes' if data.get('oneway') in (True, 'True', 'yes') else 'no'
+    return tags
+
+
+def get_way_nodes(u: int, v: int, data: dict) -> list:
+    """
+    :return: node ids of the way of an edge, including the inner nodes of a simplified edge
+    """
+    return [u, *data.get('inner_nodes', []), v]
+
+
+def get_inner_nodes(graph: nx.MultiDiGraph):
+    """
+    :return: generator of the id and coordinate of every inner node of the simplified edges, once per node
+    """
+    written = set()
+    for _, _, data in graph.edges(data=True):
+        inner_nodes = data.get('inner_nodes')
+        if inner_nodes:
+            for node, coord in zip(inner_nodes, data['geometry'].coords[1:-1]):
+                if node not in written:
+                    written.add(node)
+                    yield node, coord
+
+
+def write_osm_xml(graph: nx.MultiDiGraph, path: str):
+    """
+    Stream the graph as OSM XML to disk. Every edge is written as its own way with the ids 1..n,
+    so only the graph itself is kept in memory. Inner nodes of simplified edges are written after the graph nodes
+
+    :param graph: graph with osmnx node and edge attributes
+    :param path: path of the .osm file, replaced atomically
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="lector">\n')
+        for node, data in graph.nodes(data=True):
+            tags = get_node_tags(data)
+            f.write(f'  <node id="{node}" version="1" lat="{data["y"]}" lon="{data["x"]}"')
+            if tags:
+                f.write('>\n')
+                _write_tags(f, tags)
+                f.write('  </node>\n')
+            else:
+                f.write('/>\n')
+        for node, (x, y) in get_inner_nodes(graph):
+            f.write(f'  <node id="{node}" version="1" lat="{y}" lon="{x}"/>\n')
+        for way_id, (u, v, data) in enumerate(graph.edges(data=True), start=1):
+            f.write(f'  <way id="{way_id}" version="1">\n')
+            f.write(''.join(f'    <nd ref="{node}"/>\n' for node in get_way_nodes(u, v, data)))
+            _write_tags(f, get_way_tags(data))
+            f.write('  </way>\n')
+        f.write('</osm>\n')
+    os.replace(tmp_path, path)
+    logger.info(f'Wrote {len(graph)} nodes and {graph.number_of_edges()} ways to {path}')
+
+
+def write_osm_pbf(graph: nx.MultiDiGraph, path: str):
+    """
+    Stream the graph as OSM PBF to disk, with the same ways as write_osm_xml. Requires pyosmium
+
+    :param graph: graph with osmnx node and edge attributes
+    :param path: path of the .osm.pbf file, replaced atomically
+    """
+    try:
+        import osmium
+    except ImportError as e:
+        raise ImportError('Writing pbf files requires pyosmium, install the osmium package') from e
+
+    tmp_path = f'{path}.{os.getpid()}.tmp.osm.pbf'
+    writer = osmium.SimpleWriter(tmp_path)
+    try:
+        for node, data in graph.nodes(data=True):
+            writer.add_node(osmium.osm.mutable.Node(id=node, version=1, location=(data['x'], data['y']),
+                                                    tags=get_node_tags(data)))
+        for node, (x, y) in get_inner_nodes(graph):
+            writer.add_node(osmium.osm.mutable.Node(id=node, version=1, location=(x, y), tags={}))
+        for way_id, (u, v, data) in enumerate(graph.edges(data=True), start=1):
+            writer.add_way(osmium.osm.mutable.Way(id=way_id, version=1, nodes=get_way_nodes(u, v, data),
+                                                  tags=get_way_tags(data)))
+    finally:
+        writer.close()
+    os.replace(tmp_path, path)
+    logger.info(f'Wrote {len(graph)} nodes and {graph.number_of_edges()} ways to {path}')
+
+
+def _write_tags(f, tags: dict):
+    for key, value in tags.items():
+        f.write(f'    <tag k={quoteattr(key)} v={quoteattr(value)}/>\n')
+
+
+def _get_tag_value(value) -> str:
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    return str(value)
@@ -0,0 +1,87 @@
+import logging
+import os
+
+import networkx as nx
+import numpy as np
+
+from apps.lector.models import EDGE_TYPES, COLOR_MAP
+
+logger = logging.getLogger(__name__)
+
+# Same figure layout as the former ox.plot_graph output: 6 inch high, 2% margin, white background
+PLOT_HEIGHT = 6 * 72
+PLOT_MARGIN = 0.02
+PLOT_BACKGROUND_COLOR = '#ffffff'
+PLOT_NODE_COLOR = '#66ccff'
+# Decimals of the svg coordinates in pt
+PLOT_COORD_DECIMALS = 1
+
+
+def render_svg(graph: nx.MultiDiGraph, path: str, edge_linewidth=0.5, node_size=1.0,
+               coord_decimals=PLOT_COORD_DECIMALS):
+    """
+    Render the graph as svg. Edges are colored by their color_label, nodes are drawn below the edges.
+    Coordinates are quantized, edges which are identical after quantization are drawn once
+
+    :param graph: graph with x and y node coordinates
+    :param path: path of the svg file
+    :param edge_linewidth: edge width in pt
+    :param node_size: node marker area in pt^2, like the matplotlib scatter size
+    :param coord_decimals: decimals of the svg coordinates
+    """
+    nodes = list(graph.nodes)
+    coords = np.array([[data['x'], data['y']] for _, data in graph.nodes(data=True)], dtype=np.float64).reshape(-1, 2)
+    width, height, points = _project(coords)
+    width = round(width, coord_decimals)
+    points = np.round(points, coord_decimals)
+    labels = [_format_number(value) for value in points.ravel().tolist()]
+    node_labels = {node: f'{labels[2 * index]} {labels[2 * index + 1]}' for index, node in enumerate(nodes)}
+
+    edge_segments = {edge_type: {} for edge_type in EDGE_TYPES}
+    for u, v, data in graph.edges(data=True):
+        start, end = node_labels[u], node_labels[v]
+        if start != end:
+            edge_segments[data.get('color_label', EDGE_TYPES.NORMAL)][tuple(sorted((start, end)))] = None
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{_format_number(width)}pt" '
+                f'height="{_format_number(height)}pt" viewBox="0 0 {_format_number(width)} {_format_number(height)}">\n')
+        f.write(f'<rect width="100%" height="100%" fill="{PLOT_BACKGROUND_COLOR}"/>\n')
+        if nodes and node_size > 0:
+            # Zero length round capped segments are drawn as dots
+            f.write(f'<path fill="none" stroke="{PLOT_NODE_COLOR}" stroke-linecap="round" '
+                    f'stroke-width="{_format_number(np.sqrt(node_size))}" d="')
+            f.write(''.join(f'M{label}h0' for label in dict.fromkeys(node_labels.values())))
+            f.write('"/>\n')
+        for edge_type, segments in edge_segments.items():
+            if segments:
+                f.write(f'<path fill="none" stroke="{COLOR_MAP[edge_type]}" stroke-linecap="round" '
+                        f'stroke-width="{_format_number(edge_linewidth)}" d="')
+                f.write(''.join(f'M{start}L{end}' for start, end in segments))
+                f.write('"/>\n')
+        f.write('</svg>\n')
+    os.replace(tmp_path, path)
+    logger.info(f'Rendered {len(nodes)} nodes and {graph.number_of_edges()} edges to {path}')
+
+
+def _project(coords: np.ndarray):
+    """
+    :return: width and height of the plot in pt and the plot coordinates of the given lon/lat coordinates
+    """
+    if not len(coords):
+        return PLOT_HEIGHT, PLOT_HEIGHT, coords
+    min_xy = coords.min(axis=0)
+    extent = coords.max(axis=0) - min_xy
+    extent[extent == 0] = 1e-9
+    min_xy = min_xy - extent * PLOT_MARGIN
+    extent = extent * (1 + 2 * PLOT_MARGIN)
+    scale = PLOT_HEIGHT / extent[1]
+    points = (coords - min_xy) * scale
+    points[:, 1] = PLOT_HEIGHT - points[:, 1]
+    return extent[0] * scale, PLOT_HEIGHT, points
+
+
+def _format_number(value: float) -> str:
+    text = f'{value:f}'.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
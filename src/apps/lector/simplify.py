@@ -0,0 +1,104 @@
+import logging
+from typing import Iterable, List, Set
+
+import networkx as nx
+from shapely.geometry import LineString
+
+from apps.lector.models import EDGE_TYPES
+from apps.lector.osm_writer import OSM_WAY_TAGS
+
+logger = logging.getLogger(__name__)
+
+# Edges are only merged if these attributes are equal along the chain
+SIMPLIFY_EDGE_ATTRIBUTES = [tag for tag in OSM_WAY_TAGS if tag != 'oneway'] + ['color_label']
+
+
+def get_protected_nodes(graph: nx.MultiDiGraph) -> Set[int]:
+    """
+    :return: nodes which have a tag or an incident edge inserted by lector, e.g. open space, building entry or
+             staircase edges
+    """
+    protected = {node for node, data in graph.nodes(data=True) if data.get('highway') is not None}
+    for u, v, data in graph.edges(data=True):
+        if data.get('color_label', EDGE_TYPES.NORMAL) != EDGE_TYPES.NORMAL:
+            protected.add(u)
+            protected.add(v)
+    return protected
+
+
+def simplify_graph(graph: nx.MultiDiGraph, protected_nodes: Iterable[int] = ()) -> dict:
+    """
+    Merge chains of degree-2 street nodes into single edges, in place. A chain is only merged if all of its
+    edges are normal edges with the same tags. Merged edges keep the tags of the first edge, the summed length,
+    the geometry as LineString and the ids of the removed inner nodes, so the export keeps the street shapes.
+    Simplify only the final graph, deltas, reverts and snapshots expect the unsimplified graph
+
+    :param graph: graph with x and y node coordinates
+    :param protected_nodes: nodes which are kept in addition to get_protected_nodes
+    :return: node and edge counts before and after and the number of merged chains
+    """
+    stats = {'nodes_before': len(graph), 'edges_before': graph.number_of_edges()}
+    protected = get_protected_nodes(graph) | set(protected_nodes)
+    inner_nodes = {node for node in graph.nodes if node not in protected and _is_chain_node(graph, node)}
+
+    chains = []
+    for start in graph.nodes:
+        if start in inner_nodes:
+            continue
+        for successor in graph.successors(start):
+            if successor in inner_nodes:
+                chain = _get_chain(graph, start, successor, inner_nodes)
+                if chain:
+                    chains.append(chain)
+
+    for chain in chains:
+        edges = [graph.get_edge_data(u, v) for u, v in zip(chain[:-1], chain[1:])]
+        edges = [next(iter(data.values())) for data in edges]
+        data = dict(edges[0])
+        data['length'] = sum(edge.get('length', 0.0) for edge in edges)
+        data['geometry'] = LineString([(graph.node[node]['x'], graph.node[node]['y']) for node in chain])
+        data['inner_nodes'] = chain[1:-1]
+        graph.add_edge(chain[0], chain[-1], **data)
+    graph.remove_nodes_from({node for chain in chains for node in chain[1:-1]})
+
+    stats.update({'nodes_after': len(graph), 'edges_after': graph.number_of_edges(), 'merged_chains': len(chains)})
+    logger.info(f'Simplified graph: {stats}')
+    return stats
+
+
+def _is_chain_node(graph: nx.MultiDiGraph, node: int) -> bool:
+    """
+    :return: whether the node is the inner node of a oneway or a twoway street without a junction
+    """
+    predecessors = list(graph.predecessors(node))
+    successors = list(graph.successors(node))
+    if node in predecessors or len(set(predecessors) | set(successors)) != 2:
+        return False
+    if len(graph.pred[node]) != graph.in_degree(node) or len(graph.succ[node]) != graph.out_degree(node):
+        # Parallel edges
+        return False
+    if len(predecessors) == 1 and len(successors) == 1:
+        edges = [graph.get_edge_data(predecessors[0], node), graph.get_edge_data(node, successors[0])]
+    elif len(predecessors) == 2 and set(predecessors) == set(successors):
+        edges = [graph.get_edge_data(neighbour, node) for neighbour in predecessors] + \
+                [graph.get_edge_data(node, neighbour) for neighbour in successors]
+    else:
+        return False
+    edges = [next(iter(data.values())) for data in edges]
+    return all(_get_tags(edge) == _get_tags(edges[0]) for edge in edges[1:])
+
+
+def _get_chain(graph: nx.MultiDiGraph, start: int, successor: int, inner_nodes: Set[int]) -> List[int] or None:
+    """
+    :return: nodes of the chain from start over successor to the next node which is no inner node
+             or None if the chain ends at its start
+    """
+    chain = [start, successor]
+    while chain[-1] in inner_nodes:
+        node = chain[-1]
+        chain.append(next(neighbour for neighbour in graph.successors(node) if neighbour != chain[-2]))
+    return chain if chain[-1] != start else None
+
+
+def _get_tags(data: dict) -> tuple:
+    return tuple(data.get(attribute) for attribute in SIMPLIFY_EDGE_ATTRIBUTES)
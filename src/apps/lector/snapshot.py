@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+from typing import List, Tuple
+
+import networkx as nx
+import numpy as np
+
+from apps.lector.models import EDGE_TYPES
+
+logger = logging.getLogger(__name__)
+
+# Increase whenever the array layout of the snapshot changes
+GRAPH_SNAPSHOT_VERSION = 4
+NO_VALUE = -1
+NO_EDGE_TYPE = -1
+
+
+class GraphSnapshot:
+    """
+    Array backed serialization format of a street graph, loading it rebuilds the networkx graph with to_graph.
+    Nodes are stored as id and coordinate arrays, edges as CSR adjacency sorted by source node. Every other node and
+    edge attribute is stored as one column of ids into a shared table of JSON encoded values, so each value is stored
+    once and keeps its type. Values other than None, bool, int, float, str, lists and dicts of these are rejected.
+    String tables are stored as one UTF-8 buffer with the offsets of the strings, see _get_string_arrays
+    """
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+
+    @property
+    def node_ids(self) -> np.ndarray:
+        return self.arrays['node_ids']
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self.arrays['indptr']
+
+    @property
+    def indices(self) -> np.ndarray:
+        return self.arrays['indices']
+
+    def get_out_edges(self, node_index: int) -> np.ndarray:
+        """
+        :param node_index: position of the node in node_ids
+        :return: positions in the edge columns of all edges leaving the node
+        """
+        return np.arange(self.indptr[node_index], self.indptr[node_index + 1])
+
+    @staticmethod
+    def from_graph(graph: nx.MultiDiGraph) -> 'GraphSnapshot':
+        """
+        :param graph: the graph to store
+        :return: snapshot of the graph
+        :raise ValueError: if the graph is simplified, a node has no coordinates or an attribute value is not supported
+        """
+        if any('inner_nodes' in data for _, _, data in graph.edges(data=True)):
+            raise ValueError('Snapshots of simplified graphs are not supported, take the snapshot before simplifying')
+        values = []
+        value_ids = {}
+        scalar_value_ids = {}
+
+        def get_value_id(name: str, value) -> int:
+            # Repeated scalars skip the encoding, the type is part of the key as 1 == 1.0 == True
+            scalar_key = (type(value), value) if isinstance(value, (bool, int, float, str)) else None
+            if scalar_key in scalar_value_ids:
+                return scalar_value_ids[scalar_key]
+            encoded_value = json.dumps(_encode_value(name, value), sort_keys=True)
+            if encoded_value not in value_ids:
+                value_ids[encoded_value] = len(values)
+                values.append(encoded_value)
+            if scalar_key is not None:
+                scalar_value_ids[scalar_key] = value_ids[encoded_value]
+            return value_ids[encoded_value]
+
+        def get_attribute_columns(items: list, excluded: set) -> Tuple[list, np.ndarray]:
+            names = sorted({name for data in items for name in data if name not in excluded})
+            columns = np.full((len(items), len(names)), NO_VALUE, dtype=np.int32)
+            for index, data in enumerate(items):
+                for column, name in enumerate(names):
+                    if name in data:
+                        columns[index, column] = get_value_id(name, data[name])
+            return names, columns
+
+        node_ids = np.array(list(graph.nodes), dtype=np.int64)
+        node_index = {node: index for index, node in enumerate(node_ids.tolist())}
+        nodes = [data for _, data in graph.nodes(data=True)]
+        missing_coords = [node for node, data in graph.nodes(data=True) if 'x' not in data or 'y' not in data]
+        if missing_coords:
+            raise ValueError(f'{len(missing_coords)} nodes have no coordinates, e.g. {missing_coords[0]}')
+        node_coords = np.array([[data['x'], data['y']] for data in nodes], dtype=np.float64).reshape(-1, 2)
+        node_attribute_names, node_attributes = get_attribute_columns(nodes, {'x', 'y'})
+
+        edges = sorted(graph.edges(keys=True, data=True), key=lambda edge: node_index[edge[0]])
+        edge_types = []
+        for _, _, _, data in edges:
+            edge_type = data.get('color_label')
+            if edge_type is not None and not isinstance(edge_type, EDGE_TYPES):
+                raise ValueError(f'Unsupported color_label {edge_type!r}')
+            edge_types.append(edge_type.value if edge_type is not None else NO_EDGE_TYPE)
+        edge_attribute_names, edge_attributes = get_attribute_columns([data for _, _, _, data in edges],
+                                                                      {'color_label'})
+        sources = np.array([node_index[u] for u, _, _, _ in edges], dtype=np.int64)
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=len(node_ids)), out=indptr[1:])
+        arrays = {'meta': np.array([GRAPH_SNAPSHOT_VERSION], dtype=np.int64),
+                  'node_ids': node_ids,
+                  'node_coords': node_coords,
+                  'node_attributes': node_attributes,
+                  'indptr': indptr,
+                  'indices': np.array([node_index[v] for _, v, _, _ in edges], dtype=np.int32),
+                  'edge_keys': np.array([key for _, _, key, _ in edges], dtype=np.int32),
+                  'edge_types': np.array(edge_types, dtype=np.int8),
+                  'edge_attributes': edge_attributes,
+                  **_get_string_arrays('graph_attributes',
+                                       [json.dumps(_encode_value('graph', graph.graph), sort_keys=True)]),
+                  **_get_string_arrays('node_attribute_names', node_attribute_names),
+                  **_get_string_arrays('edge_attribute_names', edge_attribute_names),
+                  **_get_string_arrays('values', values)}
+        return GraphSnapshot(arrays)
+
+    def to_graph(self) -> nx.MultiDiGraph:
+        """
+        :return: networkx graph with the node and edge attributes of the snapshot
+        """
+        arrays = self.arrays
+        encoded_values = _get_strings(arrays, 'values')
+        values = [_decode_value(json.loads(value)) for value in encoded_values]
+        # Lists and dicts are decoded for every node and edge, so the graph does not share them
+        mutable = [isinstance(value, (list, dict)) for value in values]
+
+        def get_attributes(names: list, value_ids: list) -> dict:
+            return {name: _decode_value(json.loads(encoded_values[value_id])) if mutable[value_id]
+                    else values[value_id]
+                    for name, value_id in zip(names, value_ids) if value_id != NO_VALUE}
+
+        graph = nx.MultiDiGraph(**_decode_value(json.loads(_get_strings(arrays, 'graph_attributes')[0])))
+
+        node_ids = arrays['node_ids'].tolist()
+        node_attribute_names = _get_strings(arrays, 'node_attribute_names')
+        nodes = []
+        for node, (x, y), value_ids in zip(node_ids, arrays['node_coords'].tolist(),
+                                           arrays['node_attributes'].tolist()):
+            data = get_attributes(node_attribute_names, value_ids)
+            data['x'] = x
+            data['y'] = y
+            nodes.append((node, data))
+        graph.add_nodes_from(nodes)
+
+        edge_types = {edge_type.value: edge_type for edge_type in EDGE_TYPES}
+        edge_attribute_names = _get_strings(arrays, 'edge_attribute_names')
+        sources = np.repeat(np.arange(len(node_ids)), np.diff(arrays['indptr'])).tolist()
+        edges = []
+        for u, v, key, edge_type, value_ids in zip(sources, arrays['indices'].tolist(), arrays['edge_keys'].tolist(),
+                                                   arrays['edge_types'].tolist(), arrays['edge_attributes'].tolist()):
+            data = get_attributes(edge_attribute_names, value_ids)
+            if edge_type != NO_EDGE_TYPE:
+                data['color_label'] = edge_types[edge_type]
+            edges.append((node_ids[u], node_ids[v], key, data))
+        graph.add_edges_from(edges)
+        return graph
+
+    def save(self, path: str):
+        """
+        Write the snapshot as uncompressed npz, replacing an existing snapshot atomically
+        """
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **self.arrays)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> 'GraphSnapshot':
+        with np.load(path) as snapshot:
+            arrays = {name: snapshot[name] for name in snapshot.files}
+        version = int(arrays['meta'][0])
+        if version != GRAPH_SNAPSHOT_VERSION:
+            raise ValueError(f'Graph snapshot {path} has version {version}, expected {GRAPH_SNAPSHOT_VERSION}')
+        return GraphSnapshot(arrays)
+
+    def __str__(self):
+        return f'GraphSnapshot: {len(self.node_ids)} nodes, {len(self.indices)} edges, ' \
+               f'{len(self.arrays["values_offsets"]) - 1} values'
+
+
+def _get_string_arrays(name: str, strings: List[str]) -> dict:
+    """
+    :return: the UTF-8 encoded strings concatenated in one byte array and the offsets of the strings in it,
+             fixed width string arrays would pad every string to the longest one
+    """
+    encoded = [string.encode() for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(string) for string in encoded], dtype=np.int64), out=offsets[1:])
+    return {name: np.frombuffer(b''.join(encoded), dtype=np.uint8),
+            f'{name}_offsets': offsets}
+
+
+def _get_strings(arrays: dict, name: str) -> List[str]:
+    buffer = arrays[name].tobytes()
+    offsets = arrays[f'{name}_offsets'].tolist()
+    return [buffer[start:end].decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def _encode_value(name: str, value):
+    """
+    :return: JSON compatible form of the value, dicts are stored as key value pairs to keep non string keys
+    :raise ValueError: if the value type is not supported
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, list):
+        return [_encode_value(name, item) for item in value]
+    if isinstance(value, dict):
+        return {'items': [[_encode_value(name, key), _encode_value(name, item)] for key, item in value.items()]}
+    raise ValueError(f'Unsupported value of {name} in the graph snapshot: {type(value).__name__}')
+
+
+def _decode_value(value):
+    if isinstance(value, list):
+        return [_decode_value(item) for item in value]
+    if isinstance(value, dict):
+        return {_decode_value(key): _decode_value(item) for key, item in value['items']}
+    return value
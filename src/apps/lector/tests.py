@@ -1,5 +1,13 @@
 import json
 import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from unittest import mock
+
+import networkx as nx
+from shapely.geometry import LineString
 
 from django.test import TestCase, override_settings
 
@@ -7,7 +15,26 @@ from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 
-from apps.lector.controllers import OSMController
+from apps.lector.build_manifest import BuildManifest
+from apps.lector.cache import OpenSpaceGraphCache
+from apps.lector.components import prune_components
+from apps.lector.dedup import deduplicate_edges
+from apps.lector.controllers import OSMController, build_open_space_delta, OPEN_SPACE_CROP_EXTENSION
+from apps.lector.edge_index import EdgeIndex
+from apps.lector.graph_delta import GraphDelta
+from apps.lector.jobs import JobQueue, get_plot_job_queue, JOB_DONE, JOB_FAILED
+from apps.lector.load_profile import PEDESTRIAN_LOAD_PROFILE
+from apps.lector.map_provider import CityMap
+from apps.lector.models import EDGE_TYPES, COLOR_MAP
+from apps.lector.node_ids import NodeIdAllocator, check_osm_node_ids, is_nested_namespace, NODE_ID_OFFSET, \
+    DEFAULT_NODE_ID_NAMESPACE, NODE_ID_NAMESPACE_SEPARATOR
+from apps.lector.osm_writer import write_osm_xml
+from apps.lector.renderer import render_svg
+from apps.lector.simplify import simplify_graph
+from apps.lector.snapshot import GraphSnapshot
+from apps.lector.warmup import GraphhopperWarmup, get_warmup_points, get_warmup_pairs
+from apps.open_space_controller.models import BBox
+from apps.open_space_controller.visibility import BRUTE_FORCE_VISIBILITY, STRTREE_VISIBILITY, BATCH_VISIBILITY
 
 PLOT_OUTPUT_DIR = "/test/plots"
 OPEN_SPACE_FILE_NAME = "markusplatz.geojson"
@@ -23,29 +50,72 @@ class LectorApiTest(TestCase):
     def setUp(self) -> None:
         self.client = APIClient()
 
-    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
-    def test_api_open_space_plot(self):
-        url = reverse('open-space-plot', kwargs={'file_name': 'erba.geojson'})
+    def build_plot(self, file_name) -> dict:
+        url = reverse('open-space-plot', kwargs={'file_name': file_name})
         response = self.client.get(url, format='json')
-        expected_data = self.load_json(f'plot_url_result.json')
+        self.assertEqual(response.status_code, 202)
+        job = json.loads(response.content)
+        get_plot_job_queue().wait(job['job_id'], timeout=600)
+        return job
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+    def test_api_open_space_plot(self):
+        job = self.build_plot('erba.geojson')
+        response = self.client.get(job['status_url'], format='json')
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(json.loads(response.content), expected_data)
+        self.assertEqual(json.loads(response.content), {'job_id': job['job_id'], 'file_name': 'erba.geojson',
+                                                        'status': JOB_DONE, **self.load_json(f'plot_url_result.json')})
 
-    @override_settings(MEDIA_ROOT=tempfile.gettempdir())
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), OPEN_SPACE_MAX_CACHING_TIME=1)
     def test_api_open_space_plot_cache(self):
+        self.build_plot('erba.geojson')
         url = reverse('open-space-plot', kwargs={'file_name': 'erba.geojson'})
-        self.client.get(url, format='json')
         response = self.client.get(url, format='json')
         expected_data = self.load_json(f'plot_url_result.json')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json.loads(response.content), expected_data)
 
+    def test_api_open_space_plot_job_missing(self):
+        url = reverse('open-space-plot-job', kwargs={'job_id': 'missing'})
+        response = self.client.get(url, format='json')
+        self.assertEqual(response.status_code, 404)
+
     def test_api_open_space_plot_with_wrong_filename(self):
         url = reverse('open-space-plot', kwargs={'file_name': 'missing.geojson'})
         response = self.client.get(url, format='json')
         self.assertEqual(response.status_code, 400)
 
 
+class JobQueueTests(TestCase):
+    def test_jobs_with_same_key_coalesce(self):
+        queue = JobQueue(max_workers=2)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def build():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+
+        first_job = queue.submit('erba.geojson', build)
+        started.wait(5)
+        self.assertIs(queue.submit('erba.geojson', build), first_job)
+        release.set()
+        self.assertEqual(queue.wait(first_job.id, timeout=5).status, JOB_DONE)
+        self.assertEqual(len(calls), 1)
+        self.assertIsNot(queue.submit('erba.geojson', build), first_job)
+
+    def test_failed_job(self):
+        queue = JobQueue(max_workers=1)
+
+        def build():
+            raise ValueError('missing open space')
+
+        job = queue.wait(queue.submit('missing.geojson', build).id, timeout=5)
+        self.assertEqual(job.status, JOB_FAILED)
+        self.assertEqual(job.error, 'missing open space')
+
+
 class GraphTests(TestCase):
     def setUp(self):
         self.osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
@@ -120,3 +190,621 @@ class GraphTests(TestCase):
         osmm.create_open_space_buildings_plot(open_space, buildings,
                                               output_dir=f'{PLOT_OUTPUT_DIR}',
                                               file_name=f'B_07_-_test_open_space_buildings_blocked_staircase_and_entries_-_{open_space.file_name}')
+
+    def test_open_space_strtree_visibility_equals_brute_force(self):
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        graph_open_space.visibility_mode = BRUTE_FORCE_VISIBILITY
+        expected_edges = graph_open_space.get_visibility_edges()
+        graph_open_space.visibility_mode = STRTREE_VISIBILITY
+        self.assertEqual(graph_open_space.get_visibility_edges(), expected_edges)
+
+    def test_open_space_batch_visibility_equals_brute_force(self):
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        graph_open_space.visibility_mode = BRUTE_FORCE_VISIBILITY
+        expected_edges = graph_open_space.get_visibility_edges()
+        graph_open_space.visibility_mode = BATCH_VISIBILITY
+        self.assertEqual(graph_open_space.get_visibility_edges(), expected_edges)
+
+    def test_open_space_batch_kernel_visibility_equals_brute_force(self):
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        graph_open_space.visibility_mode = BRUTE_FORCE_VISIBILITY
+        expected_edges = graph_open_space.get_visibility_edges()
+        graph_open_space.visibility_mode = BATCH_VISIBILITY
+        with mock.patch('apps.open_space_controller.visibility.SHAPELY_UFUNCS', False):
+            self.assertEqual(graph_open_space.get_visibility_edges(), expected_edges)
+
+    def test_open_space_delta_replays_build(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        before = self.osmm.graph.copy()
+        self.osmm._insert_open_space(buildings, graph_open_space)
+        delta = GraphDelta.from_graphs(open_space.file_name, before, self.osmm.graph)
+        delta.apply(before)
+        self.assertEqual(set(before.nodes), set(self.osmm.graph.nodes))
+        self.assertEqual(sorted((u, v) for u, v in before.edges()), sorted((u, v) for u, v in self.osmm.graph.edges()))
+
+    def test_open_space_delta_revert_restores_street_graph(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        before = self.osmm.graph.copy()
+        self.osmm._insert_open_space(buildings, graph_open_space)
+        delta = GraphDelta.from_graphs(open_space.file_name, before, self.osmm.graph)
+        delta.revert(self.osmm.graph, before)
+        self.assertEqual(set(before.nodes), set(self.osmm.graph.nodes))
+        self.assertEqual(sorted(before.edges(keys=True)), sorted(self.osmm.graph.edges(keys=True)))
+
+    def test_open_space_delta_build_equals_sequential_build(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        for open_space in self.osmm.osp_config_c.get_open_spaces():
+            street_graph = self.osmm.get_map(
+                open_space.get_boundaries(boundary_degree_extension=2 * OPEN_SPACE_CROP_EXTENSION))
+            self.osmm.graph = street_graph.copy()
+            self.osmm._insert_open_space(buildings, self.osmm._get_graph_open_space(open_space))
+            delta_osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                                       building_config_dir="/test/data/buildings/unblocked")
+            delta_osmm.graph = street_graph.copy()
+            delta_osmm._insert_open_spaces_from_deltas([open_space], buildings)
+            self.assertEqual(sorted(delta_osmm.graph.nodes(data=True), key=str),
+                             sorted(self.osmm.graph.nodes(data=True), key=str))
+            self.assertEqual(sorted(delta_osmm.graph.edges(keys=True, data=True), key=str),
+                             sorted(self.osmm.graph.edges(keys=True, data=True), key=str))
+
+    def test_bbox_build_keeps_overlapping_open_spaces_apart(self):
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        bbox = open_space.get_boundaries(boundary_degree_extension=2 * OPEN_SPACE_CROP_EXTENSION)
+        self.osmm.build_bbox_open_spaces(bbox)
+
+        def get_open_space_namespace(node):
+            namespace = self.osmm.node_ids.get_node_namespace(node)
+            return namespace.split(NODE_ID_NAMESPACE_SEPARATOR)[0] if namespace else None
+
+        owners = {get_open_space_namespace(node) for node in self.osmm.graph.nodes} - {None}
+        self.assertEqual(owners, {f'open_space:{OPEN_SPACE_FILE_NAME}', f'open_space:{BLOCKED_OPEN_SPACE_FILE_NAME}'})
+        for u, v in self.osmm.graph.edges():
+            self.assertLessEqual(len({get_open_space_namespace(u), get_open_space_namespace(v)} - {None}), 1)
+
+    def test_open_space_delta_with_missing_node_fails(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        before = self.osmm.graph.copy()
+        self.osmm._insert_open_space(buildings, graph_open_space)
+        delta = GraphDelta.from_graphs(open_space.file_name, before, self.osmm.graph)
+        street_node = next(node for u, v, _, _ in delta.added_edges for node in (u, v) if node in before)
+        before.remove_node(street_node)
+        graph = before.copy()
+        with self.assertRaises(ValueError):
+            delta.apply(before)
+        self.assertEqual(sorted(before.edges(keys=True)), sorted(graph.edges(keys=True)))
+
+    def test_open_space_incremental_visibility_equals_rebuild(self):
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        graph_open_space.add_visibility_graph_edges()
+        node_before, node_after = graph_open_space.walkable_area_nodes[0], graph_open_space.walkable_area_nodes[1]
+        coord_before = self.osmm.get_coord_from_id(node_before)
+        coord_after = self.osmm.get_coord_from_id(node_after)
+        node_id = self.osmm.add_osm_node([(coord_before[0] + coord_after[0]) / 2, (coord_before[1] + coord_after[1]) / 2])
+        entry_point = SimpleNamespace(graph_entry_edge=(node_before, node_after), nearest_graph_node_id=node_id)
+        graph_open_space.add_building_entry_to_open_space(entry_point)
+        graph_open_space.visibility_mode = BRUTE_FORCE_VISIBILITY
+        self.assertEqual(sorted(graph_open_space.edges), sorted(graph_open_space.get_visibility_edges()))
+
+    def test_open_space_insert_updates_visibility_incrementally(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        with mock.patch.object(graph_open_space, 'update_visibility_edges',
+                               wraps=graph_open_space.update_visibility_edges) as update_visibility_edges:
+            self.osmm._insert_open_space(buildings, graph_open_space)
+        self.assertTrue(update_visibility_edges.called)
+        graph_open_space.visibility_mode = BRUTE_FORCE_VISIBILITY
+        expected_edges = sorted(graph_open_space.get_visibility_edges())
+        self.assertEqual(sorted(graph_open_space.edges), expected_edges)
+        self.assertEqual(sorted([u, v] for u, v, color_label in self.osmm.graph.edges(data='color_label')
+                                if color_label == EDGE_TYPES.OPEN_SPACE_VISIBLITY), expected_edges)
+
+    def test_open_space_node_ids_use_open_space_namespace(self):
+        buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        self.osmm._insert_open_space(buildings, graph_open_space)
+        namespaces = {self.osmm.node_ids.get_node_namespace(node) for node in self.osmm.graph.nodes
+                      if self.osmm.node_ids.is_generated_id(node)}
+        self.assertIn(f'open_space:{OPEN_SPACE_FILE_NAME}', namespaces)
+        self.assertTrue(all(namespace.startswith(f'open_space:{OPEN_SPACE_FILE_NAME}') for namespace in namespaces))
+        node_id = self.osmm.add_osm_node([0.0, 0.0])
+        self.assertEqual(self.osmm.node_ids.get_node_namespace(node_id), DEFAULT_NODE_ID_NAMESPACE)
+
+    def test_pedestrian_load_profile_keeps_entry_edges(self):
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        bbox = open_space.get_boundaries(boundary_degree_extension=2 * OPEN_SPACE_CROP_EXTENSION)
+        entry_edges = []
+        for load_profile in [None, PEDESTRIAN_LOAD_PROFILE]:
+            osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                                 building_config_dir="/test/data/buildings/unblocked", load_profile=load_profile)
+            osmm.build_bbox_open_spaces(bbox)
+            entry_edges.append(sorted((osmm.get_coord_from_id(u), osmm.get_coord_from_id(v))
+                                      for u, v, color_label in osmm.graph.edges(data='color_label')
+                                      if color_label in [EDGE_TYPES.OPEN_SPACE_ENTRY, EDGE_TYPES.BUILDING_ENTRY]))
+        self.assertTrue(entry_edges[0])
+        self.assertEqual(entry_edges[1], entry_edges[0])
+
+    def test_prune_keeps_nested_building_islands(self):
+        open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        self.osmm.build_bbox_open_spaces(open_space.get_boundaries(boundary_degree_extension=2 * OPEN_SPACE_CROP_EXTENSION))
+        namespace = next(namespace for namespace in self.osmm.node_ids.get_namespaces()
+                         if namespace.startswith(f'open_space:{OPEN_SPACE_FILE_NAME}/building:'))
+        building_nodes = {node for node in self.osmm.graph.nodes
+                          if self.osmm.node_ids.get_node_namespace(node) == namespace}
+        self.assertTrue(building_nodes)
+        self.osmm.graph.remove_edges_from([(u, v, key) for u, v, key in self.osmm.graph.edges(keys=True)
+                                           if (u in building_nodes) != (v in building_nodes)])
+        graph = self.osmm.graph.copy()
+
+        self.osmm.prune_graph_components(keep_islands=[namespace.split('/')[-1]])
+        self.assertTrue(building_nodes.issubset(self.osmm.graph.nodes))
+        self.osmm.graph = graph.copy()
+        self.osmm.prune_graph_components(keep_islands=[f'open_space:{OPEN_SPACE_FILE_NAME}'])
+        self.assertTrue(building_nodes.issubset(self.osmm.graph.nodes))
+        self.osmm.graph = graph
+        stats = self.osmm.prune_graph_components()
+        self.assertTrue(building_nodes.isdisjoint(self.osmm.graph.nodes))
+        self.assertIn(namespace, stats['dropped_labels'])
+
+    def test_open_space_reduced_visibility_preserves_shortest_paths(self):
+        open_space = self.osmm.osp_config_c.get_open_space(BLOCKED_OPEN_SPACE_FILE_NAME)
+        graph_open_space = self.osmm._init_open_space_graph(open_space)
+        graph_open_space.building_entry_nodes = graph_open_space.walkable_area_nodes[::3]
+        terminals = graph_open_space.get_terminal_nodes()
+        complete_graph = self._get_distance_graph(graph_open_space.get_visibility_edges(), terminals)
+        graph_open_space.reduced_visibility = True
+        reduced_graph = self._get_distance_graph(graph_open_space.get_visibility_edges(), terminals)
+        self.assertLess(graph_open_space.visibility_stats['reduced_edges'], graph_open_space.visibility_stats['edges'])
+        for terminal in terminals:
+            complete_lengths = nx.single_source_dijkstra_path_length(complete_graph, terminal)
+            reduced_lengths = nx.single_source_dijkstra_path_length(reduced_graph, terminal)
+            for other_terminal in terminals:
+                self.assertEqual(other_terminal in reduced_lengths, other_terminal in complete_lengths)
+                if other_terminal in complete_lengths:
+                    self.assertAlmostEqual(reduced_lengths[other_terminal], complete_lengths[other_terminal], places=12)
+
+    def _get_distance_graph(self, edges, nodes) -> nx.Graph:
+        graph = nx.Graph()
+        graph.add_nodes_from(nodes)
+        for node_from, node_to in edges:
+            coord_from, coord_to = self.osmm.get_coord_from_id(node_from), self.osmm.get_coord_from_id(node_to)
+            graph.add_edge(node_from, node_to,
+                           weight=((coord_from[0] - coord_to[0]) ** 2 + (coord_from[1] - coord_to[1]) ** 2) ** 0.5)
+        return graph
+
+
+class OpenSpaceGraphCacheTests(TestCase):
+    def setUp(self):
+        self.osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                                  building_config_dir="/test/data/buildings/unblocked")
+        self.cache = OpenSpaceGraphCache(cache_dir=tempfile.mkdtemp(), max_size=1024 * 1024)
+        self.open_space = self.osmm.osp_config_c.get_open_space(OPEN_SPACE_FILE_NAME)
+        self.buildings = self.osmm.indoor_map_c.building_cc.get_buildings()
+        self.osmm.graph = self.osmm.get_map(
+            self.open_space.get_boundaries(boundary_degree_extension=OPEN_SPACE_CROP_EXTENSION))
+        self.crop = self.osmm.get_open_space_crop(self.open_space)
+        self.delta = build_open_space_delta((self.open_space, self.buildings, self.crop,
+                                             "/test/data/open_spaces", "/test/data/buildings/unblocked",
+                                             self.osmm.visibility_mode, False))
+
+    def test_cache_replays_delta(self):
+        key = self.cache.get_key(self.open_space, self.buildings, self.crop)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, self.delta)
+        cached_delta = self.cache.get(key)
+        self.assertEqual(cached_delta.added_nodes, self.delta.added_nodes)
+        self.assertEqual(cached_delta.added_edges, self.delta.added_edges)
+        self.assertEqual(cached_delta.removed_nodes, self.delta.removed_nodes)
+        self.assertEqual(cached_delta.removed_edges, self.delta.removed_edges)
+
+    def test_cache_key_depends_on_options(self):
+        self.assertNotEqual(self.cache.get_key(self.open_space, self.buildings, self.crop),
+                            self.cache.get_key(self.open_space, self.buildings, self.crop, reduced_visibility=True))
+        self.assertNotEqual(self.cache.get_key(self.open_space, self.buildings, self.crop),
+                            self.cache.get_key(self.open_space, self.buildings, self.crop,
+                                               visibility_mode=BRUTE_FORCE_VISIBILITY))
+
+    def test_cached_build_equals_uncached_build(self):
+        bbox = self.open_space.get_boundaries(boundary_degree_extension=2 * OPEN_SPACE_CROP_EXTENSION)
+        graphs = []
+        namespaces = []
+        for graph_cache in [None, self.cache, self.cache]:
+            osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                                 building_config_dir="/test/data/buildings/unblocked", graph_cache=graph_cache)
+            osmm.build_bbox_open_spaces(bbox)
+            graphs.append(osmm.graph)
+            namespaces.append(osmm.node_ids.get_namespaces())
+            self.assertEqual(len(self.cache.get_entries()) > 0, graph_cache is not None)
+        self.assertEqual(namespaces[1:], namespaces[:1] * 2)
+        for graph in graphs[1:]:
+            self.assertEqual(sorted(graph.nodes(data=True), key=str), sorted(graphs[0].nodes(data=True), key=str))
+            self.assertEqual(sorted(graph.edges(data=True), key=str), sorted(graphs[0].edges(data=True), key=str))
+
+    def test_cache_prune(self):
+        key = self.cache.get_key(self.open_space, self.buildings, self.crop)
+        self.cache.put(key, self.delta)
+        self.assertEqual(self.cache.prune(max_size=0), [key])
+        self.assertEqual(self.cache.get_entries(), [])
+
+
+class BuildManifestTests(TestCase):
+    def test_save_load(self):
+        path = f'{tempfile.mkdtemp()}/manifest.json'
+        manifest = BuildManifest(BBox(1.0, 2.0, 3.0, 4.0), False, 'hash')
+        manifest.set_open_space(OPEN_SPACE_FILE_NAME, 'key', [f'open_space:{OPEN_SPACE_FILE_NAME}'])
+        manifest.save(path)
+        loaded = BuildManifest.load(path)
+        self.assertEqual(loaded.bbox.get_bbox(), manifest.bbox.get_bbox())
+        self.assertEqual(loaded.street_graph_hash, 'hash')
+        self.assertEqual(loaded.visibility_mode, STRTREE_VISIBILITY)
+        self.assertEqual(loaded.open_spaces,
+                         {OPEN_SPACE_FILE_NAME: {'key': 'key', 'namespaces': [f'open_space:{OPEN_SPACE_FILE_NAME}']}})
+        self.assertEqual(loaded.get_namespaces(), [f'open_space:{OPEN_SPACE_FILE_NAME}'])
+
+
+class CityMapTests(TestCase):
+    def setUp(self):
+        graph = nx.MultiDiGraph(crs={'init': 'epsg:4326'})
+        for node, (x, y) in enumerate([[10.0, 49.0], [10.1, 49.1], [10.2, 49.2], [10.1, 49.3]]):
+            graph.add_node(node, osmid=node, x=x, y=y)
+        graph.add_edge(0, 1)
+        graph.add_edge(1, 2)
+        graph.add_edge(1, 3)
+        self.city_map = CityMap(graph)
+
+    def test_crop(self):
+        crop = self.city_map.crop(BBox(49.25, 49.05, 10.25, 10.05))
+        self.assertEqual(sorted(crop.nodes), [1, 2])
+        self.assertEqual(list(crop.edges()), [(1, 2)])
+        self.assertEqual(crop.graph['crs'], {'init': 'epsg:4326'})
+
+    def test_crop_is_a_copy(self):
+        crop = self.city_map.crop(BBox(49.25, 49.05, 10.25, 10.05))
+        crop.remove_node(1)
+        self.assertIn(1, self.city_map.graph)
+
+
+class LoadProfileTests(TestCase):
+    def test_pedestrian_profile(self):
+        graph = nx.MultiDiGraph()
+        for node in range(4):
+            graph.add_node(node, osmid=node, x=float(node), y=0.0, ref='A1')
+        graph.add_edge(0, 1, highway='footway', name=''.join(['Markus', 'platz']), bridge='no', length=1.0)
+        graph.add_edge(1, 2, highway=['residential', 'motorway'], name='Markusplatz', length=1.0)
+        graph.add_edge(2, 3, highway='motorway', name='A73', length=1.0)
+        PEDESTRIAN_LOAD_PROFILE.apply(graph)
+        self.assertEqual(sorted(graph.nodes), [0, 1, 2])
+        self.assertEqual(sorted(graph.edges()), [(0, 1), (1, 2)])
+        self.assertEqual(graph[0][1][0], {'highway': 'footway', 'name': 'Markusplatz', 'length': 1.0})
+        self.assertNotIn('ref', graph.node[0])
+        self.assertIs(graph[0][1][0]['name'], graph[1][2][0]['name'])
+
+
+class EdgeIndexTests(TestCase):
+    def setUp(self):
+        graph = nx.MultiDiGraph()
+        for node, (x, y) in enumerate([[10.0, 49.0], [10.01, 49.0], [10.01, 49.01], [10.0, 49.01]]):
+            graph.add_node(node, osmid=node, x=x, y=y)
+        graph.add_edge(0, 1)
+        graph.add_edge(1, 2)
+        graph.add_edge(2, 1)
+        self.graph = graph
+        self.edge_index = EdgeIndex.from_graph(graph)
+
+    def test_nearest_edge(self):
+        self.assertEqual(self.edge_index.get_nearest_edge([10.005, 48.99]), (0, 1, 0))
+        self.assertEqual(self.edge_index.get_nearest_edge([10.1, 49.005]), (1, 2, 0))
+
+    def test_nearest_edge_after_update(self):
+        self.edge_index.remove_edge(1, 2, 0)
+        self.assertEqual(self.edge_index.get_nearest_edge([10.1, 49.005]), (2, 1, 0))
+        self.edge_index.add_edge(3, 2, 0, (10.0, 49.01), (10.01, 49.01))
+        self.assertEqual(self.edge_index.get_nearest_edge([10.005, 49.02]), (3, 2, 0))
+        self.assertEqual(len(self.edge_index), 3)
+
+    def test_controller_keeps_index_up_to_date(self):
+        osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                             building_config_dir="/test/data/buildings/unblocked")
+        osmm.graph = self.graph
+        self.assertEqual(osmm.get_nearest_edge([10.005, 48.99])[1:], (0, 1))
+        osmm.remove_osm_nodes([0])
+        node_id = osmm.add_osm_node([10.005, 48.98])
+        osmm.add_osm_edge(1, node_id, 'test')
+        self.assertEqual(osmm.get_nearest_edge([10.005, 48.97])[1:], (1, node_id))
+
+
+class GraphSnapshotTests(TestCase):
+    def setUp(self):
+        graph = nx.MultiDiGraph(crs={'init': 'epsg:4326'}, name='unnamed')
+        graph.add_node(1, osmid=1, x=10.0, y=49.0, highway='traffic_signals')
+        graph.add_node(2, osmid=2, x=10.1, y=49.0)
+        graph.add_node(3, osmid=3, x=10.1, y=49.1)
+        graph.add_edge(1, 2, osmid=42, highway='residential', name='Hauptstraße', oneway=False, length=12.5,
+                       maxspeed='30')
+        graph.add_edge(2, 1, osmid=[42, 43], highway=['residential', 'service'], name='Hauptstraße', oneway=False,
+                       length=12.5, maxspeed=0.01)
+        graph.add_edge(2, 3, highway='pedestrian', lanes='1', name='Platz', oneway=True,
+                       color_label=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
+        graph.add_edge(2, 3, highway='pedestrian', lanes='1', name='Platz', oneway=True,
+                       color_label=EDGE_TYPES.OPEN_SPACE_WALKABLE)
+        self.graph = graph
+
+    def test_snapshot_round_trip(self):
+        path = f'{tempfile.mkdtemp()}/graph.npz'
+        GraphSnapshot.from_graph(self.graph).save(path)
+        graph = GraphSnapshot.load(path).to_graph()
+        self.assertEqual(graph.graph, self.graph.graph)
+        self.assertEqual(dict(graph.nodes(data=True)), dict(self.graph.nodes(data=True)))
+        self.assertEqual(sorted(graph.edges(keys=True, data=True), key=lambda edge: edge[:3]),
+                         sorted(self.graph.edges(keys=True, data=True), key=lambda edge: edge[:3]))
+
+    def test_snapshot_keeps_value_types(self):
+        graph = GraphSnapshot.from_graph(self.graph).to_graph()
+        self.assertEqual(graph[2][1][0]['osmid'], [42, 43])
+        self.assertIsInstance(graph[2][1][0]['maxspeed'], float)
+        self.assertIsInstance(graph[1][2][0]['maxspeed'], str)
+        self.assertIsNot(graph[2][1][0]['highway'], self.graph[2][1][0]['highway'])
+
+    def test_snapshot_rejects_unsupported_values(self):
+        self.graph.add_edge(1, 3, geometry=LineString([(10.0, 49.0), (10.1, 49.1)]))
+        with self.assertRaises(ValueError):
+            GraphSnapshot.from_graph(self.graph)
+
+    def test_snapshot_does_not_pad_values(self):
+        self.graph.add_edge(1, 3, name='a' * 10000)
+        snapshot = GraphSnapshot.from_graph(self.graph)
+        self.assertLess(snapshot.arrays['values'].nbytes, 10000 + 1000)
+        self.assertEqual(snapshot.to_graph()[1][3][0]['name'], 'a' * 10000)
+
+    def test_snapshot_adjacency(self):
+        snapshot = GraphSnapshot.from_graph(self.graph)
+        node_index = snapshot.node_ids.tolist().index(2)
+        targets = snapshot.node_ids[snapshot.indices[snapshot.get_out_edges(node_index)]].tolist()
+        self.assertEqual(sorted(targets), [1, 3, 3])
+
+    def test_controller_snapshot(self):
+        path = f'{tempfile.mkdtemp()}/graph.npz'
+        osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                             building_config_dir="/test/data/buildings/unblocked")
+        osmm.graph = self.graph
+        node_id = osmm.add_osm_node([10.0, 49.1])
+        osmm.save_graph_snapshot(path)
+        osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                             building_config_dir="/test/data/buildings/unblocked")
+        osmm.load_graph_snapshot(path)
+        self.assertEqual(osmm.graph.number_of_edges(), 4)
+        self.assertEqual(osmm.add_osm_node([10.0, 49.2]), node_id + 1)
+
+
+class OSMWriterTests(TestCase):
+    def test_write_osm_xml(self):
+        graph = nx.MultiDiGraph()
+        graph.add_node(1, osmid=1, x=10.0, y=49.0, highway='traffic_signals')
+        graph.add_node(2, osmid=2, x=10.1, y=49.0)
+        graph.add_edge(1, 2, highway='residential', name='Obere & "Untere" Brücke', oneway=False, maxspeed='30')
+        graph.add_edge(2, 1, highway='pedestrian', lanes='1', name='Platz', oneway=True,
+                       color_label=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
+        path = f'{tempfile.mkdtemp()}/data.osm'
+        write_osm_xml(graph, path)
+
+        root = ET.parse(path).getroot()
+        nodes = root.findall('node')
+        self.assertEqual([(node.get('id'), node.get('lat'), node.get('lon')) for node in nodes],
+                         [('1', '49.0', '10.0'), ('2', '49.0', '10.1')])
+        self.assertEqual(nodes[0].find('tag').attrib, {'k': 'highway', 'v': 'traffic_signals'})
+        ways = root.findall('way')
+        self.assertEqual([[nd.get('ref') for nd in way.findall('nd')] for way in ways], [['1', '2'], ['2', '1']])
+        tags = [{tag.get('k'): tag.get('v') for tag in way.findall('tag')} for way in ways]
+        self.assertEqual(tags[0], {'highway': 'residential', 'maxspeed': '30', 'name': 'Obere & "Untere" Brücke',
+                                   'oneway': 'no'})
+        self.assertEqual(tags[1], {'highway': 'pedestrian', 'lanes': '1', 'name': 'Platz', 'oneway': 'yes'})
+
+
+class RendererTests(TestCase):
+    def test_render_svg(self):
+        graph = nx.MultiDiGraph()
+        graph.add_node(1, x=10.0, y=49.0)
+        graph.add_node(2, x=10.1, y=49.0)
+        graph.add_node(3, x=10.1, y=49.1)
+        graph.add_edge(1, 2)
+        graph.add_edge(2, 1)
+        graph.add_edge(2, 3, color_label=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
+        path = f'{tempfile.mkdtemp()}/plot.svg'
+        render_svg(graph, path)
+
+        root = ET.parse(path).getroot()
+        self.assertEqual(root.get('height'), '432pt')
+        paths = {element.get('stroke'): element.get('d') for element in root.iter('{http://www.w3.org/2000/svg}path')}
+        self.assertEqual(set(paths), {'#66ccff', COLOR_MAP[EDGE_TYPES.NORMAL],
+                                      COLOR_MAP[EDGE_TYPES.OPEN_SPACE_VISIBLITY]})
+        self.assertEqual(paths[COLOR_MAP[EDGE_TYPES.NORMAL]].count('M'), 1)
+        self.assertEqual(paths['#66ccff'].count('M'), 3)
+
+
+class NodeIdAllocatorTests(TestCase):
+    def test_namespaces_are_deterministic_and_disjoint(self):
+        allocator = NodeIdAllocator()
+        first_ids = [allocator.get_new_id('open_space:a.geojson') for _ in range(3)]
+        other_id = allocator.get_new_id('open_space:b.geojson')
+        self.assertEqual(first_ids, [first_ids[0], first_ids[0] + 1, first_ids[0] + 2])
+        self.assertNotIn(other_id, first_ids)
+        self.assertEqual(NodeIdAllocator().get_new_id('open_space:b.geojson'), other_id)
+        self.assertGreaterEqual(min(first_ids + [other_id]), NODE_ID_OFFSET)
+
+    def test_block_collision(self):
+        allocator = NodeIdAllocator(blocks=1)
+        allocator.get_new_id('open_space:a.geojson')
+        with self.assertRaises(ValueError):
+            allocator.get_new_id('open_space:b.geojson')
+
+    def test_exhausted_block(self):
+        allocator = NodeIdAllocator(block_size=2)
+        allocator.get_new_id('a')
+        allocator.get_new_id('a')
+        with self.assertRaises(ValueError):
+            allocator.get_new_id('a')
+
+    def test_reserve_ids(self):
+        allocator = NodeIdAllocator()
+        node_id = NodeIdAllocator().get_new_id('a')
+        allocator.reserve_ids([1, node_id + 4])
+        self.assertEqual(allocator.get_new_id('a'), node_id + 5)
+
+    def test_is_nested_namespace(self):
+        self.assertTrue(is_nested_namespace('open_space:a/building:1', 'open_space:a/building:1'))
+        self.assertTrue(is_nested_namespace('open_space:a/building:1', 'open_space:a'))
+        self.assertTrue(is_nested_namespace('open_space:a/building:1', 'building:1'))
+        self.assertFalse(is_nested_namespace('open_space:a/building:10', 'building:1'))
+        self.assertFalse(is_nested_namespace('open_space:a', 'open_space:a/building:1'))
+
+    def test_check_osm_node_ids(self):
+        graph = nx.MultiDiGraph()
+        graph.add_node(1)
+        check_osm_node_ids(graph)
+        graph.add_node(NODE_ID_OFFSET)
+        with self.assertRaises(ValueError):
+            check_osm_node_ids(graph)
+
+
+class PruneComponentsTests(TestCase):
+    def setUp(self):
+        self.allocator = NodeIdAllocator()
+        self.island_node = self.allocator.get_new_id('open_space:island.geojson')
+        self.orphan_node = self.allocator.get_new_id('building:M3')
+        self.graph = nx.MultiDiGraph()
+        self.graph.add_edges_from([(1, 2), (2, 3), (3, 1), (4, 5), (self.island_node, 6)])
+        self.graph.add_node(self.orphan_node)
+
+    def test_prune_keeps_main_component(self):
+        stats = prune_components(self.graph, label_node=self.allocator.get_node_namespace)
+        self.assertEqual(sorted(self.graph.nodes), [1, 2, 3])
+        self.assertEqual(stats['components'], 4)
+        self.assertEqual(sorted(stats['dropped_sizes']), [1, 2, 2])
+        self.assertEqual(stats['dropped_labels'], ['building:M3', 'open_space:island.geojson'])
+
+    def test_prune_keeps_whitelisted_islands(self):
+        stats = prune_components(self.graph, keep_nodes=[self.island_node])
+        self.assertEqual(sorted(self.graph.nodes), [1, 2, 3, 6, self.island_node])
+        self.assertEqual(stats['kept_islands'], 1)
+
+
+class DeduplicateEdgesTests(TestCase):
+    def test_deduplicate_edges(self):
+        graph = nx.MultiDiGraph()
+        graph.add_edge(1, 2, oneway=True, color_label=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
+        graph.add_edge(2, 1, oneway=True, color_label=EDGE_TYPES.OPEN_SPACE_WALKABLE)
+        graph.add_edge(1, 2, oneway=True, color_label=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
+        graph.add_edge(3, 4, oneway=False)
+        graph.add_edge(4, 3, oneway=False)
+        graph.add_edge(5, 6, oneway=True)
+        graph.add_edge(5, 6, oneway=True, inner_nodes=[7])
+        stats = deduplicate_edges(graph)
+        self.assertEqual(sorted(graph.edges()), [(2, 1), (3, 4), (5, 6), (5, 6)])
+        self.assertEqual(graph[2][1][0], {'oneway': False, 'color_label': EDGE_TYPES.OPEN_SPACE_WALKABLE})
+        self.assertEqual(stats['removed'], {'OPEN_SPACE_VISIBLITY': 2, 'NORMAL': 1})
+        self.assertEqual(stats['bidirectional'], 1)
+
+    def test_deduplicate_keeps_maxspeed(self):
+        graph = nx.MultiDiGraph()
+        graph.add_edge(1, 2, color_label=EDGE_TYPES.BUILDING_STAIRCASE)
+        graph.add_edge(2, 1, color_label=EDGE_TYPES.BUILDING_STAIRCASE, maxspeed=0.01)
+        deduplicate_edges(graph)
+        self.assertEqual(list(graph.edges(data='maxspeed')), [(2, 1, 0.01)])
+
+
+class SimplifyGraphTests(TestCase):
+    def setUp(self):
+        # Twoway street 1-2-3-4, oneway street 4-5-6 and an open space entry edge at 3
+        self.graph = nx.MultiDiGraph()
+        for node in range(1, 8):
+            self.graph.add_node(node, x=float(node), y=0.0)
+        for u, v in [(1, 2), (2, 3), (3, 4)]:
+            self.graph.add_edge(u, v, highway='footway', oneway=False, length=1.0)
+            self.graph.add_edge(v, u, highway='footway', oneway=False, length=1.0)
+        for u, v in [(4, 5), (5, 6)]:
+            self.graph.add_edge(u, v, highway='residential', oneway=True, length=1.0)
+        self.graph.add_edge(3, 7, highway='pedestrian', oneway=True, color_label=EDGE_TYPES.OPEN_SPACE_ENTRY)
+
+    def test_simplify_merges_chains(self):
+        stats = simplify_graph(self.graph)
+        self.assertEqual(sorted(self.graph.nodes), [1, 3, 4, 6, 7])
+        self.assertEqual(stats['nodes_before'] - stats['nodes_after'], 2)
+        self.assertEqual(self.graph[1][3][0]['inner_nodes'], [2])
+        self.assertEqual(self.graph[3][1][0]['length'], 2.0)
+        self.assertEqual(list(self.graph[4][6][0]['geometry'].coords), [(4.0, 0.0), (5.0, 0.0), (6.0, 0.0)])
+        self.assertNotIn(4, self.graph[6])
+        self.assertEqual(self.graph[3][7][0]['color_label'], EDGE_TYPES.OPEN_SPACE_ENTRY)
+
+    def test_simplify_keeps_protected_nodes(self):
+        simplify_graph(self.graph, protected_nodes=[2])
+        self.assertIn(2, self.graph)
+        self.assertNotIn(5, self.graph)
+
+    def test_export_writes_inner_nodes(self):
+        simplify_graph(self.graph)
+        path = f'{tempfile.mkdtemp()}/data.osm'
+        write_osm_xml(self.graph, path)
+        root = ET.parse(path).getroot()
+        self.assertEqual(sorted(int(node.get('id')) for node in root.iter('node')), list(range(1, 8)))
+        self.assertIn(['4', '5', '6'], [[nd.get('ref') for nd in way.iter('nd')] for way in root.iter('way')])
+
+
+class GraphhopperStandInHandler(BaseHTTPRequestHandler):
+    """
+    Answers /info and /route like graphhopper, routes starting at lat 0 fail
+    """
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        status = 400 if self.path.startswith('/route?point=0.0') else 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class GraphhopperWarmupTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), GraphhopperStandInHandler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.warmup = GraphhopperWarmup(f'http://127.0.0.1:{self.server.server_port}', concurrency=3)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_warmup_points_and_pairs(self):
+        osmm = OSMController(open_space_config_dir="/test/data/open_spaces",
+                             building_config_dir="/test/data/buildings/unblocked")
+        points = get_warmup_points(osmm.indoor_map_c.building_cc.get_buildings(), osmm.osp_config_c.get_open_spaces())
+        pairs = get_warmup_pairs(points, routes=2 * len(points))
+        self.assertEqual(len(points), len(set(points)))
+        self.assertEqual(pairs, get_warmup_pairs(points, routes=2 * len(points)))
+        self.assertEqual({start for start, _ in pairs}, set(points))
+        self.assertTrue(all(start != end for start, end in pairs))
+
+    def test_warmup_run(self):
+        self.assertTrue(self.warmup.wait_until_ready(timeout=5))
+        pairs = [((10.0, 49.0), (10.1, 49.1))] * 9 + [((10.0, 0.0), (10.1, 49.1))]
+        report = self.warmup.run(pairs)
+        self.assertEqual(report['routes'], 10)
+        self.assertEqual(report['errors'], 1)
+        self.assertLessEqual(report['p50'], report['p90'])
+        self.assertLessEqual(report['p99'], report['max'])
+        self.assertEqual(len([path for path in self.server.paths if path.startswith('/route')]), 10)
+
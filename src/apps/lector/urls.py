@@ -5,4 +5,5 @@ from apps.lector import views
 urlpatterns = [
     # API Version 1
     path('open-spaces/<str:file_name>/plot/', views.ApiOpenSpacePlot.as_view(), name='open-space-plot'),
+    path('open-spaces/plot-jobs/<str:job_id>/', views.ApiOpenSpacePlotJob.as_view(), name='open-space-plot-job'),
 ]
@@ -5,6 +5,7 @@ import logging
 import os
 
 from django.conf import settings
+from django.urls import reverse
 from django.utils import timezone
 from rest_framework import views, status
 from rest_framework.decorators import permission_classes
@@ -12,6 +13,7 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
 from apps.lector.controllers import OSMController
+from apps.lector.jobs import get_plot_job_queue, JOB_DONE, JOB_FAILED
 
 logger = logging.getLogger(__name__)
 '''
@@ -19,28 +21,67 @@ Author: Michael Götz
 '''
 
 
+def get_open_space_plot_url(file_name: str) -> str:
+    return f'{settings.MEDIA_URL}{file_name}.svg'
+
+
+def is_open_space_plot_cached(file_name: str) -> bool:
+    """
+    :return: whether the plot exists and is younger than OPEN_SPACE_MAX_CACHING_TIME hours
+    """
+    try:
+        timestamp = os.path.getctime(f'{settings.MEDIA_ROOT}/{file_name}.svg')
+    except FileNotFoundError:
+        return False
+    creation_time = datetime.datetime.fromtimestamp(timestamp, tz=timezone.get_current_timezone())
+    max_creation_time = timezone.localtime(timezone.now()) - datetime.timedelta(
+        hours=settings.OPEN_SPACE_MAX_CACHING_TIME)
+    return creation_time >= max_creation_time
+
+
+def build_open_space_plot(file_name: str):
+    osmm = OSMController()
+    osmm.create_complete_open_space_plot(osmm.osp_config_c.get_open_space(file_name), settings.MEDIA_ROOT)
+
+
 @permission_classes((AllowAny,))
 class ApiOpenSpacePlot(views.APIView):
     """
-    Build the visibility graph for a specific open space, save the graph and returns the save location.
-    Implements simple caching controlled over setting attribute
+    Returns the location of the visibility graph plot of a specific open space.
+    Implements simple caching controlled over setting attribute, missing or outdated plots are built in a
+    background job: the response is 202 with the job id and the url of the job status
     """
 
     def get(self, request, file_name):
         osmm = OSMController()
         open_space = osmm.osp_config_c.get_open_space(file_name)
         if open_space:
-            try:
-                timestamp = os.path.getctime(f'{settings.MEDIA_ROOT}/{open_space.file_name}.svg')
-                creation_time = datetime.datetime.fromtimestamp(timestamp, tz=timezone.get_current_timezone())
-                max_creation_time = timezone.localtime(timezone.now()) - datetime.timedelta(
-                    hours=settings.OPEN_SPACE_MAX_CACHING_TIME)
-
-                if creation_time < max_creation_time:
-                    osmm.create_complete_open_space_plot(open_space, settings.MEDIA_ROOT)
-            except FileNotFoundError as err:
-                osmm.create_complete_open_space_plot(open_space, settings.MEDIA_ROOT)
-
-            return Response({"url": f'{settings.MEDIA_URL}{open_space.file_name}.svg'},
-                            status=status.HTTP_200_OK, headers={'access-control-allow-origin': '*'})
+            if is_open_space_plot_cached(open_space.file_name):
+                return Response({"url": get_open_space_plot_url(open_space.file_name)},
+                                status=status.HTTP_200_OK, headers={'access-control-allow-origin': '*'})
+
+            job = get_plot_job_queue().submit(open_space.file_name,
+                                              lambda: build_open_space_plot(open_space.file_name))
+            return Response({"job_id": job.id,
+                             "status": job.status,
+                             "status_url": reverse('open-space-plot-job', kwargs={'job_id': job.id})},
+                            status=status.HTTP_202_ACCEPTED, headers={'access-control-allow-origin': '*'})
         return Response(status=status.HTTP_400_BAD_REQUEST, headers={'access-control-allow-origin': '*'})
+
+
+@permission_classes((AllowAny,))
+class ApiOpenSpacePlotJob(views.APIView):
+    """
+    Returns the status of an open space plot job and the location of the plot once the job is done
+    """
+
+    def get(self, request, job_id):
+        job = get_plot_job_queue().get_job(job_id)
+        if job:
+            data = {"job_id": job.id, "file_name": job.key, "status": job.status}
+            if job.status == JOB_DONE:
+                data["url"] = get_open_space_plot_url(job.key)
+            if job.status == JOB_FAILED:
+                data["error"] = job.error
+            return Response(data, status=status.HTTP_200_OK, headers={'access-control-allow-origin': '*'})
+        return Response(status=status.HTTP_404_NOT_FOUND, headers={'access-control-allow-origin': '*'})
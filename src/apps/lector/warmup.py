@@ -0,0 +1,147 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+import requests
+from django.conf import settings
+
+from apps.building_controller.models import Building
+from apps.open_space_controller.models import OpenSpace
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ROUTES = 200
+WARMUP_CONCURRENCY = 4
+WARMUP_TIMEOUT = 30
+WARMUP_READY_TIMEOUT = 10 * 60
+WARMUP_VEHICLE = 'foot'
+WARMUP_PERCENTILES = [50, 90, 99]
+
+
+def get_warmup_points(buildings: List[Building], open_spaces: List[OpenSpace]) -> List[Tuple[float, float]]:
+    """
+    :return: [lon, lat] of all building entrances, staircases and open space entry points without duplicates
+    """
+    points = []
+    for building in buildings:
+        for staircase in building.staircases:
+            points.append(staircase.coord)
+            points.extend(entry.open_space_coord for entry in staircase.entries)
+    for open_space in open_spaces:
+        points.extend(entry_point.open_space_coord for entry_point in open_space.entry_points)
+    return list(dict.fromkeys((float(lon), float(lat)) for lon, lat in points))
+
+
+def get_warmup_pairs(points: List[Tuple[float, float]], routes=WARMUP_ROUTES, seed=0) \
+        -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+    """
+    Pair every point with random other points. Every point is a route start once before any point repeats,
+    the pairs are the same for the same points and seed
+
+    :param points: [lon, lat] points, e.g. of get_warmup_points
+    :param routes: number of pairs
+    """
+    if len(points) < 2:
+        return []
+    rng = random.Random(seed)
+    starts = list(points)
+    rng.shuffle(starts)
+    pairs = []
+    for index in range(routes):
+        start = starts[index % len(starts)]
+        end = rng.choice(points)
+        while end == start:
+            end = rng.choice(points)
+        pairs.append((start, end))
+    return pairs
+
+
+class GraphhopperWarmup:
+    """
+    Replay routes against a freshly started graphhopper, so the first user requests do not hit a cold instance
+    """
+
+    def __init__(self, url: str, concurrency=WARMUP_CONCURRENCY, timeout=WARMUP_TIMEOUT, vehicle=WARMUP_VEHICLE):
+        """
+        :param url: base url of the graphhopper service, e.g. http://graphhopper:8989
+        :param concurrency: maximum number of parallel route requests
+        :param timeout: timeout of a single request in seconds
+        """
+        self.url = url.rstrip('/')
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.vehicle = vehicle
+        self._sessions = threading.local()
+
+    def wait_until_ready(self, timeout=WARMUP_READY_TIMEOUT, interval=1.0) -> bool:
+        """
+        Poll the info endpoint until graphhopper has loaded its graph
+
+        :return: whether graphhopper answered within the timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self._get_session().get(f'{self.url}/info', timeout=self.timeout).status_code == 200:
+                    return True
+            except requests.RequestException:
+                pass
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def run(self, pairs: List[Tuple[Tuple[float, float], Tuple[float, float]]]) -> dict:
+        """
+        Request a route for every pair with at most concurrency requests in flight
+
+        :param pairs: [lon, lat] start and end points
+        :return: number of routes and errors, the duration and the latency percentiles in ms
+        """
+        start_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(self._request_route, pairs))
+        latencies = [latency for latency, ok in results if ok]
+        report = {'routes': len(results),
+                  'errors': len(results) - len(latencies),
+                  'seconds': time.monotonic() - start_time}
+        for percentile in WARMUP_PERCENTILES:
+            report[f'p{percentile}'] = float(np.percentile(latencies, percentile)) if latencies else None
+        report['max'] = max(latencies) if latencies else None
+        logger.info(f'Warm-up: {report}')
+        return report
+
+    def _request_route(self, pair) -> Tuple[float, bool]:
+        (start_lon, start_lat), (end_lon, end_lat) = pair
+        params = [('point', f'{start_lat},{start_lon}'), ('point', f'{end_lat},{end_lon}'),
+                  ('vehicle', self.vehicle), ('points_encoded', 'false')]
+        request_start = time.monotonic()
+        try:
+            ok = self._get_session().get(f'{self.url}/route', params=params, timeout=self.timeout).status_code == 200
+        except requests.RequestException as e:
+            logger.warning(f'Warm-up route {pair} failed: {e}')
+            ok = False
+        return (time.monotonic() - request_start) * 1000, ok
+
+    def _get_session(self) -> requests.Session:
+        session = getattr(self._sessions, 'session', None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+
+
+def warm_up_graphhopper(buildings: List[Building], open_spaces: List[OpenSpace], routes=WARMUP_ROUTES,
+                        url=None, concurrency=WARMUP_CONCURRENCY) -> dict or None:
+    """
+    Wait for graphhopper after a restart and replay routes between the configured entrances and entry points
+
+    :return: warm-up report of GraphhopperWarmup.run or None if graphhopper did not get ready
+    """
+    warmup = GraphhopperWarmup(url if url else settings.GRAPHHOPPER_URL, concurrency=concurrency)
+    if not warmup.wait_until_ready():
+        logger.error(f'Graphhopper at {warmup.url} did not get ready, skip warm-up')
+        return None
+    return warmup.run(get_warmup_pairs(get_warmup_points(buildings, open_spaces), routes=routes))
@@ -1,13 +1,22 @@
-import math
+import logging
 import os
-from typing import List
+from typing import List, Iterable, Optional, Tuple
 
-from shapely.geometry import Polygon, LineString, Point
+from shapely.geometry import Polygon, LineString, MultiPoint
 from shapely.prepared import prep
 
 from apps.lector.graph_models import GraphEntryPoint
-from apps.lector.models import EntryPoint
+from apps.lector.models import EntryPoint, EDGE_TYPES
 from apps.open_space_controller.models import OpenSpace
+from apps.open_space_controller.node_index import NearestNodeIndex, NodeRing
+from apps.open_space_controller.obstacles import OpenSpaceObstacles, get_contained_points
+from apps.open_space_controller.visibility import STRTREE_VISIBILITY, VISIBILITY_ENGINES, get_pairs_meeting_area, \
+    get_reduced_visibility_edges
+
+logger = logging.getLogger(__name__)
+
+# Ring id of the walkable area, restricted areas use their restricted area id
+WALKABLE_AREA_RING_ID = -1
 
 
 class OpenSpaceEntryPoint(EntryPoint):
@@ -20,29 +29,27 @@ class GraphOpenSpaceEntryPoint(OpenSpaceEntryPoint, GraphEntryPoint):
     Extend OpenSpaceEntryPoint with graph functions
     """
 
-    def __init__(self, entry_point: OpenSpaceEntryPoint, osmm, open_space):
+    def __init__(self, entry_point: OpenSpaceEntryPoint, osmm, open_space, open_space_node: int = None,
+                 nearest_edge=None):
         self.open_space_coord = entry_point.open_space_coord
-        GraphEntryPoint.__init__(self, entry_point=entry_point, osmm=osmm)
-        self.open_space_node = self._set_open_space_entry_point(open_space)
+        GraphEntryPoint.__init__(self, entry_point=entry_point, osmm=osmm, nearest_edge=nearest_edge)
+        self.open_space_node = open_space_node if open_space_node is not None \
+            else self._set_open_space_entry_point(open_space)
 
     def _set_open_space_entry_point(self, open_space):
-        node_distance_list = []
-        for node in open_space.get_all_nodes():
-            coord = self.osmm.get_coord_from_id(node)
-            distance = math.sqrt(
-                math.pow(self.open_space_coord[0] - coord[0], 2) + math.pow(self.open_space_coord[1] - coord[1], 2))
-            node_distance_list.append({"distance": distance, "node": node})
-        return min(node_distance_list, key=lambda elem: elem['distance'])['node']
+        return open_space.get_nearest_nodes([self.open_space_coord])[0]
 
     def add_edges(self):
-        self.osmm.add_osm_edge(self.graph_entry_edge[0], self.nearest_graph_node_id, "Zugang Freifläche")
-        self.osmm.add_osm_edge(self.graph_entry_edge[1], self.nearest_graph_node_id, "Zugang Freifläche")
+        self.osmm.add_osm_edge(self.graph_entry_edge[0], self.nearest_graph_node_id, "Zugang Freifläche",
+                               type=EDGE_TYPES.OPEN_SPACE_ENTRY)
+        self.osmm.add_osm_edge(self.graph_entry_edge[1], self.nearest_graph_node_id, "Zugang Freifläche",
+                               type=EDGE_TYPES.OPEN_SPACE_ENTRY)
         self.osmm.add_osm_edge(self.open_space_node, self.nearest_graph_node_id,
-                               "Zugang Freifläche")
+                               "Zugang Freifläche", type=EDGE_TYPES.OPEN_SPACE_ENTRY)
 
 
 class GraphOpenSpace(OpenSpace):
-    def __init__(self, open_space: OpenSpace, osmm):
+    def __init__(self, open_space: OpenSpace, osmm, visibility_mode=STRTREE_VISIBILITY, reduced_visibility=False):
         super().__init__(file_name=open_space.file_name,
                          walkable_area=open_space.walkable_area_coords,
                          restricted_areas=open_space.restricted_areas_coords,
@@ -50,17 +57,24 @@ class GraphOpenSpace(OpenSpace):
                          entry_points=open_space.entry_points,
                          buildings=open_space.buildings)
         self.osmm = osmm
+        self.visibility_mode = visibility_mode
+        self.reduced_visibility = reduced_visibility
+        self.visibility_stats = {}
         self.walkable_area_poly = Polygon(open_space.walkable_area_coords)
         self.walkable_area_prep_poly = prep(self.walkable_area_poly)
-        self.walkable_area_nodes = []
+        self.walkable_area_nodes = NodeRing()
 
         self.restricted_area_polys = [Polygon(restricted_area) for restricted_area in self.restricted_areas_coords]
         self.restricted_areas_nodes = []
 
         self.blocked_area_polys = [Polygon(blocked_area) for blocked_area in self.blocked_areas_coords]
         self.blocked_areas_nodes = []
+        self._obstacles = None
+        self._nearest_node_index = None
+        self._node_ring_ids = {}
 
         self.graph_entry_points = []
+        self.building_entry_nodes = []
 
         self.edges = []
         #  Remove other nodes
@@ -69,46 +83,137 @@ class GraphOpenSpace(OpenSpace):
 
     def add_edge(self, from_id: int, to_id: int):
         self.edges.append([from_id, to_id])
-        self.osmm.add_osm_edge(from_id, to_id, self.get_name())
+        self.osmm.add_osm_edge(from_id, to_id, self.get_name(), type=EDGE_TYPES.OPEN_SPACE_VISIBLITY)
 
-    def edge_intersects_other_restricted_areas(self, line: LineString, restricted_area_poly: Polygon) -> bool:
+    def edge_intersects_other_restricted_areas(self, line: LineString, restricted_area_id: int,
+                                               restricted_area_ids: Iterable[int] = None) -> bool:
         """
-        check if a linestring intersects with other as restricted marked polygons which are different from the given restricted_Area_poly
+        check if a linestring intersects with other as restricted marked polygons which are different from the given restricted area
 
         :param line: the linestring which shall be checked
-        :param restricted_area_poly: the polygon which shall be excluded
+        :param restricted_area_id: the id of the restricted area which shall be excluded
+        :param restricted_area_ids: ids of the restricted areas to check against, defaults to all restricted areas
         :return: true if the linstring don't intesect other restricted polygon and touches the given polygon
         """
-        other_restricted_areas = self._get_other_restricted_area_polys(restricted_area_poly)
-        for other_restricted_area in other_restricted_areas:
-            other_areas = self._get_other_restricted_area_polys(other_restricted_area)
-            other_areas.remove(restricted_area_poly)
-            if prep(other_restricted_area).touches(line) and not self._is_restricted_line(line, other_areas):
+        obstacles = self.get_obstacles()
+        if restricted_area_ids is None:
+            restricted_area_ids = obstacles.get_restricted_area_ids()
+        other_restricted_area_ids = [other_id for other_id in restricted_area_ids if other_id != restricted_area_id]
+        for other_restricted_area_id in other_restricted_area_ids:
+            other_area_ids = [other_id for other_id in other_restricted_area_ids if other_id != other_restricted_area_id]
+            if obstacles.touches_restricted_area(line, other_restricted_area_id) \
+                    and not obstacles.intersects_restricted_areas(line, other_area_ids):
                 return False
-        return self._is_restricted_line(line, other_restricted_areas)
+        return obstacles.intersects_other_restricted_areas(line, restricted_area_id)
+
+    def get_obstacles(self) -> OpenSpaceObstacles:
+        """
+        :return: the precompiled obstacle model of the current open space geometry
+        """
+        if self._obstacles is None:
+            self._obstacles = OpenSpaceObstacles(self.walkable_area_poly,
+                                                 self.restricted_area_polys,
+                                                 self.blocked_area_polys)
+        return self._obstacles
+
+    def get_nearest_nodes(self, coords: List[List[float]]) -> List[int]:
+        """
+        :param coords: [x, y] coordinates
+        :return: for every coordinate the nearest open space node
+        """
+        if self._nearest_node_index is None:
+            nodes = self.get_all_nodes()
+            self._nearest_node_index = NearestNodeIndex(nodes, [self.osmm.get_coord_from_id(node) for node in nodes])
+        return self._nearest_node_index.get_nearest_nodes(coords)
+
+    def get_visibility_edges(self) -> List[List[int]]:
+        """
+        Compute the visibility edges between all open space nodes without changing the main graph.
+        In reduced visibility mode only the edges which can be part of a shortest path are returned
+
+        :return: list of [from_id, to_id] node pairs
+        """
+        edges = self.get_visibility_engine().get_visibility_edges()
+        if not self.reduced_visibility:
+            return edges
+        reduced_edges = get_reduced_visibility_edges(edges, self.get_rings(), self._get_node_coords(),
+                                                     self.get_terminal_nodes())
+        self.visibility_stats = {'edges': len(edges), 'reduced_edges': len(reduced_edges)}
+        logger.info(f'{self.file_name}: reduced visibility edges from {len(edges)} to {len(reduced_edges)}')
+        return reduced_edges
+
+    def get_visibility_engine(self):
+        """
+        :return: the visibility engine of the visibility mode for the current open space geometry
+        """
+        if self.visibility_mode not in VISIBILITY_ENGINES:
+            raise ValueError(f'Unknown visibility mode {self.visibility_mode}')
+        return VISIBILITY_ENGINES[self.visibility_mode](self)
+
+    def get_rings(self) -> List[Tuple[List[int], bool]]:
+        """
+        :return: the node rings of the open space and whether the free space lies inside the ring
+        """
+        return [(self.walkable_area_nodes, True)] \
+               + [(restricted_area_nodes, False) for restricted_area_nodes in self.restricted_areas_nodes]
+
+    def get_terminal_nodes(self) -> List[int]:
+        """
+        :return: the open space nodes which connect the open space to the street graph and the buildings
+        """
+        return [graph_entry_point.open_space_node for graph_entry_point in self.graph_entry_points] \
+               + self.building_entry_nodes
 
     def add_visibility_graph_edges(self):
         """
         Adds visibility edges to the main graph
         """
+        for node_from, node_to in self.get_visibility_edges():
+            self.add_edge(node_from, node_to)
+
+    def update_visibility_edges(self, node_id: int, node_before: int, node_after: int):
+        """
+        Update the visibility edges after a node was inserted into a ring of the open space.
+        The ring edge node_before - node_after was replaced by node_before - node_id - node_after, so the geometry only
+        changed inside the triangle of these nodes. Only the pairs of the new node and the node pairs whose connection
+        meets this triangle are checked again, the result equals a complete rebuild of the visibility graph
+
+        :param node_id: the inserted node
+        :param node_before: the ring predecessor of the inserted node
+        :param node_after: the ring successor of the inserted node
+        """
+        if self.reduced_visibility:
+            # The inserted node changes the tangents at its neighbours and the terminals, so rebuild the reduced graph
+            self._remove_visibility_edges()
+            self.add_visibility_graph_edges()
+            return
+        engine = self.get_visibility_engine()
         nodes = self.get_all_nodes()
-        for node_from in nodes:
-            for node_to in nodes:
-                if node_from < node_to:
-                    new_possible_edge = LineString(
-                        [self.osmm.get_coord_from_id(node_from), self.osmm.get_coord_from_id(node_to)])
-                    if self._is_visible_edge(new_possible_edge):
-                        self.add_edge(node_from, node_to)
+        coords = {node: self.osmm.get_coord_from_id(node) for node in nodes}
+        changed_area = MultiPoint([coords[node_before], coords[node_id], coords[node_after]]).convex_hull
+
+        changed_pairs = {tuple(sorted((node_id, node))) for node in nodes if node != node_id}
+        changed_pairs.update(tuple(sorted(pair)) for pair in get_pairs_meeting_area(nodes, coords, changed_area))
+        visible_pairs = {tuple(edge) for edge in self.edges}
+        removed_pairs = set()
+        for node_from, node_to in sorted(changed_pairs):
+            is_visible = engine.is_visible(coords[node_from], coords[node_to])
+            if is_visible and (node_from, node_to) not in visible_pairs:
+                self.add_edge(node_from, node_to)
+            elif not is_visible and (node_from, node_to) in visible_pairs:
+                self.osmm.remove_osm_edge(node_from, node_to)
+                removed_pairs.add((node_from, node_to))
+        self.edges = [edge for edge in self.edges if tuple(edge) not in removed_pairs]
 
     def add_walkable_edges(self):
-        self._set_polygon_edges(self.walkable_area_nodes)
+        self._set_polygon_edges(self.walkable_area_nodes, EDGE_TYPES.OPEN_SPACE_WALKABLE)
 
     def remove_walkable_edges(self):
         self._remove_polygon_edges(self.walkable_area_nodes)
 
     def add_restricted_area_edges(self):
         for restricted_area_nodes in self.restricted_areas_nodes:
-            self._set_polygon_edges(restricted_area_nodes)
+            self._set_polygon_edges(restricted_area_nodes, EDGE_TYPES.OPEN_SPACE_RESTRICTED)
 
     def remove_restricted_area_edges(self):
         for restricted_area_nodes in self.restricted_areas_nodes:
@@ -124,28 +229,51 @@ class GraphOpenSpace(OpenSpace):
 
     def add_building_entry_to_open_space(self, entry_point):
         """
-        Add the building entry point to the correct polygon an the open space
+        Add the building entry point to the correct polygon an the open space.
+        If the visibility graph was already built, it is updated incrementally
 
         :param entry_point: the buildings entry point
         """
+        self.building_entry_nodes.append(entry_point.nearest_graph_node_id)
+        self._nearest_node_index = None
         if self._is_open_space_walkable_node(entry_point.graph_entry_edge[0]):
-            self._insert_sorted(entry_point.nearest_graph_node_id, entry_point.graph_entry_edge[0],
-                                self.walkable_area_nodes)
+            self._insert_into_ring(WALKABLE_AREA_RING_ID, entry_point.graph_entry_edge[0],
+                                   entry_point.nearest_graph_node_id)
             self.walkable_area_poly = Polygon(
                 [[self.osmm.graph.node[node]['x'], self.osmm.graph.node[node]['y']] for node in
                  self.walkable_area_nodes])
             self.walkable_area_prep_poly = prep(self.walkable_area_poly)
+            self._obstacles = None
+            self._update_inserted_node_visibility(entry_point.nearest_graph_node_id, self.walkable_area_nodes)
         restricted_area_id = self._get_open_space_restricted_area_id(entry_point.graph_entry_edge[0])
         if self._get_open_space_restricted_area_id(entry_point.graph_entry_edge[0]) > -1:
-            self._insert_sorted(entry_point.nearest_graph_node_id, entry_point.graph_entry_edge[0],
-                                self.restricted_areas_nodes[restricted_area_id])
+            self._insert_into_ring(restricted_area_id, entry_point.graph_entry_edge[0],
+                                   entry_point.nearest_graph_node_id)
             self.restricted_area_polys[restricted_area_id] = Polygon(
                 [[self.osmm.graph.node[node]['x'], self.osmm.graph.node[node]['y']] for node in
                  self.restricted_areas_nodes[restricted_area_id]])
+            self._obstacles = None
+            self._update_inserted_node_visibility(entry_point.nearest_graph_node_id,
+                                                  self.restricted_areas_nodes[restricted_area_id])
 
     def get_name(self):
         return f'Freifläche {os.path.splitext(self.file_name)[0].upper()}'
 
+    def get_ring(self, ring_id: int) -> NodeRing:
+        """
+        :param ring_id: WALKABLE_AREA_RING_ID or a restricted area id
+        """
+        return self.walkable_area_nodes if ring_id == WALKABLE_AREA_RING_ID else self.restricted_areas_nodes[ring_id]
+
+    def get_node_ring(self, node_id: int) -> Optional[Tuple[int, int]]:
+        """
+        :return: ring id and index in the ring of the given node or None if the node is not part of a ring
+        """
+        if node_id not in self._node_ring_ids:
+            return None
+        ring_id = self._node_ring_ids[node_id]
+        return ring_id, self.get_ring(ring_id).index(node_id)
+
     def get_all_nodes(self) -> List[int]:
         """
         :return: a list including the walkable and restriced polygon nodes
@@ -157,100 +285,118 @@ class GraphOpenSpace(OpenSpace):
         return nodes
 
     def remove_open_space_nodes(self):
-        nodes = [node for node, data in self.osmm.graph.nodes(data=True) if
-                 self.walkable_area_prep_poly.contains(Point(self.osmm.get_coord_from_id(node)))]
-        for node in nodes:
-            self.osmm.graph.remove_node(node)
+        """
+        Remove all nodes of the main graph which lie inside the walkable area
+        """
+        nodes, coords = [], []
+        for node, data in self.osmm.graph.nodes(data=True):
+            nodes.append(node)
+            coords.append((data['x'], data['y']))
+        contained = get_contained_points(self.walkable_area_poly, coords)
+        self.osmm.remove_osm_nodes([node for node, is_contained in zip(nodes, contained) if is_contained])
 
     def add_graph_entry_points(self):
         for graph_entry_point in self.graph_entry_points:
             graph_entry_point.add_edges()
 
     def _is_open_space_walkable_node(self, node_id) -> bool:
-        return node_id in self.walkable_area_nodes
+        return self._node_ring_ids.get(node_id) == WALKABLE_AREA_RING_ID
 
     def _get_open_space_restricted_area_id(self, node_id) -> int:
-        for index, restricted_area_nodes in enumerate(self.restricted_areas_nodes):
-            if node_id in restricted_area_nodes:
-                return index
-        return -1
+        # Walkable area nodes map to WALKABLE_AREA_RING_ID, which is -1 as well
+        return self._node_ring_ids.get(node_id, -1)
 
-    def _get_other_restricted_area_polys(self, restricted_area_poly: Polygon) -> List[Polygon]:
-        other_restricted_area_polys = self.restricted_area_polys.copy()
-        other_restricted_area_polys.remove(restricted_area_poly)
-        return other_restricted_area_polys
-
-    def _is_visible_edge(self, edge: LineString) -> bool:
+    def _is_visible_edge(self, edge: LineString, restricted_area_ids: Iterable[int] = None,
+                         blocked_area_ids: Iterable[int] = None) -> bool:
         """
         check if the given edge is a visibile one. This means that it not intesects a blocking area and not intersects a restricted area
         :param edge: edge which shall be checked
+        :param restricted_area_ids: ids of the restricted areas to check against, defaults to all restricted areas
+        :param blocked_area_ids: ids of the blocked areas to check against, defaults to all blocked areas
         :return: true if condition is fullfilled
         """
-        if self._is_internal_edge(edge):
-            is_blocked = any([prep(blocked_poly).intersects(edge) for blocked_poly in self.blocked_area_polys])
-            if not is_blocked:
+        obstacles = self.get_obstacles()
+        if restricted_area_ids is None:
+            restricted_area_ids = obstacles.get_restricted_area_ids()
+        if blocked_area_ids is None:
+            blocked_area_ids = obstacles.get_blocked_area_ids()
+        if obstacles.is_internal(edge):
+            if not obstacles.is_blocked(edge, blocked_area_ids):
                 # Edge is not blocked
-                if not self._is_connected_on_restricted_area(edge):
+                if not self._is_connected_on_restricted_area(edge, restricted_area_ids):
                     # Edge is not blocked and not restricted connected
-                    return not self._is_restricted_line(edge, self.restricted_area_polys)
+                    return not obstacles.intersects_restricted_areas(edge, restricted_area_ids)
                 else:
                     # Edge is not blocked, but restriced connected
                     return True
         # Edge is not an internal edge, or blocked, or intersects restricted areas
         return False
 
-    def _is_connected_on_restricted_area(self, line: LineString) -> bool:
-        for restriced_area_poly in self.restricted_area_polys:
-            prep_restriced_poly = prep(restriced_area_poly)
-            if prep_restriced_poly.touches(line) and not self.edge_intersects_other_restricted_areas(line,
-                                                                                                     restriced_area_poly, ):
+    def _is_connected_on_restricted_area(self, line: LineString, restricted_area_ids: Iterable[int] = None) -> bool:
+        obstacles = self.get_obstacles()
+        if restricted_area_ids is None:
+            restricted_area_ids = obstacles.get_restricted_area_ids()
+        for restricted_area_id in restricted_area_ids:
+            if obstacles.touches_restricted_area(line, restricted_area_id) \
+                    and not self.edge_intersects_other_restricted_areas(line, restricted_area_id, restricted_area_ids):
                 return True
         return False
 
-        # Better naming Line that overlaps or contains line
+    def _get_node_coords(self) -> dict:
+        return {node: self.osmm.get_coord_from_id(node) for node in self.get_all_nodes()}
 
-    @staticmethod
-    def _is_restricted_line(line: LineString, restricted_area_polys: List[Polygon]) -> bool:
-        return any([prep(line).intersects(restriced_area_poly) for restriced_area_poly in restricted_area_polys])
+    def _remove_visibility_edges(self):
+        for node_from, node_to in self.edges:
+            self.osmm.remove_osm_edge(node_from, node_to)
+        self.edges = []
 
-    def _is_internal_edge(self, line: LineString) -> bool:
-        return self.walkable_area_prep_poly.covers(line)
+    def _update_inserted_node_visibility(self, node_id: int, ring_nodes: NodeRing):
+        if not self.edges or node_id not in ring_nodes:
+            return
+        self.update_visibility_edges(node_id, ring_nodes.prev(node_id), ring_nodes.next(node_id))
 
-    def _insert_sorted(self, to_insert_node, node_before, nodes):
-        for index, node_id in enumerate(nodes):
-            if node_id == node_before:
-                nodes.insert(index + 1, to_insert_node)
-                return
+    def _insert_into_ring(self, ring_id: int, node_before: int, node_id: int):
+        self.get_ring(ring_id).insert_after(node_before, node_id)
+        self._node_ring_ids[node_id] = ring_id
 
     def _set_node_ids(self):
         # Set Walkable Area Nodes
-        self.walkable_area_nodes = [self.osmm.add_osm_node(point) for point in self.walkable_area_coords]
-        self.graph_entry_points = [GraphOpenSpaceEntryPoint(entry_point, self.osmm, self) for entry_point in
-                                   self.entry_points]
+        self.walkable_area_nodes = NodeRing(self.osmm.add_osm_node(point) for point in self.walkable_area_coords)
+        self._node_ring_ids.update((node, WALKABLE_AREA_RING_ID) for node in self.walkable_area_nodes)
+        # Entry points are snapped to the walkable area nodes and the street graph edges
+        entry_point_coords = [entry_point.open_space_coord for entry_point in self.entry_points]
+        open_space_nodes = self.get_nearest_nodes(entry_point_coords) if self.entry_points else []
+        nearest_edges = self.osmm.get_nearest_edges(entry_point_coords) if self.entry_points else []
+        self.graph_entry_points = [GraphOpenSpaceEntryPoint(entry_point, self.osmm, self, open_space_node, nearest_edge)
+                                   for entry_point, open_space_node, nearest_edge
+                                   in zip(self.entry_points, open_space_nodes, nearest_edges)]
 
         # Set Restricted Area Nodes
-        for restricted_area_coords in self.restricted_areas_coords:
-            self.restricted_areas_nodes.append([self.osmm.add_osm_node(coord) for coord in restricted_area_coords])
+        for restricted_area_id, restricted_area_coords in enumerate(self.restricted_areas_coords):
+            restricted_area_nodes = NodeRing(self.osmm.add_osm_node(coord) for coord in restricted_area_coords)
+            self._node_ring_ids.update((node, restricted_area_id) for node in restricted_area_nodes)
+            self.restricted_areas_nodes.append(restricted_area_nodes)
 
         # Set Blocked Areas
         for blocked_area_coords in self.blocked_areas_nodes:
-            self.blocked_areas_nodes.append([self.osmm.add_osm_node(coord) for coord in blocked_area_coords])
+            self.blocked_areas_nodes.append(NodeRing(self.osmm.add_osm_node(coord) for coord in blocked_area_coords))
+        self._nearest_node_index = None
 
-    def _set_polygon_edges(self, nodes):
+    def _set_polygon_edges(self, nodes, edge_type: EDGE_TYPES):
         last_node = None
         for node in nodes:
             if last_node:
-                self.osmm.add_osm_edge(last_node, node, name=self.get_name())
+                self.osmm.add_osm_edge(last_node, node, name=self.get_name(), type=edge_type)
             last_node = node
-        self.osmm.add_osm_edge(nodes[0], nodes[-1], name=self.get_name())
+        self.osmm.add_osm_edge(nodes[0], nodes[-1], name=self.get_name(), type=edge_type)
 
     def _remove_polygon_edges(self, nodes):
         last_node = None
         for node in nodes:
             if last_node:
-                self.osmm.graph.remove_edge(last_node, node)
+                self.osmm.remove_osm_edge(last_node, node)
             last_node = node
-        self.osmm.graph.remove_edge(nodes[0], nodes[-1])
+        self.osmm.remove_osm_edge(nodes[0], nodes[-1])
 
     def plot_areas(self):
         import matplotlib.pyplot as plt
@@ -0,0 +1,178 @@
+import math
+from typing import List, Iterable, Iterator, Tuple
+
+# Grid cell size in degrees, about 7m x 11m in Bamberg
+NEAREST_NODE_CELL_SIZE = 0.0001
+
+
+class NearestNodeIndex:
+    """
+    Uniform grid over the node coordinates of an open space for nearest node queries, like the EdgeIndex of the
+    street graph. A query searches the grid in square rings of cells around its cell, clipped to the occupied cells
+    """
+
+    def __init__(self, nodes: List[int], coords: List[List[float]], cell_size=NEAREST_NODE_CELL_SIZE):
+        self.nodes = list(nodes)
+        self.coords = [(float(coord[0]), float(coord[1])) for coord in coords]
+        self.cell_size = cell_size
+        self._cells = {}
+        for index, (x, y) in enumerate(self.coords):
+            self._cells.setdefault(self._get_cell(x, y), []).append(index)
+        self._cell_bounds = (min(cell_x for cell_x, _ in self._cells), min(cell_y for _, cell_y in self._cells),
+                             max(cell_x for cell_x, _ in self._cells), max(cell_y for _, cell_y in self._cells)) \
+            if self._cells else None
+
+    def get_nearest_nodes(self, query_coords: List[List[float]]) -> List[int]:
+        """
+        :param query_coords: [x, y] coordinates
+        :return: for every coordinate the nearest node, the first node in node order on ties
+        """
+        if not self.nodes:
+            raise ValueError('Nearest node index is empty')
+        return [self.nodes[self._get_nearest_index(coord[0], coord[1])] for coord in query_coords]
+
+    def _get_nearest_index(self, x: float, y: float) -> int:
+        cell_x, cell_y = self._get_cell(x, y)
+        min_x, min_y, max_x, max_y = self._cell_bounds
+        radius = max(min_x - cell_x, cell_x - max_x, min_y - cell_y, cell_y - max_y, 0)
+        max_radius = max(cell_x - min_x, max_x - cell_x, cell_y - min_y, max_y - cell_y, 0)
+        best_index, best_distance = len(self.nodes), math.inf
+        while radius <= max_radius:
+            for cell in self._get_ring_cells(cell_x, cell_y, radius):
+                for index in self._cells.get(cell, ()):
+                    node_x, node_y = self.coords[index]
+                    # Squared distances order the nodes like the distances
+                    distance = (node_x - x) ** 2 + (node_y - y) ** 2
+                    if (distance, index) < (best_distance, best_index):
+                        best_index, best_distance = index, distance
+            # Nodes outside the searched cells are at least radius cells away
+            if best_distance < (radius * self.cell_size) ** 2:
+                break
+            radius += 1
+        return best_index
+
+    def _get_cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _get_ring_cells(self, cell_x: int, cell_y: int, radius: int):
+        """
+        :return: the cells of the square ring around the cell which lie inside the occupied cell bounds
+        """
+        min_x, min_y, max_x, max_y = self._cell_bounds
+        for row_y in sorted({cell_y - radius, cell_y + radius}):
+            if min_y <= row_y <= max_y:
+                for row_x in range(max(cell_x - radius, min_x), min(cell_x + radius, max_x) + 1):
+                    yield row_x, row_y
+        if radius > 0:
+            for column_x in sorted({cell_x - radius, cell_x + radius}):
+                if min_x <= column_x <= max_x:
+                    for column_y in range(max(cell_y - radius + 1, min_y), min(cell_y + radius - 1, max_y) + 1):
+                        yield column_x, column_y
+
+
+class NodeRing:
+    """
+    Ring of node ids stored as a doubly linked list.
+    Membership, neighbour lookup and insertion after a node are O(1), index access uses a cached node list and
+    index lookup a cached node to index map
+    """
+
+    def __init__(self, nodes: Iterable[int] = ()):
+        self._next = {}
+        self._prev = {}
+        self._positions = {}
+        self.first = None
+        self.last = None
+        self._nodes = None
+        self._indices = None
+        for node in nodes:
+            self.append(node)
+
+    def append(self, node: int):
+        if node in self._next:
+            raise ValueError(f'Node {node} is already part of the ring')
+        if self.first is None:
+            self.first = node
+            self._positions[node] = 0.0
+        else:
+            self._next[self.last] = node
+            self._prev[node] = self.last
+            self._positions[node] = self._positions[self.last] + 1.0
+        self._next[node] = self.first
+        self._prev[self.first] = node
+        self.last = node
+        self._nodes = None
+        self._indices = None
+
+    def insert_after(self, node_before: int, node: int):
+        """
+        :param node_before: ring node after which the node is inserted
+        :param node: the new node
+        """
+        if node_before not in self._next:
+            raise KeyError(f'Node {node_before} is not part of the ring')
+        if node_before == self.last:
+            self.append(node)
+            return
+        if node in self._next:
+            raise ValueError(f'Node {node} is already part of the ring')
+        node_after = self._next[node_before]
+        self._next[node_before] = node
+        self._prev[node] = node_before
+        self._next[node] = node_after
+        self._prev[node_after] = node
+        position = (self._positions[node_before] + self._positions[node_after]) / 2
+        self._positions[node] = position
+        self._nodes = None
+        self._indices = None
+        if not self._positions[node_before] < position < self._positions[node_after]:
+            self._renumber()
+
+    def next(self, node: int) -> int:
+        return self._next[node]
+
+    def prev(self, node: int) -> int:
+        return self._prev[node]
+
+    def get_position(self, node: int) -> float:
+        """
+        :return: a value which orders the nodes like the ring, it changes when the ring is renumbered
+        """
+        return self._positions[node]
+
+    def index(self, node: int) -> int:
+        if self._indices is None:
+            self._indices = {ring_node: index for index, ring_node in enumerate(self._get_nodes())}
+        if node not in self._indices:
+            raise ValueError(f'Node {node} is not part of the ring')
+        return self._indices[node]
+
+    def _renumber(self):
+        for position, node in enumerate(self):
+            self._positions[node] = float(position)
+
+    def _get_nodes(self) -> List[int]:
+        if self._nodes is None:
+            self._nodes = list(iter(self))
+        return self._nodes
+
+    def __iter__(self) -> Iterator[int]:
+        if self._nodes is not None:
+            yield from self._nodes
+            return
+        node = self.first
+        for _ in range(len(self._next)):
+            yield node
+            node = self._next[node]
+
+    def __getitem__(self, index):
+        return self._get_nodes()[index]
+
+    def __contains__(self, node) -> bool:
+        return node in self._next
+
+    def __len__(self) -> int:
+        return len(self._next)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
@@ -0,0 +1,126 @@
+import numbers
+from typing import List, Iterable, Tuple
+
+import numpy as np
+from shapely.geometry import Polygon, LineString
+from shapely.ops import unary_union
+from shapely.prepared import prep
+from shapely.strtree import STRtree
+
+try:
+    from shapely import contains_xy
+except ImportError:
+    # Shapely < 2.0
+    from shapely.vectorized import contains as contains_xy
+
+
+class OpenSpaceObstacles:
+    """
+    Precompiled obstacle geometries of an open space.
+    Built once per open space geometry and shared by all visibility predicates
+    """
+
+    def __init__(self, walkable_area_poly: Polygon, restricted_area_polys: List[Polygon],
+                 blocked_area_polys: List[Polygon]):
+        self.walkable_area_poly = walkable_area_poly
+        self.walkable_area_prep_poly = prep(walkable_area_poly)
+        self.walkable_area_envelope = walkable_area_poly.bounds
+
+        self.restricted_area_polys = list(restricted_area_polys)
+        self.restricted_area_prep_polys = [prep(poly) for poly in self.restricted_area_polys]
+        self.restricted_area_envelopes = [poly.bounds for poly in self.restricted_area_polys]
+        self.other_restricted_area_prep_unions = [self._get_other_restricted_area_prep_union(restricted_area_id)
+                                                  for restricted_area_id in range(len(self.restricted_area_polys))]
+        self.restricted_area_tree = STRtree(self.restricted_area_polys) if self.restricted_area_polys else None
+        self._restricted_area_ids = {id(poly): index for index, poly in enumerate(self.restricted_area_polys)}
+
+        self.blocked_area_polys = list(blocked_area_polys)
+        self.blocked_area_prep_polys = [prep(poly) for poly in self.blocked_area_polys]
+        self.blocked_area_envelopes = [poly.bounds for poly in self.blocked_area_polys]
+        self.blocked_area_tree = STRtree(self.blocked_area_polys) if self.blocked_area_polys else None
+        self._blocked_area_ids = {id(poly): index for index, poly in enumerate(self.blocked_area_polys)}
+
+    def get_restricted_area_ids(self) -> range:
+        return range(len(self.restricted_area_polys))
+
+    def get_blocked_area_ids(self) -> range:
+        return range(len(self.blocked_area_polys))
+
+    def query_restricted_area_ids(self, geometry) -> List[int]:
+        """
+        :return: ids of the restricted areas whose envelope intersects the envelope of the given geometry
+        """
+        return self._query(self.restricted_area_tree, self._restricted_area_ids, geometry)
+
+    def query_blocked_area_ids(self, geometry) -> List[int]:
+        """
+        :return: ids of the blocked areas whose envelope intersects the envelope of the given geometry
+        """
+        return self._query(self.blocked_area_tree, self._blocked_area_ids, geometry)
+
+    def is_internal(self, line: LineString) -> bool:
+        return self._envelope_contains(self.walkable_area_envelope, line.bounds) \
+               and self.walkable_area_prep_poly.covers(line)
+
+    def is_blocked(self, line: LineString, blocked_area_ids: Iterable[int]) -> bool:
+        bounds = line.bounds
+        return any(self._envelopes_intersect(self.blocked_area_envelopes[blocked_area_id], bounds)
+                   and self.blocked_area_prep_polys[blocked_area_id].intersects(line)
+                   for blocked_area_id in blocked_area_ids)
+
+    def touches_restricted_area(self, line: LineString, restricted_area_id: int) -> bool:
+        return self._envelopes_intersect(self.restricted_area_envelopes[restricted_area_id], line.bounds) \
+               and self.restricted_area_prep_polys[restricted_area_id].touches(line)
+
+    def intersects_restricted_areas(self, line: LineString, restricted_area_ids: Iterable[int]) -> bool:
+        bounds = line.bounds
+        return any(self._envelopes_intersect(self.restricted_area_envelopes[restricted_area_id], bounds)
+                   and self.restricted_area_prep_polys[restricted_area_id].intersects(line)
+                   for restricted_area_id in restricted_area_ids)
+
+    def intersects_other_restricted_areas(self, line: LineString, restricted_area_id: int) -> bool:
+        """
+        :return: true if the line intersects any restricted area except the one with the given id
+        """
+        other_union = self.other_restricted_area_prep_unions[restricted_area_id]
+        return other_union is not None and other_union.intersects(line)
+
+    def _get_other_restricted_area_prep_union(self, restricted_area_id: int):
+        other_polys = [poly for index, poly in enumerate(self.restricted_area_polys) if index != restricted_area_id]
+        return prep(unary_union(other_polys)) if other_polys else None
+
+    @staticmethod
+    def _query(tree: STRtree, ids: dict, geometry) -> List[int]:
+        if tree is None:
+            return []
+        # Shapely < 2.0 returns the geometries, Shapely >= 2.0 their indices
+        return sorted(int(item) if isinstance(item, numbers.Integral) else ids[id(item)]
+                      for item in tree.query(geometry))
+
+    @staticmethod
+    def _envelopes_intersect(envelope: Tuple[float, float, float, float],
+                             other: Tuple[float, float, float, float]) -> bool:
+        return envelope[0] <= other[2] and other[0] <= envelope[2] \
+               and envelope[1] <= other[3] and other[1] <= envelope[3]
+
+    @staticmethod
+    def _envelope_contains(envelope: Tuple[float, float, float, float],
+                           other: Tuple[float, float, float, float]) -> bool:
+        return envelope[0] <= other[0] and other[2] <= envelope[2] \
+               and envelope[1] <= other[1] and other[3] <= envelope[3]
+
+
+def get_contained_points(polygon: Polygon, coords: np.ndarray) -> np.ndarray:
+    """
+    Vectorized replacement of polygon.contains(Point(coord)) for many points
+
+    :param polygon: the polygon
+    :param coords: array of [x, y] coordinates
+    :return: boolean mask of the coordinates inside the polygon, points on the boundary are not contained
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    min_x, min_y, max_x, max_y = polygon.bounds
+    contained = (coords[:, 0] >= min_x) & (coords[:, 0] <= max_x) & (coords[:, 1] >= min_y) & (coords[:, 1] <= max_y)
+    if contained.any():
+        contained[contained] = contains_xy(polygon, coords[contained, 0], coords[contained, 1])
+    return contained
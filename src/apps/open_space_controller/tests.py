@@ -1,12 +1,16 @@
 import json
+import random
 
 from django.test import TestCase
+from shapely.geometry import Polygon
 from django.urls import reverse
 from rest_framework.test import APIClient
 
 from apps.lector.models import EntryPoint
 from apps.open_space_controller.config_controller import OpenSpaceConfigController
 from apps.open_space_controller.models import OpenSpace
+from apps.open_space_controller.node_index import NearestNodeIndex, NodeRing
+from apps.open_space_controller.obstacles import get_contained_points
 
 TEST_DIR = "/test/data/open_space_controller"
 
@@ -123,3 +127,53 @@ class OpenSpaceConfigControllerTest(TestCase):
             expected_colored_geojson = json.load(f)
         self.maxDiff = None
         self.assertEqual(colored_geojson['geojson'], expected_colored_geojson)
+
+
+class NearestNodeIndexTest(TestCase):
+    def test_nearest_nodes(self):
+        index = NearestNodeIndex([11, 12, 13], [[10.0, 49.0], [10.1, 49.0], [10.1, 49.1]])
+        self.assertEqual(index.get_nearest_nodes([[10.09, 49.01], [10.0, 48.9], [10.2, 49.2]]), [12, 11, 13])
+
+    def test_nearest_nodes_tie_takes_first_node(self):
+        index = NearestNodeIndex([11, 12], [[10.0, 49.0], [12.0, 49.0]])
+        self.assertEqual(index.get_nearest_nodes([[11.0, 49.0]]), [11])
+
+    def test_nearest_nodes_equal_brute_force(self):
+        generator = random.Random(7)
+        coords = [[10.88 + generator.random() * 0.003, 49.89 + generator.random() * 0.002] for _ in range(300)]
+        queries = [[10.875 + generator.random() * 0.013, 49.885 + generator.random() * 0.012] for _ in range(300)]
+        index = NearestNodeIndex(list(range(len(coords))), coords)
+        expected = [min(range(len(coords)), key=lambda node: ((coords[node][0] - x) ** 2 + (coords[node][1] - y) ** 2,
+                                                              node))
+                    for x, y in queries]
+        self.assertEqual(index.get_nearest_nodes(queries), expected)
+
+
+class ContainedPointsTest(TestCase):
+    def test_contained_points(self):
+        polygon = Polygon([[0, 0], [2, 0], [2, 2], [0, 2], [0, 0]])
+        contained = get_contained_points(polygon, [[1, 1], [3, 1], [2, 1], [-1, -1]])
+        self.assertEqual(contained.tolist(), [True, False, False, False])
+
+
+class NodeRingTest(TestCase):
+    def test_insert_after(self):
+        ring = NodeRing([1, 2, 3])
+        ring.insert_after(1, 10)
+        ring.insert_after(1, 11)
+        ring.insert_after(3, 12)
+        self.assertEqual(list(ring), [1, 11, 10, 2, 3, 12])
+        self.assertEqual(ring[-1], 12)
+        self.assertLess(ring.get_position(11), ring.get_position(10))
+        self.assertEqual(ring.index(10), 2)
+        ring.insert_after(10, 13)
+        self.assertEqual(ring.index(2), 4)
+        with self.assertRaises(ValueError):
+            ring.index(4)
+
+    def test_neighbours(self):
+        ring = NodeRing([1, 2, 3])
+        self.assertEqual(ring.prev(1), 3)
+        self.assertEqual(ring.next(3), 1)
+        self.assertIn(2, ring)
+        self.assertNotIn(4, ring)
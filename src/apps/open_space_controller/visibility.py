@@ -0,0 +1,395 @@
+import math
+from typing import List, Tuple, Iterable
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Polygon
+from shapely.prepared import prep
+
+BRUTE_FORCE_VISIBILITY = "brute_force"
+STRTREE_VISIBILITY = "strtree"
+BATCH_VISIBILITY = "batch"
+
+# Minimal distance in degrees (~0.1mm) a point must have to a line to count as lying on one side of it
+VISIBILITY_TOLERANCE = 1e-9
+# Maximal number of (candidate edge, ring segment) combinations evaluated at once by the batch engine
+BATCH_SIZE = 2 ** 18
+
+# Shapely >= 2.0 offers vectorized predicates on geometry arrays
+SHAPELY_UFUNCS = int(shapely.__version__.split('.')[0]) >= 2
+
+
+class VisibilityEngine:
+    """
+    Base class of the visibility graph engines of an open space.
+    An engine computes the visibility edges between all nodes of a GraphOpenSpace without changing the main graph
+    """
+
+    def __init__(self, graph_open_space):
+        self.graph_open_space = graph_open_space
+        self.osmm = graph_open_space.osmm
+
+    def get_visibility_edges(self) -> List[List[int]]:
+        """
+        :return: list of visible [from_id, to_id] node pairs with from_id < to_id
+        """
+        raise NotImplementedError
+
+    def is_visible(self, coord_from: List[float], coord_to: List[float]) -> bool:
+        """
+        :return: true if the edge between the given [x, y] coordinates is a visibility edge of the open space
+        """
+        raise NotImplementedError
+
+
+class BruteForceVisibilityEngine(VisibilityEngine):
+    """
+    Reference implementation, checks every node pair against all obstacle polygons
+    """
+
+    def get_visibility_edges(self) -> List[List[int]]:
+        edges = []
+        nodes = self.graph_open_space.get_all_nodes()
+        for node_from in nodes:
+            for node_to in nodes:
+                if node_from < node_to:
+                    new_possible_edge = LineString(
+                        [self.osmm.get_coord_from_id(node_from), self.osmm.get_coord_from_id(node_to)])
+                    if self.graph_open_space._is_visible_edge(new_possible_edge):
+                        edges.append([node_from, node_to])
+        return edges
+
+    def is_visible(self, coord_from: List[float], coord_to: List[float]) -> bool:
+        return self.graph_open_space._is_visible_edge(LineString([coord_from, coord_to]))
+
+
+class STRtreeVisibilityEngine(VisibilityEngine):
+    """
+    Checks every node pair only against the obstacle polygons whose bounding boxes intersect the edge bounding box.
+    All other polygons can neither touch nor intersect the edge, so the result equals the brute force result.
+    """
+
+    def __init__(self, graph_open_space):
+        super().__init__(graph_open_space)
+        self.obstacles = graph_open_space.get_obstacles()
+
+    def get_visibility_edges(self) -> List[List[int]]:
+        edges = []
+        nodes = self.graph_open_space.get_all_nodes()
+        coords = {node: self.osmm.get_coord_from_id(node) for node in nodes}
+        for node_from in nodes:
+            for node_to in nodes:
+                if node_from < node_to and self.is_visible(coords[node_from], coords[node_to]):
+                    edges.append([node_from, node_to])
+        return edges
+
+    def is_visible(self, coord_from: List[float], coord_to: List[float]) -> bool:
+        new_possible_edge = LineString([coord_from, coord_to])
+        if not self.obstacles.is_internal(new_possible_edge):
+            return False
+        return self.graph_open_space._is_visible_edge(new_possible_edge,
+                                                      self.obstacles.query_restricted_area_ids(new_possible_edge),
+                                                      self.obstacles.query_blocked_area_ids(new_possible_edge))
+
+
+class BatchVisibilityEngine(STRtreeVisibilityEngine):
+    """
+    Vectorized visibility build. All candidate edges of the open space are generated at once as NumPy arrays.
+
+    With Shapely >= 2.0 the edges are tested with the vectorized predicates on geometry arrays. The visibility rules
+    of GraphOpenSpace._is_visible_edge then reduce to: the walkable area covers the edge, no blocked area intersects
+    the edge and every intersecting restricted area only touches the edge, with at most two of them.
+
+    Otherwise the edges are classified in batches against all ring segments:
+
+    - rejected, if the edge properly crosses a ring segment or its midpoint lies clearly outside the walkable area or
+      clearly inside a restricted or blocked area
+    - accepted, if both end nodes lie only on their own ring, the edge keeps clear of every ring except at its end
+      nodes and its midpoint lies clearly inside the walkable area and clearly outside all restricted and blocked areas
+    - otherwise, e.g. for edges along a ring, checked with the exact visibility rules
+
+    So the result equals the brute force result.
+    """
+
+    def get_visibility_edges(self) -> List[List[int]]:
+        nodes = self.graph_open_space.get_all_nodes()
+        if len(nodes) < 2:
+            return []
+        coords = np.array([self.osmm.get_coord_from_id(node) for node in nodes], dtype=float)
+        from_index, to_index = self._get_candidate_pairs(nodes)
+        if SHAPELY_UFUNCS:
+            visible = self._get_ufunc_visibility(coords[from_index], coords[to_index])
+        else:
+            visible = self._get_kernel_visibility(coords, from_index, to_index)
+        return [[nodes[index_from], nodes[index_to]]
+                for index_from, index_to in zip(from_index[visible], to_index[visible])]
+
+    @staticmethod
+    def _get_candidate_pairs(nodes: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: index arrays of all node pairs with from_id < to_id in the order of the brute force engine
+        """
+        node_ids = np.array(nodes)
+        from_index, to_index = np.triu_indices(len(nodes), k=1)
+        swap = node_ids[from_index] > node_ids[to_index]
+        from_index, to_index = np.where(swap, to_index, from_index), np.where(swap, from_index, to_index)
+        order = np.lexsort((to_index, from_index))
+        return from_index[order], to_index[order]
+
+    def _get_ufunc_visibility(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        lines = shapely.linestrings(np.stack([starts, ends], axis=1))
+        walkable_area_poly = shapely.Polygon(self.obstacles.walkable_area_poly)
+        shapely.prepare(walkable_area_poly)
+        visible = shapely.covers(walkable_area_poly, lines)
+        if self.obstacles.blocked_area_tree is not None:
+            line_index, _ = self.obstacles.blocked_area_tree.query(lines, predicate='intersects')
+            visible[line_index] = False
+        if self.obstacles.restricted_area_tree is not None:
+            line_index, _ = self.obstacles.restricted_area_tree.query(lines, predicate='intersects')
+            intersecting = np.bincount(line_index, minlength=len(lines))
+            line_index, _ = self.obstacles.restricted_area_tree.query(lines, predicate='touches')
+            touching = np.bincount(line_index, minlength=len(lines))
+            visible &= (intersecting == touching) & (intersecting <= 2)
+        return visible
+
+    def _get_kernel_visibility(self, coords: np.ndarray, from_index: np.ndarray, to_index: np.ndarray) -> np.ndarray:
+        walkable_segments = _get_polygon_segments(self.obstacles.walkable_area_poly)
+        obstacle_segments = [_get_polygon_segments(poly) for poly in
+                             self.obstacles.restricted_area_polys + self.obstacles.blocked_area_polys]
+        segments = np.concatenate([walkable_segments, *obstacle_segments])
+        clean_nodes = self._get_clean_nodes(coords, walkable_segments, obstacle_segments)
+
+        starts = coords[from_index]
+        ends = coords[to_index]
+        accepted = np.zeros(len(starts), dtype=bool)
+        rejected = np.zeros(len(starts), dtype=bool)
+        batch_size = max(1, BATCH_SIZE // len(segments))
+        for batch_start in range(0, len(starts), batch_size):
+            batch = slice(batch_start, batch_start + batch_size)
+            midpoint_inside, midpoint_outside = self._classify_midpoints((starts[batch] + ends[batch]) / 2,
+                                                                         walkable_segments, obstacle_segments)
+            crossing, contact = _batch_segment_contacts(starts[batch], ends[batch], segments)
+            rejected[batch] = crossing | midpoint_outside
+            accepted[batch] = ~rejected[batch] & ~contact & midpoint_inside \
+                              & clean_nodes[from_index[batch]] & clean_nodes[to_index[batch]]
+
+        for index in np.flatnonzero(~accepted & ~rejected):
+            accepted[index] = self.is_visible(starts[index].tolist(), ends[index].tolist())
+        return accepted
+
+    @staticmethod
+    def _get_clean_nodes(coords: np.ndarray, walkable_segments: np.ndarray,
+                         obstacle_segments: List[np.ndarray]) -> np.ndarray:
+        """
+        :return: mask of the nodes which lie on exactly one ring and not inside a restricted or blocked area
+        """
+        _, distance = _batch_points_in_polygon(coords, walkable_segments)
+        near_rings = (distance <= VISIBILITY_TOLERANCE).astype(int)
+        inside_obstacle = np.zeros(len(coords), dtype=bool)
+        for segments in obstacle_segments:
+            inside, distance = _batch_points_in_polygon(coords, segments)
+            near_rings += distance <= VISIBILITY_TOLERANCE
+            inside_obstacle |= inside & (distance > VISIBILITY_TOLERANCE)
+        return (near_rings == 1) & ~inside_obstacle
+
+    @staticmethod
+    def _classify_midpoints(midpoints: np.ndarray, walkable_segments: np.ndarray,
+                            obstacle_segments: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        :return: mask of the midpoints clearly inside the walkable area and outside all restricted and blocked areas,
+                 mask of the midpoints clearly outside the walkable area or inside a restricted or blocked area
+        """
+        inside, distance = _batch_points_in_polygon(midpoints, walkable_segments)
+        clear = distance > VISIBILITY_TOLERANCE
+        midpoint_inside = inside & clear
+        midpoint_outside = ~inside & clear
+        for segments in obstacle_segments:
+            inside, distance = _batch_points_in_polygon(midpoints, segments)
+            clear = distance > VISIBILITY_TOLERANCE
+            midpoint_inside &= ~inside & clear
+            midpoint_outside |= inside & clear
+        return midpoint_inside, midpoint_outside
+
+
+def get_reduced_visibility_edges(edges: List[List[int]], rings: List[Tuple[List[int], bool]], coords: dict,
+                                 terminals: Iterable[int]) -> List[List[int]]:
+    """
+    Reduce the visibility edges to the edges which can be part of a shortest path between terminals.
+    A shortest path only bends at ring vertices which point into the free space and leaves them tangentially,
+    so an edge is kept if each end is a terminal or such a vertex whose ring neighbours lie on one side of the edge
+
+    :param edges: the visibility edges
+    :param rings: list of ring node ids and whether the free space lies inside the ring
+    :param coords: node id to [x, y] coordinates
+    :param terminals: node ids which are connected to the outside of the open space
+    :return: the reduced list of visibility edges
+    """
+    terminals = set(terminals)
+    neighbours = {}
+    for ring_nodes, free_inside in rings:
+        ring_neighbours = _get_ring_neighbours(ring_nodes, coords)
+        orientation = 1 if _get_signed_area([coords[node] for node in ring_nodes]) > 0 else -1
+        for node, (before, after) in ring_neighbours.items():
+            v = coords[node]
+            turn = orientation * _orientation(before[0], before[1], v[0], v[1], after[0], after[1])
+            tolerance = VISIBILITY_TOLERANCE * math.hypot(after[0] - before[0], after[1] - before[1])
+            # Convex ring corners point into the free space of obstacles, reflex corners into the free space of the
+            # walkable area. Collinear vertices are kept
+            if (turn < tolerance if free_inside else turn > -tolerance):
+                neighbours[node] = (before, after)
+
+    def is_tangent(node: int, other: int) -> bool:
+        if node in terminals:
+            return True
+        if node not in neighbours:
+            return False
+        (before, after), v, w = neighbours[node], coords[node], coords[other]
+        tolerance = VISIBILITY_TOLERANCE * math.hypot(w[0] - v[0], w[1] - v[1])
+        return not _is_separated(_orientation(v[0], v[1], w[0], w[1], before[0], before[1]),
+                                 _orientation(v[0], v[1], w[0], w[1], after[0], after[1]),
+                                 tolerance)
+
+    return [edge for edge in edges if is_tangent(edge[0], edge[1]) and is_tangent(edge[1], edge[0])]
+
+
+def get_pairs_meeting_area(nodes: List[int], coords: dict, area) -> List[Tuple[int, int]]:
+    """
+    :param nodes: the node ids
+    :param coords: node id to [x, y] coordinates
+    :param area: shapely geometry
+    :return: all node pairs whose connection intersects the given area
+    """
+    if len(nodes) < 2:
+        return []
+    points = np.array([coords[node] for node in nodes], dtype=float)
+    from_index, to_index = np.triu_indices(len(nodes), k=1)
+    starts, ends = points[from_index], points[to_index]
+    min_x, min_y, max_x, max_y = area.bounds
+    candidates = (np.minimum(starts[:, 0], ends[:, 0]) <= max_x) & (np.maximum(starts[:, 0], ends[:, 0]) >= min_x) \
+                 & (np.minimum(starts[:, 1], ends[:, 1]) <= max_y) & (np.maximum(starts[:, 1], ends[:, 1]) >= min_y)
+    prepared_area = prep(area)
+    return [(nodes[i], nodes[j]) for i, j in zip(from_index[candidates], to_index[candidates])
+            if prepared_area.intersects(LineString([coords[nodes[i]], coords[nodes[j]]]))]
+
+
+def _get_ring_neighbours(ring_nodes: List[int], coords: dict) -> dict:
+    """
+    :return: node id to the coordinates of the previous and next ring vertex, skipping vertices at the same position
+             like the closing node of a ring
+    """
+    neighbours = {}
+    ring_size = len(ring_nodes)
+    for index, node in enumerate(ring_nodes):
+        position = coords[node]
+        before = next((coords[ring_nodes[(index - offset) % ring_size]] for offset in range(1, ring_size)
+                       if coords[ring_nodes[(index - offset) % ring_size]] != position), None)
+        after = next((coords[ring_nodes[(index + offset) % ring_size]] for offset in range(1, ring_size)
+                      if coords[ring_nodes[(index + offset) % ring_size]] != position), None)
+        if before is not None and after is not None:
+            neighbours[node] = (before, after)
+    return neighbours
+
+
+def _get_signed_area(ring_coords: List[List[float]]) -> float:
+    return sum(start[0] * end[1] - end[0] * start[1]
+               for start, end in zip(ring_coords, ring_coords[1:] + ring_coords[:1])) / 2
+
+
+def _get_polygon_segments(poly: Polygon) -> np.ndarray:
+    """
+    :return: (m, 4) array [ax, ay, bx, by] of the non degenerated segments of all polygon rings
+    """
+    return np.array([[*start[:2], *end[:2]]
+                     for ring in [poly.exterior, *poly.interiors]
+                     for start, end in zip(ring.coords, ring.coords[1:])
+                     if start != end], dtype=float).reshape(-1, 4)
+
+
+def _batch_point_segment_distances(px, py, ax, ay, bx, by) -> np.ndarray:
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = np.where(length > 0, np.clip(((px - ax) * dx + (py - ay) * dy) / length, 0, 1), 0)
+    return np.hypot(ax + position * dx - px, ay + position * dy - py)
+
+
+def _batch_segment_contacts(starts: np.ndarray, ends: np.ndarray,
+                            segments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized contact test of k edges with m ring segments
+
+    :param starts: (k, 2) array of edge start points
+    :param ends: (k, 2) array of edge end points
+    :param segments: (m, 4) array of ring segments [ax, ay, bx, by]
+    :return: mask of the edges which properly cross at least one segment, i.e. in a single inner point of both,
+             mask of the edges which come closer than VISIBILITY_TOLERANCE to a segment apart from a shared end point
+    """
+    px, py = starts[:, 0:1], starts[:, 1:2]
+    wx, wy = ends[:, 0:1], ends[:, 1:2]
+    ax, ay, bx, by = (segments[:, column][np.newaxis, :] for column in range(4))
+    tolerance_pw = VISIBILITY_TOLERANCE * np.hypot(wx - px, wy - py)
+    tolerance_ab = VISIBILITY_TOLERANCE * np.hypot(bx - ax, by - ay)
+    orientation_a = (wx - px) * (ay - py) - (wy - py) * (ax - px)
+    orientation_b = (wx - px) * (by - py) - (wy - py) * (bx - px)
+    orientation_p = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+    orientation_w = (bx - ax) * (wy - ay) - (by - ay) * (wx - ax)
+    separated_ab = ((orientation_a > tolerance_pw) & (orientation_b < -tolerance_pw)) \
+                   | ((orientation_a < -tolerance_pw) & (orientation_b > tolerance_pw))
+    separated_pw = ((orientation_p > tolerance_ab) & (orientation_w < -tolerance_ab)) \
+                   | ((orientation_p < -tolerance_ab) & (orientation_w > tolerance_ab))
+    crossing = (separated_ab & separated_pw).any(axis=1)
+
+    distance_a = _batch_point_segment_distances(ax, ay, px, py, wx, wy)
+    distance_b = _batch_point_segment_distances(bx, by, px, py, wx, wy)
+    distance_p = _batch_point_segment_distances(px, py, ax, ay, bx, by)
+    distance_w = _batch_point_segment_distances(wx, wy, ax, ay, bx, by)
+    intersecting = ((orientation_a * orientation_b < 0) & (orientation_p * orientation_w < 0)) \
+                   | (np.minimum(np.minimum(distance_a, distance_b), np.minimum(distance_p, distance_w))
+                      <= VISIBILITY_TOLERANCE)
+
+    # Ring segments sharing an end point with the edge may only meet the edge in this end point
+    a_at_p = np.hypot(ax - px, ay - py) <= VISIBILITY_TOLERANCE
+    b_at_p = np.hypot(bx - px, by - py) <= VISIBILITY_TOLERANCE
+    a_at_w = np.hypot(ax - wx, ay - wy) <= VISIBILITY_TOLERANCE
+    b_at_w = np.hypot(bx - wx, by - wy) <= VISIBILITY_TOLERANCE
+    at_p = a_at_p | b_at_p
+    at_w = a_at_w | b_at_w
+    beyond_p = (np.where(a_at_p, distance_b, distance_a) <= VISIBILITY_TOLERANCE) | (distance_w <= VISIBILITY_TOLERANCE)
+    beyond_w = (np.where(a_at_w, distance_b, distance_a) <= VISIBILITY_TOLERANCE) | (distance_p <= VISIBILITY_TOLERANCE)
+    contact = np.where(at_p | at_w, (at_p & beyond_p) | (at_w & beyond_w), intersecting)
+    return crossing, contact.any(axis=1)
+
+
+def _batch_points_in_polygon(points: np.ndarray, segments: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized even-odd point in polygon test
+
+    :param points: (k, 2) array of points
+    :param segments: (m, 4) array of the polygon ring segments, see _get_polygon_segments
+    :return: mask of the points inside the polygon and the distance of each point to the polygon boundary
+    """
+    if not len(segments):
+        return np.zeros(len(points), dtype=bool), np.full(len(points), np.inf)
+    x, y = points[:, 0:1], points[:, 1:2]
+    ax, ay, bx, by = (segments[:, column][np.newaxis, :] for column in range(4))
+
+    spans_y = (ay > y) != (by > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_intersection = ax + (y - ay) * (bx - ax) / (by - ay)
+    inside = (spans_y & (x < x_intersection)).sum(axis=1) % 2 == 1
+    distance = _batch_point_segment_distances(x, y, ax, ay, bx, by).min(axis=1)
+    return inside, distance
+
+
+def _orientation(ax: float, ay: float, bx: float, by: float, cx: float, cy: float) -> float:
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _is_separated(orientation_1: float, orientation_2: float, tolerance: float) -> bool:
+    return (orientation_1 > tolerance and orientation_2 < -tolerance) \
+           or (orientation_1 < -tolerance and orientation_2 > tolerance)
+
+
+VISIBILITY_ENGINES = {BRUTE_FORCE_VISIBILITY: BruteForceVisibilityEngine,
+                      STRTREE_VISIBILITY: STRtreeVisibilityEngine,
+                      BATCH_VISIBILITY: BatchVisibilityEngine}
@@ -154,6 +154,11 @@ LOGGING = {
 #                                          Custom Config                                                               #
 ########################################################################################################################
 OPEN_SPACE_MAX_CACHING_TIME=int(os.environ.get('OPEN_SPACE_MAX_CACHING_TIME', '0'))
+OPEN_SPACE_PLOT_WORKERS = int(os.environ.get('OPEN_SPACE_PLOT_WORKERS', '2'))
 UNIVIS_SEMESTER = os.environ.get('UNIVIS_SEMESTER', "2019s")
 BUILDINGS_CONFIG_DIR = os.environ.get('BUILDINGS_CONFIG_DIR', "/test/data/building_controller/buildings")
-OPEN_SPACES_CONFIG_DIR = os.environ.get('OPEN_SPACES_CONFIG_DIR', "/test/data/open_space_controller/open_spaces")
\ No newline at end of file
+OPEN_SPACES_CONFIG_DIR = os.environ.get('OPEN_SPACES_CONFIG_DIR', "/test/data/open_space_controller/open_spaces")
+OPEN_SPACE_GRAPH_CACHE_DIR = os.environ.get('OPEN_SPACE_GRAPH_CACHE_DIR', "/tmp/lector/open_space_cache")
+OPEN_SPACE_GRAPH_CACHE_MAX_SIZE = int(os.environ.get('OPEN_SPACE_GRAPH_CACHE_MAX_SIZE', str(256 * 1024 * 1024)))
+CITY_OSM_FILE = os.environ.get('CITY_OSM_FILE', "/test/data/lector/city.osm")
+GRAPHHOPPER_URL = os.environ.get('GRAPHHOPPER_URL', "http://graphhopper:8989")